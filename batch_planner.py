@@ -0,0 +1,278 @@
+"""
+Batch Planner
+Headless engine and CLI for generating many travel plans from a trip-spec file.
+
+Usage:
+    python batch_planner.py trips.jsonl --output results.jsonl --export-dir plans/
+    python batch_planner.py trips.csv --workers 8 --rate 30 --zip plans.zip --formats md,pdf,ics
+
+Each finished plan is appended to the output JSONL as soon as it completes;
+re-running with the same output file skips trips already recorded as "ok".
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from travel_planner_streamlit import (
+    build_initial_state,
+    create_agents,
+    create_workflow,
+)
+from plan_export import FORMATS, ZipExporter, write_export
+from response_cache import get_default_cache
+
+# Defaults mirror the Streamlit form
+SPEC_DEFAULTS = {
+    "num_days": 5,
+    "travel_style": "Culture",
+    "budget_range": "Mid-Range",
+    "interests": ["History & Culture", "Food & Dining"],
+    "headcount": 2,
+    "multi_city": False,
+    "cities": [],
+}
+
+# Fields copied from the final state into each output record
+RESULT_FIELDS = [
+    "research_results", "weather_analysis", "hotel_recommendations", "budget_estimate",
+    "logistics_plan", "final_itinerary", "activity_bookings", "total_cost_estimate",
+    "budget_breakdown", "hotel_shortlist", "logistics_details", "revision_count", "node_timings",
+]
+
+
+def _as_list(value: Any) -> list:
+    if isinstance(value, list):
+        return value
+    if not value:
+        return []
+    return [item.strip() for item in str(value).replace(";", ",").split(",") if item.strip()]
+
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def normalize_spec(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill defaults and coerce CSV strings; every spec gets a stable ``id``."""
+    if not raw.get("destination"):
+        raise ValueError(f"Trip spec missing destination: {raw}")
+    spec = dict(SPEC_DEFAULTS)
+    spec.update({key: value for key, value in raw.items() if value not in (None, "")})
+    spec["num_days"] = int(spec["num_days"])
+    spec["headcount"] = int(spec["headcount"])
+    spec["interests"] = _as_list(spec["interests"])
+    spec["cities"] = _as_list(spec["cities"])
+    spec["multi_city"] = _as_bool(spec["multi_city"])
+    if not spec.get("id"):
+        # Hashed before the start-date default so resumes on another day match
+        payload = json.dumps({k: spec[k] for k in sorted(spec)}, sort_keys=True, default=str)
+        spec["id"] = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+    spec["id"] = str(spec["id"])
+    if not spec.get("start_date"):
+        spec["start_date"] = (datetime.today() + timedelta(days=30)).strftime('%Y-%m-%d')
+    return spec
+
+
+def load_specs(path: str) -> List[Dict[str, Any]]:
+    """Read trip specs from a .jsonl or .csv file."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return [normalize_spec(row) for row in rows]
+
+
+def completed_ids(output_path: str) -> set:
+    """IDs already written successfully, so a restarted batch can resume."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write can leave a truncated last line
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class RateLimiter:
+    """Space plan starts evenly so at most ``per_minute`` begin each minute."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next)
+            self._next = start_at + self.interval
+        delay = start_at - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class BatchPlanner:
+    """Run one compiled workflow over many trip specs with a worker pool."""
+
+    def __init__(self, workflow, output_path: str, export_dir: Optional[str] = None,
+                 workers: int = 4, rate_per_minute: float = 0.0, formats: Iterable[str] = ("md",),
+                 archive: Optional[ZipExporter] = None):
+        self.workflow = workflow
+        self.output_path = output_path
+        self.export_dir = export_dir
+        self.formats = list(formats)
+        self.archive = archive
+        self.workers = workers
+        self.limiter = RateLimiter(rate_per_minute)
+        self._write_lock = threading.Lock()
+
+    def run_one(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        self.limiter.wait()
+        start = time.time()
+        state = build_initial_state(
+            destination=spec["destination"],
+            num_days=spec["num_days"],
+            travel_style=spec["travel_style"],
+            budget_range=spec["budget_range"],
+            start_date=spec["start_date"],
+            interests=spec["interests"],
+            headcount=spec["headcount"],
+            multi_city=spec["multi_city"],
+            cities=spec["cities"]
+        )
+        config = {"configurable": {"thread_id": f"batch_{spec['id']}_{uuid.uuid4().hex}"}}
+        record = {"id": spec["id"], "destination": spec["destination"], "spec": spec}
+        try:
+            final_state = self.workflow.invoke(state, config)
+            record.update({"status": "ok", "result": {k: final_state.get(k) for k in RESULT_FIELDS}})
+            # Reports are streamed chunk by chunk, never built whole in memory
+            if self.export_dir:
+                for fmt in self.formats:
+                    write_export(final_state, fmt, os.path.join(self.export_dir, f"{spec['id']}.{FORMATS[fmt][0]}"))
+            if self.archive:
+                self.archive.add(final_state, spec["id"])
+        except Exception as e:
+            record.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+        record["latency"] = time.time() - start
+        self._write(record)
+        return record
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._write_lock:
+            with open(self.output_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def run(self, specs: Iterable[Dict[str, Any]], resume: bool = True) -> Dict[str, Any]:
+        """Plan every spec not already done; returns throughput and latency stats."""
+        specs = list(specs)
+        done = completed_ids(self.output_path) if resume else set()
+        if self.archive:
+            # Plans finished by a run that died before closing its archive have no reports yet
+            done = {spec_id for spec_id in done if self.archive.contains(spec_id)}
+        pending = [spec for spec in specs if spec["id"] not in done]
+        if self.export_dir:
+            os.makedirs(self.export_dir, exist_ok=True)
+
+        start = time.time()
+        records = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.run_one, spec) for spec in pending]
+            for future in as_completed(futures):
+                record = future.result()
+                records.append(record)
+                print(f"[{len(records)}/{len(pending)}] {record['status']:<5} "
+                      f"{record['destination']} ({record['latency']:.1f}s)", flush=True)
+        wall = time.time() - start
+
+        latencies = [r["latency"] for r in records if r["status"] == "ok"]
+        return {
+            "skipped": len(specs) - len(pending),
+            "completed": len(latencies),
+            "failed": len(records) - len(latencies),
+            "wall_time": wall,
+            "plans_per_minute": len(latencies) / wall * 60 if wall > 0 else 0.0,
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate travel plans in batch.")
+    parser.add_argument("specs", help="Trip specs (.jsonl or .csv)")
+    parser.add_argument("--output", default="batch_results.jsonl", help="Results JSONL (appended)")
+    parser.add_argument("--export-dir", "--markdown-dir", dest="export_dir",
+                        help="Also write one report per plan and format here")
+    parser.add_argument("--zip", help="Also stream every report into this zip archive")
+    parser.add_argument("--formats", default="md",
+                        help=f"Comma-separated report formats ({', '.join(FORMATS)}); default md")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0.0, help="Max plans started per minute (0 = unlimited)")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"))
+    parser.add_argument("--sequential", action="store_true", help="Disable parallel agent fan-out")
+    parser.add_argument("--no-grounding", action="store_true", help="Skip web search / forecast grounding")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache")
+    parser.add_argument("--no-resume", action="store_true", help="Re-run trips already in the output")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("a Google API key is required (--api-key or GOOGLE_API_KEY)")
+    formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        parser.error(f"unknown format(s) {', '.join(unknown)}; choose from {', '.join(FORMATS)}")
+
+    agents = create_agents(args.api_key, cache=None if args.no_cache else get_default_cache())
+    workflow = create_workflow(agents, parallel=not args.sequential, grounded=not args.no_grounding)
+    archive = ZipExporter(args.zip, formats, resume=not args.no_resume) if args.zip else None
+    planner = BatchPlanner(workflow, args.output, args.export_dir, args.workers, args.rate,
+                           formats=formats, archive=archive)
+    try:
+        stats = planner.run(load_specs(args.specs), resume=not args.no_resume)
+    finally:
+        if archive:
+            archive.close()
+
+    print(f"\nCompleted {stats['completed']}, failed {stats['failed']}, "
+          f"skipped {stats['skipped']} (already done)")
+    print(f"Throughput: {stats['plans_per_minute']:.2f} plans/minute over {stats['wall_time']:.1f}s")
+    print(f"Latency: p50 {stats['p50']:.1f}s  p90 {stats['p90']:.1f}s  p99 {stats['p99']:.1f}s")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Context Packing Benchmark
+Compare planner/activities prompt size under the old character cuts and the
+token-budgeted ContextPacker, using the sections of the example Italy report.
+
+Usage:
+    python benchmarks/bench_context_packing.py [--runs 200] [--live]
+
+``--live`` additionally times a real PlannerAgent call for both prompts
+(requires GOOGLE_API_KEY).
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import travel_planner_streamlit as tp  # noqa: E402
+from context_packer import estimate_tokens, _FACT_PATTERN  # noqa: E402
+
+EXAMPLE_DOC = os.path.join(ROOT, "Example Doc for Italy_travel_plan.md")
+
+# Example report heading -> state field it stands in for
+SECTION_MAP = {
+    "Itinerary": "research_results",
+    "Weather & Packing": "weather_analysis",
+    "Accommodations": "hotel_recommendations",
+    "Budget Breakdown": "budget_estimate",
+    "Transportation": "logistics_plan",
+}
+
+
+def load_state():
+    with open(EXAMPLE_DOC, encoding="utf-8") as f:
+        text = f.read()
+    sections = dict(re.findall(r"^## (.+?)\n(.*?)(?=^## |\Z)", text, flags=re.M | re.S))
+    state = {
+        "destination": "Italy", "num_days": 8, "multi_city": False,
+        "final_itinerary": sections["Itinerary"],
+    }
+    for heading, field in SECTION_MAP.items():
+        state[field] = sections[heading]
+    return state
+
+
+def legacy_planner_prompt(state):
+    return f"""Create detailed {state['num_days']}-day itinerary for {state['destination']}.
+    
+    Research: {state.get('research_results', '')[:1500]}
+    Weather: {state.get('weather_analysis', '')[:800]}
+    Hotels: {state.get('hotel_recommendations', '')[:800]}
+    Budget: {state.get('budget_estimate', '')[:600]}
+    Logistics: {state.get('logistics_plan', '')[:800]}
+    
+    Create day-by-day schedule with times, locations, costs, and practical tips."""
+
+
+def legacy_activities_prompt(state):
+    return f"""Find booking links for activities in this itinerary:
+    {state.get('final_itinerary', '')[:2000]}
+    
+    Find official websites and major platforms (Viator, GetYourGuide, etc.)."""
+
+
+def fact_retention(prompt, state, fields):
+    """Share of distinct prices/times/quantities in the sources that survive into the prompt."""
+    source_facts = set()
+    for field in fields:
+        source_facts.update(_FACT_PATTERN.findall(state.get(field, "")))
+    kept = {fact for fact in source_facts if fact in prompt}
+    return len(kept) / max(len(source_facts), 1)
+
+
+def time_builder(builder, state, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        prompt = builder(state)
+    return prompt, (time.perf_counter() - start) / runs * 1000
+
+
+def live_latency(prompt):
+    agent = tp.create_agents(os.environ["GOOGLE_API_KEY"])["planner"]
+    start = time.perf_counter()
+    agent.invoke([tp.HumanMessage(content=prompt)])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--live", action="store_true")
+    args = parser.parse_args()
+
+    state = load_state()
+    cases = [
+        ("planner", legacy_planner_prompt, tp._planner_prompt, list(SECTION_MAP.values())),
+        ("activities", legacy_activities_prompt, tp._activities_prompt, ["final_itinerary"]),
+    ]
+
+    print(f"{'prompt':<12}{'variant':<10}{'tokens':>8}{'build ms':>10}{'facts kept':>12}")
+    for name, legacy, packed, fields in cases:
+        for variant, builder in (("legacy", legacy), ("packed", packed)):
+            prompt, build_ms = time_builder(builder, state, args.runs)
+            retention = fact_retention(prompt, state, fields)
+            line = f"{name:<12}{variant:<10}{estimate_tokens(prompt):>8}{build_ms:>10.3f}{retention:>11.0%}"
+            if args.live and name == "planner":
+                line += f"   llm {live_latency(prompt):.1f}s"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Memory Benchmark
+Peak and steady-state RSS of many plan sessions in one server process.
+
+Each session submits a plan to the job queue (offline fakes, durable
+checkpoints) and, like the Streamlit app, leaves the finished job retained so
+it can re-attach. Trips are drawn from ``--distinct`` destinations, so
+identical agent outputs recur across sessions
+(the fakes are seeded by prompt). Every mode runs in a fresh
+interpreter:
+
+    blobs   long text in checkpoints and retained jobs goes to the BlobStore
+    inline  the same run with every string kept inline
+
+Usage:
+    python benchmarks/bench_memory.py --sessions 200 --distinct 20
+    python benchmarks/bench_memory.py --save memory.json
+    python benchmarks/bench_memory.py --compare memory.json --tolerance 0.15
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ["blobs", "inline"]
+
+# metric -> minimum absolute change (MB) worth reporting, checked for the blobs mode
+REGRESSION_METRICS = {"rss_peak_mb": 10.0, "rss_steady_mb": 10.0}
+
+
+class RssTimeline:
+    """Background RSS sampler keeping the whole series (Linux /proc/self/statm)."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self.start = time.perf_counter()
+        self.samples: List[tuple] = []
+
+    def rss_mb(self) -> float:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * self._page_size / 1e6
+
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            self.samples.append((time.perf_counter() - self.start, self.rss_mb()))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def run_mode(mode: str, sessions: int, distinct: int, workers: int, time_scale: float) -> Dict[str, Any]:
+    """One load test in this process; ``mode`` is ``"blobs"`` or ``"inline"``."""
+    scratch = tempfile.mkdtemp(prefix="travel_mem_")
+    os.environ["TRAVEL_PLANNER_CHECKPOINT_PATH"] = os.path.join(scratch, "checkpoints.sqlite3")
+    os.environ["TRAVEL_PLANNER_BLOB_PATH"] = os.path.join(scratch, "blobs.sqlite3")
+
+    import travel_planner_streamlit as tp
+    from benchmarks.bench_workflow import CITY_POOL, trip_state
+    from benchmarks.fakes import install_fake_llm, install_fake_search, install_fake_weather
+    from blob_store import BlobStore
+    from checkpoint_store import DurableCheckpointer
+    from job_queue import JobQueue
+
+    # min_size beyond any output keeps every string inline
+    blobs = BlobStore(os.environ["TRAVEL_PLANNER_BLOB_PATH"],
+                      min_size=1024 if mode == "blobs" else sys.maxsize)
+    checkpointer = DurableCheckpointer(os.environ["TRAVEL_PLANNER_CHECKPOINT_PATH"], blobs=blobs)
+    queue = JobQueue(workers=workers, max_pending=sessions, blobs=blobs if mode == "blobs" else None)
+
+    agents = tp.create_agents("offline-benchmark")
+    install_fake_llm(agents, time_scale=time_scale)
+    install_fake_search(latency=0.3 * time_scale * 10)
+    install_fake_weather(latency=0.15 * time_scale * 10)
+    workflow = tp.create_workflow(agents, parallel=True, checkpointer=checkpointer)
+
+    gc.collect()
+    with RssTimeline() as timeline:
+        baseline = timeline.rss_mb()
+        start = time.perf_counter()
+        jobs = []
+        for index in range(sessions):
+            # Destination and trip length together give ``distinct`` different trips
+            variant = index % distinct
+            config = {"configurable": {"thread_id": f"mem_{uuid.uuid4().hex}"}}
+            jobs.append(queue.submit(workflow, trip_state(variant, 3 + variant // len(CITY_POOL), 1), config))
+        failed = 0
+        for job in jobs:
+            try:
+                job.result()
+            except Exception:
+                failed += 1
+        wall = time.perf_counter() - start
+        gc.collect()
+        time.sleep(0.5)
+        steady = timeline.rss_mb()
+
+    peak = max(rss for _, rss in timeline.samples)
+    return {
+        "mode": mode,
+        "sessions": sessions,
+        "failed": failed,
+        "wall_time": wall,
+        "rss_baseline_mb": baseline,
+        "rss_peak_mb": peak - baseline,
+        "rss_steady_mb": steady - baseline,
+        "retained_kb_per_session": (steady - baseline) * 1000 / sessions,
+        "checkpoint_db_mb": checkpointer.stats()["size_mb"],
+        "blobs": blobs.summary(),
+        # Growth over the run, sampled at tenths of the wall time
+        "timeline_mb": [round(rss - baseline, 1) for _, rss in timeline.samples[::max(1, len(timeline.samples) // 10)]],
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Human-readable regressions beyond ``tolerance`` (fractional)."""
+    regressions = []
+    old_result, new_result = baseline.get("modes", {}).get("blobs"), current["modes"].get("blobs")
+    if not old_result or not new_result:
+        return regressions
+    for metric, min_delta in REGRESSION_METRICS.items():
+        old, new = old_result[metric], new_result[metric]
+        if new > old * (1 + tolerance) and new - old > min_delta:
+            regressions.append(f"blobs.{metric}: {old:.1f} -> {new:.1f} MB")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Many-session memory benchmark")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=20, help="Distinct trips among the sessions")
+    parser.add_argument("--workers", type=int, default=16, help="Job queue workers")
+    parser.add_argument("--time-scale", type=float, default=0.005, help="Multiplier on simulated latencies")
+    parser.add_argument("--modes", nargs="*", default=MODES, choices=MODES)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--save", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_mode(args.child, args.sessions, args.distinct, args.workers, args.time_scale)
+        print(json.dumps(result))
+        return 0
+
+    report = {"config": {"sessions": args.sessions, "distinct": args.distinct, "workers": args.workers,
+                         "time_scale": args.time_scale}, "modes": {}}
+    print(f"{'mode':<8}{'wall s':>8}{'peak MB':>9}{'steady MB':>11}{'KB/sess':>9}{'ckpt MB':>9}"
+          f"{'blobs':>7}{'dedup':>7}  growth over time (MB)")
+    for mode in args.modes:
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", mode, "--sessions", str(args.sessions),
+             "--distinct", str(args.distinct), "--workers", str(args.workers),
+             "--time-scale", str(args.time_scale)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        report["modes"][mode] = result
+        blobs = result["blobs"]
+        dedup = blobs["deduplicated"] / blobs["puts"] if blobs["puts"] else 0.0
+        print(f"{mode:<8}{result['wall_time']:>8.2f}{result['rss_peak_mb']:>9.1f}{result['rss_steady_mb']:>11.1f}"
+              f"{result['retained_kb_per_session']:>9.1f}{result['checkpoint_db_mb']:>9.2f}"
+              f"{blobs['blobs']:>7}{dedup:>7.0%}  {' '.join(str(v) for v in result['timeline_mb'])}")
+        if result["failed"]:
+            print(f"  {result['failed']} of {result['sessions']} plans failed")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
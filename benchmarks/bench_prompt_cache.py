@@ -0,0 +1,108 @@
+"""
+Prompt Cache Benchmark
+Input tokens, cached-token ratio, latency and cost with and without prompt-prefix caching.
+
+The same plans run twice against the offline fakes: once with every system
+prompt sent inline, once with each agent's stable prefix registered as
+context-cached content. The fake has no provider minimum, so
+``cache_min_tokens`` is lowered to 0 for the cached run. Agent outputs are
+identical in both modes; only the prefill work differs.
+
+Usage:
+    python benchmarks/bench_prompt_cache.py --plans 24 --concurrency 8
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import travel_planner_streamlit as tp  # noqa: E402
+from benchmarks.bench_workflow import trip_state  # noqa: E402
+from benchmarks.fakes import install_fake_llm, install_fake_search, install_fake_weather  # noqa: E402
+from model_router import ModelRouter, load_routing, set_model_router  # noqa: E402
+from prompt_cache import PromptCache, set_prompt_cache  # noqa: E402
+
+
+def run_mode(cached: bool, plans: int, concurrency: int, time_scale: float) -> Dict[str, Any]:
+    prompt_cache = PromptCache(enabled=cached)
+    set_prompt_cache(prompt_cache)
+    routing = load_routing()
+    for profile in routing["profiles"].values():
+        profile["cache_min_tokens"] = 0
+    router = ModelRouter(routing)
+    set_model_router(router)
+
+    agents = tp.create_agents("offline-benchmark")
+    fakes = install_fake_llm(agents, time_scale=time_scale)
+    install_fake_search(latency=0.3 * time_scale * 10)
+    install_fake_weather(latency=0.15 * time_scale * 10)
+    workflow = tp.create_workflow(agents, parallel=True)
+
+    def one_plan(index: int) -> float:
+        start = time.perf_counter()
+        config = {"configurable": {"thread_id": f"prompt_cache_{uuid.uuid4().hex}"}}
+        workflow.invoke(trip_state(index, 5, 1), config)
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one_plan, range(plans)))
+
+    rows = prompt_cache.summary()
+    input_tokens = sum(row["input_tokens"] for row in rows)
+    cached_tokens = sum(row["cached_tokens"] for row in rows)
+    return {
+        "plans": plans,
+        "plan_p50": statistics.median(latencies),
+        "input_tokens": input_tokens,
+        "cached_tokens": cached_tokens,
+        "cached_ratio": cached_tokens / input_tokens if input_tokens else 0.0,
+        "cost_usd": sum(row["cost_usd"] for row in router.summary()),
+        "caches_registered": next(iter(fakes.values())).client.caches.created,
+        "agents": rows,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prompt-prefix caching benchmark")
+    parser.add_argument("--plans", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--time-scale", type=float, default=0.02, help="Multiplier on simulated latencies")
+    args = parser.parse_args()
+
+    # Keep benchmark threads out of the app's checkpoint and blob databases
+    scratch = tempfile.mkdtemp(prefix="travel_bench_")
+    os.environ.setdefault("TRAVEL_PLANNER_CHECKPOINT_PATH", os.path.join(scratch, "checkpoints.sqlite3"))
+    os.environ.setdefault("TRAVEL_PLANNER_BLOB_PATH", os.path.join(scratch, "blobs.sqlite3"))
+
+    results = {mode: run_mode(mode == "cached", args.plans, args.concurrency, args.time_scale)
+               for mode in ("inline", "cached")}
+
+    print(f"{'mode':<8}{'plans':>6}{'p50 s':>8}{'input tok':>11}{'cached tok':>12}{'ratio':>7}"
+          f"{'cost $':>10}{'caches':>8}")
+    for mode, result in results.items():
+        print(f"{mode:<8}{result['plans']:>6}{result['plan_p50']:>8.3f}{result['input_tokens']:>11}"
+              f"{result['cached_tokens']:>12}{result['cached_ratio']:>7.1%}{result['cost_usd']:>10.5f}"
+              f"{result['caches_registered']:>8}")
+
+    print("\nper agent: cached share of input, mean call latency inline vs cached")
+    print(f"{'agent':<16}{'calls':>6}{'ratio':>7}{'inline s':>10}{'cached s':>10}")
+    inline = {row["agent"]: row for row in results["inline"]["agents"]}
+    for row in results["cached"]["agents"]:
+        inline_s = inline.get(row["agent"], {}).get("mean_latency_uncached_s")
+        cached_s = row["mean_latency_cached_s"]
+        print(f"{row['agent']:<16}{row['calls']:>6}{row['cached_ratio']:>7.1%}"
+              f"{'-' if inline_s is None else f'{inline_s:.3f}':>10}{'-' if cached_s is None else f'{cached_s:.3f}':>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
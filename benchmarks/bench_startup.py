@@ -0,0 +1,153 @@
+"""
+Startup Benchmark
+Cold-start cost of the Streamlit app: module import time and first render.
+
+Every sample runs in a fresh interpreter. Import time is parsed from
+``python -X importtime``; the first render is an ``AppTest`` run of the page
+without an API key, i.e. the form a new visitor sees. The benchmark fails if
+any of ``DEFERRED_MODULES`` is loaded by importing the app.
+
+Usage:
+    python benchmarks/bench_startup.py                       # run and print
+    python benchmarks/bench_startup.py --save startup.json   # record a baseline
+    python benchmarks/bench_startup.py --compare startup.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = "travel_planner_streamlit"
+
+# Imported on the first plan, never while rendering the form
+DEFERRED_MODULES = ["langchain_google_genai", "google.genai", "langgraph", "langchain_core", "requests", "bs4"]
+
+# metric -> minimum absolute change (seconds) worth reporting
+REGRESSION_METRICS = {"import_s": 0.05, "first_render_s": 0.05}
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+_RENDER_SCRIPT = """
+import time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({path!r}, default_timeout=120)
+start = time.perf_counter()
+at.run()
+print(time.perf_counter() - start)
+"""
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def import_profile() -> Tuple[float, Dict[str, float]]:
+    """``(total seconds, {direct import: cumulative seconds})`` for one cold import of the app."""
+    stderr = _run(["-X", "importtime", "-c", f"import {APP}"]).stderr
+    total, children, pending = 0.0, {}, {}
+    # Children are listed before their parent, indented one level deeper
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if not match:
+            continue
+        depth, name, cumulative = len(match.group(3)), match.group(4), int(match.group(2)) / 1e6
+        if depth == 1:
+            if name == APP:
+                total, children = cumulative, pending
+            pending = {}
+        elif depth == 3:
+            pending[name] = cumulative
+    return total, children
+
+
+def deferred_loaded() -> List[str]:
+    """Entries of ``DEFERRED_MODULES`` that importing the app pulled in."""
+    code = f"import sys, {APP}; print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    return [name for name in _run(["-c", code]).stdout.strip().split(",") if name]
+
+
+def first_render() -> float:
+    script = _RENDER_SCRIPT.format(path=os.path.join(ROOT, f"{APP}.py"))
+    return float(_run(["-c", script]).stdout.strip().splitlines()[-1])
+
+
+def run(samples: int, render: bool) -> Dict[str, Any]:
+    imports = [import_profile() for _ in range(samples)]
+    result = {
+        "import_s": statistics.median(total for total, _ in imports),
+        "import_min_s": min(total for total, _ in imports),
+        "slowest_imports": dict(sorted(
+            ((name, statistics.median(children.get(name, 0.0) for _, children in imports))
+             for name in imports[0][1]),
+            key=lambda kv: kv[1], reverse=True
+        )[:8]),
+        "deferred_loaded": deferred_loaded(),
+    }
+    if render:
+        renders = [first_render() for _ in range(samples)]
+        result["first_render_s"] = statistics.median(renders)
+        result["first_render_min_s"] = min(renders)
+    return result
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Human-readable regressions beyond ``tolerance`` (fractional)."""
+    regressions = []
+    for metric, min_delta in REGRESSION_METRICS.items():
+        old, new = baseline.get(metric), current.get(metric)
+        if old is None or new is None:
+            continue
+        if new > old * (1 + tolerance) and new - old > min_delta:
+            regressions.append(f"{metric}: {old:.3f} -> {new:.3f} (+{new / old - 1:.0%})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Streamlit cold-start benchmark")
+    parser.add_argument("--samples", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--no-render", action="store_true", help="Only measure imports (skip AppTest)")
+    parser.add_argument("--save", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    result = run(args.samples, render=not args.no_render)
+    print(f"import {APP}: {result['import_s']:.3f}s median, {result['import_min_s']:.3f}s min")
+    if "first_render_s" in result:
+        print(f"first render:  {result['first_render_s']:.3f}s median, {result['first_render_min_s']:.3f}s min")
+    print("slowest direct imports:")
+    for name, seconds in result["slowest_imports"].items():
+        print(f"  {name:<28}{seconds:>8.3f}s")
+
+    failed = False
+    if result["deferred_loaded"]:
+        print(f"\nLoaded at startup but should be deferred: {', '.join(result['deferred_loaded'])}")
+        failed = True
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            failed = True
+        else:
+            print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
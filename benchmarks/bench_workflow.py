@@ -0,0 +1,241 @@
+"""
+Workflow Benchmark
+Deterministic, offline end-to-end benchmark of create_workflow.
+
+Gemini, DuckDuckGo and Open-Meteo are replaced by the fakes in
+``benchmarks/fakes.py``. Every scenario varies concurrency, trip length and
+number of cities, and reports per-node latency, wall time, peak memory growth
+and graph overhead (wall time not explained by the critical path of nodes).
+
+Usage:
+    python benchmarks/bench_workflow.py                       # run and print
+    python benchmarks/bench_workflow.py --save baseline.json  # record a baseline
+    python benchmarks/bench_workflow.py --compare baseline.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import travel_planner_streamlit as tp  # noqa: E402
+from benchmarks.fakes import install_fake_llm, install_fake_search, install_fake_weather  # noqa: E402
+
+CITY_POOL = ["Rome", "Florence", "Venice", "Milan", "Naples", "Bologna", "Turin", "Verona"]
+
+# (name, concurrency, num_days, num_cities, parallel)
+DEFAULT_SCENARIOS = [
+    ("sequential_c1_d5", 1, 5, 1, False),
+    ("parallel_c1_d5", 1, 5, 1, True),
+    ("parallel_c1_d14", 1, 14, 1, True),
+    ("parallel_c1_d10_3city", 1, 10, 3, True),
+    ("parallel_c1_d14_5city", 1, 14, 5, True),
+    ("parallel_c8_d5", 8, 5, 1, True),
+    ("parallel_c32_d5", 32, 5, 1, True),
+]
+
+# Metrics compared against a baseline (higher is worse for all of them), with
+# the absolute change that must also be exceeded so timer noise on tiny values
+# does not count as a regression.
+REGRESSION_METRICS = {
+    "wall_time": 0.05,
+    "plan_p50": 0.02,
+    "plan_p95": 0.02,
+    "graph_overhead_mean": 0.02,
+    "memory_peak_mb": 2.0,
+}
+
+
+class RssSampler:
+    """Background sampler of resident set size, for a peak that includes C allocations.
+    
+    Reads /proc/self/statm (Linux); elsewhere falls back to tracemalloc, which
+    only sees Python allocations and slows the run down.
+    """
+    
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.use_proc = os.path.exists("/proc/self/statm")
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if self.use_proc else 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self.baseline = self.peak = 0
+    
+    def _rss(self) -> int:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * self._page_size
+    
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            self._stop.wait(self.interval)
+    
+    def __enter__(self):
+        if self.use_proc:
+            self.baseline = self.peak = self._rss()
+            self._thread.start()
+        else:
+            tracemalloc.start()
+        return self
+    
+    def __exit__(self, *exc):
+        if self.use_proc:
+            self._stop.set()
+            self._thread.join()
+        else:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return False
+    
+    @property
+    def peak_mb(self) -> float:
+        """Peak growth over the starting RSS (or traced peak), in MB."""
+        return (self.peak - self.baseline) / 1e6
+
+
+def trip_state(plan_index: int, num_days: int, num_cities: int) -> Dict[str, Any]:
+    cities = CITY_POOL[:num_cities]
+    return tp.build_initial_state(
+        destination=" & ".join(cities) if num_cities > 1 else f"{CITY_POOL[plan_index % len(CITY_POOL)]}, Italy",
+        num_days=num_days,
+        travel_style="Culture",
+        budget_range="Mid-Range",
+        start_date="2026-11-20",
+        interests=["History & Culture", "Food & Dining"],
+        headcount=2,
+        multi_city=num_cities > 1,
+        cities=cities
+    )
+
+
+def critical_path(state: Dict[str, Any], parallel: bool) -> float:
+    """Seconds of node work that could not overlap, given the graph shape."""
+    timings = dict(state.get("node_timings") or {})
+    fanout = [timings.pop(name, 0.0) for name in tp.PARALLEL_NODES]
+    # Per-city sub-graph nodes ("research@Rome") run alongside the fan-out
+    fanout += [timings.pop(name) for name in list(timings) if "@" in name]
+    upstream = max(fanout) if parallel else sum(fanout)
+    return upstream + sum(timings.values())
+
+
+def run_scenario(name: str, concurrency: int, num_days: int, num_cities: int,
+                 parallel: bool, plans: int, time_scale: float) -> Dict[str, Any]:
+    agents = tp.create_agents("offline-benchmark")
+    install_fake_llm(agents, time_scale=time_scale)
+    install_fake_search(latency=0.3 * time_scale * 10)
+    install_fake_weather(latency=0.15 * time_scale * 10)
+
+    build_start = time.perf_counter()
+    workflow = tp.create_workflow(agents, parallel=parallel)
+    compile_time = time.perf_counter() - build_start
+
+    def run_plan(index: int) -> Dict[str, Any]:
+        state = trip_state(index, num_days, num_cities)
+        config = {"configurable": {"thread_id": f"bench_{uuid.uuid4().hex}"}}
+        start = time.perf_counter()
+        final_state = workflow.invoke(state, config)
+        latency = time.perf_counter() - start
+        return {"latency": latency, "overhead": latency - critical_path(final_state, parallel),
+                "node_timings": final_state.get("node_timings") or {}}
+
+    with RssSampler() as memory:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(run_plan, range(plans)))
+        wall = time.perf_counter() - start
+
+    latencies = sorted(r["latency"] for r in results)
+    node_latency: Dict[str, List[float]] = {}
+    for r in results:
+        for node, elapsed in r["node_timings"].items():
+            node_latency.setdefault(node, []).append(elapsed)
+
+    return {
+        "config": {"concurrency": concurrency, "num_days": num_days, "cities": num_cities,
+                   "parallel": parallel, "plans": plans, "time_scale": time_scale},
+        "wall_time": wall,
+        "plans_per_second": plans / wall if wall else 0.0,
+        "plan_p50": latencies[len(latencies) // 2],
+        "plan_p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "graph_overhead_mean": statistics.mean(r["overhead"] for r in results),
+        "compile_time": compile_time,
+        "memory_peak_mb": memory.peak_mb,
+        "node_latency_mean": {node: statistics.mean(v) for node, v in sorted(node_latency.items())},
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Human-readable regressions beyond ``tolerance`` (fractional)."""
+    regressions = []
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for metric, min_delta in REGRESSION_METRICS.items():
+            old, new = base.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > min_delta:
+                change = f"+{new / old - 1:.0%}" if old > 0 else f"+{new - old:.4f}"
+                regressions.append(f"{name}.{metric}: {old:.4f} -> {new:.4f} ({change})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline workflow benchmark")
+    parser.add_argument("--plans", type=int, default=8, help="Plans per scenario (at least the concurrency)")
+    parser.add_argument("--time-scale", type=float, default=0.02, help="Multiplier on simulated latencies")
+    parser.add_argument("--only", nargs="*", help="Run only these scenario names")
+    parser.add_argument("--save", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    # Keep benchmark threads out of the app's checkpoint and blob databases
+    scratch = tempfile.mkdtemp(prefix="travel_bench_")
+    os.environ.setdefault("TRAVEL_PLANNER_CHECKPOINT_PATH", os.path.join(scratch, "checkpoints.sqlite3"))
+    os.environ.setdefault("TRAVEL_PLANNER_BLOB_PATH", os.path.join(scratch, "blobs.sqlite3"))
+
+    scenarios = [s for s in DEFAULT_SCENARIOS if not args.only or s[0] in args.only]
+    report = {"scenarios": {}}
+    print(f"{'scenario':<26}{'wall s':>8}{'p50 s':>8}{'p95 s':>8}{'ovh ms':>8}{'mem MB':>8}  slowest node")
+    for name, concurrency, num_days, num_cities, parallel in scenarios:
+        result = run_scenario(name, concurrency, num_days, num_cities, parallel,
+                              max(args.plans, concurrency), args.time_scale)
+        report["scenarios"][name] = result
+        slowest = max(result["node_latency_mean"].items(), key=lambda kv: kv[1])
+        print(f"{name:<26}{result['wall_time']:>8.2f}{result['plan_p50']:>8.2f}{result['plan_p95']:>8.2f}"
+              f"{result['graph_overhead_mean'] * 1000:>8.1f}{result['memory_peak_mb']:>8.1f}"
+              f"  {slowest[0]} {slowest[1]:.2f}s")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
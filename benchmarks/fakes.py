@@ -0,0 +1,361 @@
+"""
+Offline Fakes
+Scripted stand-ins for Gemini, DuckDuckGo and Open-Meteo used by the benchmarks.
+
+Everything is deterministic: latency and output size are drawn from a RNG
+seeded by the agent name and prompt, so the same scenario produces the same
+timings regardless of thread scheduling. The chat model also stands in for
+Gemini context caching (``client.caches`` and the ``cached_content`` call
+option) and reports cache-read input tokens in its usage metadata.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+import types
+import zlib
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from context_packer import estimate_tokens
+
+# Time to first token (median seconds) and output size (mean, stddev tokens)
+# per agent, loosely matching observed Gemini Flash behaviour.
+AGENT_PROFILES = {
+    "ResearchAgent": {"ttft": 1.2, "tokens": (900, 200)},
+    "WeatherAgent": {"ttft": 0.8, "tokens": (500, 100)},
+    "HotelAgent": {"ttft": 1.0, "tokens": (700, 150)},
+    "BudgetAgent": {"ttft": 0.9, "tokens": (600, 120)},
+    "LogisticsAgent": {"ttft": 1.0, "tokens": (700, 150)},
+    "PlannerAgent": {"ttft": 1.5, "tokens": (2500, 500)},
+    "ActivitiesAgent": {"ttft": 1.0, "tokens": (800, 150)},
+}
+DEFAULT_PROFILE = {"ttft": 1.0, "tokens": (600, 100)}
+
+FILLER = ("Visit the old town in the morning, about $25 per person, then lunch near "
+          "the main square around 12:30 and a 2 hours museum stop. ")
+
+
+# HTTP status -> google.rpc status name, as in Gemini error bodies
+_STATUS_NAMES = {400: "INVALID_ARGUMENT", 403: "PERMISSION_DENIED", 404: "NOT_FOUND", 429: "RESOURCE_EXHAUSTED"}
+
+
+def provider_error(code: int, message: str, model: str = "gemini-2.0-flash",
+                   retry_delay: Optional[float] = None) -> Exception:
+    """The error ChatGoogleGenerativeAI raises for an HTTP ``code`` from Gemini.
+
+    Like langchain_google_genai, a ``Google*Error`` (a langchain_core
+    ``Model*Error``) raised from the google.genai ``ClientError`` holding the
+    status code and body, so callers see exactly what the real SDK gives them.
+    """
+    from google.genai.errors import ClientError
+    from langchain_google_genai.chat_models import (
+        ChatGoogleGenerativeAIError, GoogleInvalidRequestError, GooglePermissionDeniedError,
+        GoogleModelNotFoundError, GoogleRateLimitError
+    )
+
+    error_types = {400: GoogleInvalidRequestError, 403: GooglePermissionDeniedError,
+                   404: GoogleModelNotFoundError, 429: GoogleRateLimitError}
+    status = _STATUS_NAMES.get(code, "UNKNOWN")
+    error = {"code": code, "message": message, "status": status}
+    if retry_delay is not None:
+        error["details"] = [{"@type": "type.googleapis.com/google.rpc.RetryInfo",
+                             "retryDelay": f"{retry_delay:.3f}s"}]
+    cause = ClientError(code, {"error": error})
+    wrapped = error_types.get(code, ChatGoogleGenerativeAIError)(
+        f"Error calling model '{model}' ({status}): {cause}")
+    wrapped.__cause__ = cause
+    return wrapped
+
+
+class FakeQuota:
+    """Sliding-window request quota shared by fake models, like a project's RPM limit.
+
+    ``window`` is 60 seconds scaled by the benchmark's ``time_scale``.
+    """
+
+    def __init__(self, requests_per_minute: float, window: float = 60.0):
+        self.limit = requests_per_minute
+        self.window = window
+        self._calls: deque = deque()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def admit(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            while self._calls and self._calls[0] <= now - self.window:
+                self._calls.popleft()
+            if len(self._calls) >= self.limit:
+                self.rejected += 1
+                retry_in = self._calls[0] + self.window - now
+                raise provider_error(429, "Resource has been exhausted (e.g. check quota).", retry_delay=retry_in)
+            self._calls.append(now)
+
+
+class FakeCachedContents:
+    """``client.caches`` double: keeps registered system instructions under generated names."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contents: Dict[str, str] = {}
+        self.created = 0
+
+    def create(self, model: str, config) -> types.SimpleNamespace:
+        digest = hashlib.sha256(f"{model}|{config.system_instruction}".encode("utf-8")).hexdigest()
+        name = f"cachedContents/{digest[:16]}"
+        with self._lock:
+            self._contents[name] = config.system_instruction
+            self.created += 1
+        return types.SimpleNamespace(name=name, model=model)
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            self._contents.pop(name, None)
+
+    def text(self, name: str) -> str:
+        with self._lock:
+            if name not in self._contents:
+                raise provider_error(400, f"Cached content {name} not found or expired.")
+            return self._contents[name]
+
+
+class FakeChatModel:
+    """Chat model double with invoke/ainvoke/stream/astream.
+
+    Latency = lognormal TTFT + uncached input_tokens / prefill_tokens_per_second
+    + output_tokens / tokens_per_second, all multiplied by ``time_scale`` so
+    benchmarks finish quickly. Output size grows with prompt size
+    (``prompt_growth`` extra tokens per prompt token), which is what makes
+    trip length and city count matter. A ``cached_content`` call option
+    prepends the registered prefix, which then counts as cache-read input.
+    """
+
+    def __init__(self, agent_name: str, time_scale: float = 0.02,
+                 tokens_per_second: float = 150.0, prompt_growth: float = 0.5,
+                 failure_rate: float = 0.0, profile: Optional[Dict[str, Any]] = None,
+                 prefill_tokens_per_second: float = 4000.0, client=None,
+                 quota: Optional[FakeQuota] = None):
+        self.agent_name = agent_name
+        self.quota = quota
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.client = client or types.SimpleNamespace(caches=FakeCachedContents())
+        self.profile = profile or AGENT_PROFILES.get(agent_name, DEFAULT_PROFILE)
+        self.time_scale = time_scale
+        self.tokens_per_second = tokens_per_second
+        self.prompt_growth = prompt_growth
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _plan(self, messages: List, cached_content: Optional[str] = None) -> Dict[str, Any]:
+        prompt = "\n".join(str(m.content) for m in messages)
+        prefix = self.client.caches.text(cached_content) if cached_content else ""
+        if prefix:
+            # Same text (and so the same seed) as sending the system prompt inline
+            prompt = f"{prefix}\n{prompt}"
+        input_tokens, cached_tokens = estimate_tokens(prompt), estimate_tokens(prefix) if prefix else 0
+        if self.quota is not None:
+            self.quota.admit()
+        seed = hashlib.sha256(f"{self.agent_name}|{prompt}".encode("utf-8")).digest()
+        rng = random.Random(seed)
+        mean, stddev = self.profile["tokens"]
+        tokens = max(50, int(rng.gauss(mean, stddev) + self.prompt_growth * input_tokens))
+        ttft = rng.lognormvariate(0, 0.25) * self.profile["ttft"]
+        ttft += (input_tokens - cached_tokens) / self.prefill_tokens_per_second
+        with self._lock:
+            self.calls += 1
+        return {
+            "prompt": prompt,
+            "tokens": tokens,
+            "ttft": ttft * self.time_scale,
+            "decode": tokens / self.tokens_per_second * self.time_scale,
+            "fail": rng.random() < self.failure_rate,
+            "usage": {"input_tokens": input_tokens, "output_tokens": tokens,
+                      "total_tokens": input_tokens + tokens,
+                      "input_token_details": {"cache_read": cached_tokens}},
+        }
+
+    def _text(self, tokens: int, prompt: str) -> str:
+        if "JSON Schema" in prompt:
+            return self._json_text(tokens)
+        text = f"Estimated total $1,{tokens % 1000:03d} for the group.\n"
+        while estimate_tokens(text) < tokens:
+            text += FILLER
+        return text
+
+    def _json_text(self, tokens: int) -> str:
+        """Schema-valid reply for the structured agents, padded to ``tokens``."""
+        total = 1000 + tokens % 1000
+        if self.agent_name == "BudgetAgent":
+            payload = {
+                "currency": "USD", "total": total, "per_person": total / 2,
+                "per_day": [{"day": d, "total": total / 5} for d in range(1, 6)],
+                "categories": {"accommodation": total * 0.4, "food": total * 0.25,
+                               "transport": total * 0.15, "activities": total * 0.2},
+                "tips": [],
+            }
+            padded = payload["tips"]
+        elif self.agent_name == "HotelAgent":
+            payload = {"options": [
+                {"name": f"Hotel {i + 1}", "area": "Old Town", "price_per_night": 90 + 30 * i,
+                 "rating": 4.0 + i / 10, "highlights": ""} for i in range(3)
+            ], "notes": ""}
+            padded = None
+        else:
+            payload = {
+                "overview": "Walk and use the metro.",
+                "passes": [{"name": "3-day transit pass", "price": 25}],
+                "legs": [{"from_place": "Airport", "to_place": "Center", "mode": "train",
+                          "duration_minutes": 35, "cost": 12}],
+                "tips": [],
+            }
+            padded = payload["tips"]
+        while estimate_tokens(json.dumps(payload)) < tokens:
+            if padded is None:
+                payload["notes"] += FILLER
+            else:
+                padded.append(FILLER.strip())
+        return json.dumps(payload)
+
+    def _chunks(self, text: str, pieces: int = 20) -> List[str]:
+        size = max(1, len(text) // pieces)
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def invoke(self, messages: List, cached_content: Optional[str] = None, **kwargs) -> AIMessage:
+        plan = self._plan(messages, cached_content)
+        time.sleep(plan["ttft"] + plan["decode"])
+        if plan["fail"]:
+            raise RuntimeError(f"{self.agent_name}: injected failure")
+        return AIMessage(content=self._text(plan["tokens"], plan["prompt"]), usage_metadata=plan["usage"])
+
+    async def ainvoke(self, messages: List, cached_content: Optional[str] = None, **kwargs) -> AIMessage:
+        plan = self._plan(messages, cached_content)
+        await asyncio.sleep(plan["ttft"] + plan["decode"])
+        if plan["fail"]:
+            raise RuntimeError(f"{self.agent_name}: injected failure")
+        return AIMessage(content=self._text(plan["tokens"], plan["prompt"]), usage_metadata=plan["usage"])
+
+    def stream(self, messages: List, cached_content: Optional[str] = None, **kwargs):
+        plan = self._plan(messages, cached_content)
+        time.sleep(plan["ttft"])
+        if plan["fail"]:
+            raise RuntimeError(f"{self.agent_name}: injected failure")
+        chunks = self._chunks(self._text(plan["tokens"], plan["prompt"]))
+        for i, chunk in enumerate(chunks):
+            time.sleep(plan["decode"] / len(chunks))
+            # Usage arrives with the final chunk, as in Gemini streams
+            yield AIMessageChunk(content=chunk, usage_metadata=plan["usage"] if i == len(chunks) - 1 else None)
+
+    async def astream(self, messages: List, cached_content: Optional[str] = None, **kwargs):
+        plan = self._plan(messages, cached_content)
+        await asyncio.sleep(plan["ttft"])
+        if plan["fail"]:
+            raise RuntimeError(f"{self.agent_name}: injected failure")
+        chunks = self._chunks(self._text(plan["tokens"], plan["prompt"]))
+        for i, chunk in enumerate(chunks):
+            await asyncio.sleep(plan["decode"] / len(chunks))
+            yield AIMessageChunk(content=chunk, usage_metadata=plan["usage"] if i == len(chunks) - 1 else None)
+
+
+def install_fake_llm(agents: Dict[str, Any], **options) -> Dict[str, FakeChatModel]:
+    """Swap the ChatGoogleGenerativeAI of every agent's model tiers for one FakeChatModel per agent.
+
+    The fakes share one ``client``, so context caches are registered once per
+    prefix, and one ``quota`` if given.
+    """
+    fakes = {}
+    options.setdefault("client", types.SimpleNamespace(caches=FakeCachedContents()))
+    for key, agent in agents.items():
+        fakes[key] = FakeChatModel(agent.name, **options)
+        for tier in agent.tiers:
+            tier["llm"] = fakes[key]
+    return fakes
+
+
+class FakeDDGS:
+    """Drop-in for ``ddgs.DDGS`` returning canned results after a fixed delay."""
+
+    latency = 0.3
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def text(self, query: str, max_results: int = 6):
+        time.sleep(self.latency)
+        for i in range(max_results):
+            yield {
+                "title": f"{query.title()} guide #{i + 1}",
+                "href": f"https://example.com/{zlib.crc32(query.encode()) % 1000}/{i}",
+                "body": f"Travellers recommend {query} option {i + 1}; prices from ${20 + 5 * i}.",
+            }
+
+
+def install_fake_search(latency: float = 0.3) -> None:
+    """Make web_search_tool's ``from ddgs import DDGS`` resolve to FakeDDGS."""
+    FakeDDGS.latency = latency
+    module = types.ModuleType("ddgs")
+    module.DDGS = FakeDDGS
+    sys.modules["ddgs"] = module
+    # The app resolves DDGS once; drop a real client resolved before the fake was installed
+    app = sys.modules.get("travel_planner_streamlit")
+    if app is not None:
+        app._ddgs_class = None
+
+
+class _FakeResponse:
+    def __init__(self, payload: Dict[str, Any]):
+        self._payload = payload
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> Dict[str, Any]:
+        return self._payload
+
+
+class FakeOpenMeteoSession:
+    """Stands in for ``requests.Session`` with geocoding and forecast endpoints."""
+
+    def __init__(self, latency: float = 0.15):
+        self.latency = latency
+        self.calls = 0
+
+    def get(self, url: str, params: Dict[str, Any], timeout: float = 10) -> _FakeResponse:
+        time.sleep(self.latency)
+        self.calls += 1
+        if "geocoding" in url:
+            name = params["name"]
+            seed = sum(map(ord, name))
+            return _FakeResponse({"results": [{
+                "name": name, "latitude": 35 + seed % 20, "longitude": seed % 30
+            }]})
+        start = time.strptime(params["start_date"], "%Y-%m-%d")
+        end = time.strptime(params["end_date"], "%Y-%m-%d")
+        days = int((time.mktime(end) - time.mktime(start)) // 86400) + 1
+        first = time.mktime(start)
+        return _FakeResponse({"daily": {
+            "time": [time.strftime("%Y-%m-%d", time.localtime(first + i * 86400)) for i in range(days)],
+            "temperature_2m_max": [18 + i % 5 for i in range(days)],
+            "temperature_2m_min": [9 + i % 3 for i in range(days)],
+            "weathercode": [(0, 2, 61, 3)[i % 4] for i in range(days)],
+            "precipitation_probability_max": [(10, 30, 70, 20)[i % 4] for i in range(days)],
+        }})
+
+
+def install_fake_weather(latency: float = 0.15) -> FakeOpenMeteoSession:
+    """Point the shared WeatherClient at a fresh FakeOpenMeteoSession."""
+    from weather_client import WeatherClient, set_weather_client
+
+    session = FakeOpenMeteoSession(latency)
+    set_weather_client(WeatherClient(session=session))
+    return session
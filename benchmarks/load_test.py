@@ -0,0 +1,400 @@
+"""
+Load Test
+Many simultaneous planners against one server process, for capacity planning.
+
+Users arrive as a Poisson process at ``--rates`` per second (one stage per
+rate) for ``--duration`` seconds, each planning a trip drawn from ``--mix``.
+Plans take the same path as in the Streamlit app: agent registry,
+``SingleFlight`` and the ``JobQueue`` worker pool, with the offline fakes
+from ``benchmarks/fakes.py`` standing in for Gemini, search and weather.
+The default ``--time-scale 1`` keeps realistic LLM latency; smaller values
+shrink every simulated latency and quota window for quick runs.
+
+Two targets:
+
+    workflow  each user submits through SingleFlight/JobQueue and waits for the result
+    app       each user drives the Streamlit page through ``AppTest`` (form, click, stream)
+
+Each stage reports throughput, end-to-end latency percentiles (queueing
+included), queue wait, error rate by cause, and a timeline of RSS, running
+and waiting plans. ``--provider-rpm`` makes the fake provider answer calls
+over that quota with 429s, which ProviderGuard retries.
+
+Usage:
+    python benchmarks/load_test.py --rates 0.5 1 2 --duration 60
+    python benchmarks/load_test.py --rates 5 --duration 30 --time-scale 0.1 --workers 16
+    python benchmarks/load_test.py --target app --rates 1 --duration 20 --time-scale 0.1
+    python benchmarks/load_test.py --save load.json
+    python benchmarks/load_test.py --compare load.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Trip shape -> (days, cities); cities > 1 plans a multi-city route
+TRIPS = {
+    "weekend": (2, 1),
+    "single": (5, 1),
+    "long": (14, 1),
+    "multi": (10, 3),
+}
+DEFAULT_MIX = "weekend=2,single=5,long=2,multi=1"
+
+DESTINATIONS = ["Rome", "Florence", "Venice", "Milan", "Naples", "Paris", "Lyon", "Nice",
+                "Barcelona", "Madrid", "Seville", "Lisbon", "Porto", "Vienna", "Prague", "Budapest",
+                "Berlin", "Munich", "Amsterdam", "Copenhagen", "Stockholm", "Athens", "Istanbul", "Dubrovnik"]
+
+# metric -> minimum absolute change worth reporting (seconds, or fraction for error_rate)
+REGRESSION_METRICS = {"latency_p95": 0.5, "latency_p99": 0.5, "error_rate": 0.02}
+
+_APP_SCRIPT = "import travel_planner_streamlit as tp\ntp.main()\n"
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """``"single=5,multi=1"`` -> normalized weights per trip shape."""
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in TRIPS:
+            raise ValueError(f"Unknown trip shape {name!r}; choose from {', '.join(TRIPS)}")
+        weights[name.strip()] = float(weight or 1)
+    total = sum(weights.values())
+    return {name: weight / total for name, weight in weights.items()}
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (``q`` in 0-100), None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+class Trip:
+    """One user's request, drawn from the mix."""
+
+    def __init__(self, rng: random.Random, mix: Dict[str, float], destinations: int):
+        self.shape = rng.choices(list(mix), weights=list(mix.values()))[0]
+        self.days, num_cities = TRIPS[self.shape]
+        pool = DESTINATIONS[:destinations]
+        self.cities = rng.sample(pool, min(num_cities, len(pool)))
+        self.destination = " & ".join(self.cities) if num_cities > 1 else self.cities[0]
+
+    def state(self) -> Dict[str, Any]:
+        import travel_planner_streamlit as tp
+        return tp.build_initial_state(
+            destination=self.destination,
+            num_days=self.days,
+            travel_style="Culture",
+            budget_range="Mid-Range",
+            start_date="2026-11-20",
+            interests=["History & Culture", "Food & Dining"],
+            headcount=2,
+            multi_city=len(self.cities) > 1,
+            cities=self.cities if len(self.cities) > 1 else []
+        )
+
+
+class Sampler:
+    """Background timeline of RSS and queue load."""
+
+    def __init__(self, queue, interval: float):
+        self.queue = queue
+        self.interval = interval
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self.start = time.perf_counter()
+        self.samples: List[Dict[str, float]] = []
+
+    def rss_mb(self) -> float:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * self._page_size / 1e6
+
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            snapshot = self.queue.snapshot()
+            self.samples.append({"t": time.perf_counter() - self.start, "rss_mb": self.rss_mb(),
+                                 "running": snapshot["running"], "pending": snapshot["pending"],
+                                 "complete": snapshot["complete"], "failed": snapshot["failed"]})
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def install_fakes(time_scale: float, provider_rpm: Optional[float], failure_rate: float):
+    """Make every agent set the app creates use the fakes; returns the shared quota (or None)."""
+    import travel_planner_streamlit as tp
+    from benchmarks.fakes import FakeQuota, install_fake_llm, install_fake_search, install_fake_weather
+
+    quota = FakeQuota(provider_rpm, window=60 * time_scale) if provider_rpm else None
+    create_agents = tp.create_agents
+
+    def create_fake_agents(api_key, **kwargs):
+        agents = create_agents(api_key, **kwargs)
+        install_fake_llm(agents, time_scale=time_scale, quota=quota, failure_rate=failure_rate)
+        return agents
+
+    tp.create_agents = create_fake_agents
+    install_fake_search(latency=0.3 * time_scale)
+    install_fake_weather(latency=0.15 * time_scale)
+    return quota
+
+
+def workflow_user(trip: Trip, registry, use_cache: bool) -> Dict[str, Any]:
+    """Submit one plan the way the app does and wait for it."""
+    import travel_planner_streamlit as tp
+    from single_flight import get_single_flight, plan_key
+
+    # A new session's first plan with the sidebar defaults
+    options = dict(tp.DEFAULT_WORKFLOW_OPTIONS)
+    resources = registry.get("load-test", use_cache=use_cache, **options)
+    workflow = resources["workflow"]
+    state = trip.state()
+    run_input = tp.fresh_run_input(state) if options["incremental"] else state
+    config = {"configurable": {"thread_id": f"load_{uuid.uuid4().hex}"}}
+    flight, leader = get_single_flight().join(plan_key(state, credentials=resources["key"], use_cache=use_cache, scope=None,
+                                                       **options),
+                                              workflow, run_input, config, on_start=tp.mark_run_start)
+    flight.result()
+    return {"leader": leader,
+            "queue_wait": (flight.started_at or flight.submitted_at) - flight.submitted_at}
+
+
+def app_user(trip: Trip, script: str, timeout: float) -> Dict[str, Any]:
+    """Fill in the form and generate a plan through Streamlit's test client."""
+    from streamlit.testing.v1 import AppTest
+    from job_queue import QueueFull
+
+    at = AppTest.from_file(script, default_timeout=timeout)
+    at.run()
+    at.sidebar.text_input[0].input("load-test")
+    at.run()
+    at.main.text_input[0].input(trip.destination)
+    at.main.slider[0].set_value(trip.days)
+    if len(trip.cities) > 1:
+        at.main.checkbox[0].check()
+        at.run()
+        at.main.text_input[1].input(", ".join(trip.cities))
+    at.button[0].click()
+    at.run()
+    busy = [w.value for w in at.warning if "busy" in w.value]
+    if busy:
+        raise QueueFull(busy[0])
+    problems = [e.value for e in at.exception] + [e.value for e in at.error]
+    if problems:
+        raise RuntimeError(problems[0])
+    return {"leader": True, "queue_wait": None}
+
+
+def run_stage(rate: float, args, registry, mix: Dict[str, float], script: Optional[str]) -> Dict[str, Any]:
+    """One arrival rate on a fresh queue; returns the stage summary."""
+    from job_queue import JobQueue, set_job_queue
+    from single_flight import SingleFlight, set_single_flight
+
+    queue = JobQueue(workers=args.workers, max_pending=args.max_pending)
+    set_job_queue(queue)
+    set_single_flight(SingleFlight(queue))
+    rng = random.Random(f"{args.seed}|{rate}")
+    results: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    def user(trip: Trip) -> None:
+        start = time.perf_counter()
+        outcome = {"shape": trip.shape, "error": None}
+        try:
+            if args.target == "app":
+                outcome.update(app_user(trip, script, args.timeout))
+            else:
+                outcome.update(workflow_user(trip, registry, args.response_cache))
+        except Exception as e:
+            outcome["error"] = type(e).__name__
+        outcome["latency"] = time.perf_counter() - start
+        with lock:
+            results.append(outcome)
+
+    threads = []
+    with Sampler(queue, args.sample_interval) as sampler:
+        start = time.perf_counter()
+        next_arrival = 0.0
+        while next_arrival < args.duration:
+            delay = start + next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            thread = threading.Thread(target=user, args=(Trip(rng, mix, args.destinations),), daemon=True)
+            thread.start()
+            threads.append(thread)
+            next_arrival += rng.expovariate(rate)
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+    ok = [r for r in results if r["error"] is None]
+    latencies = [r["latency"] for r in ok]
+    waits = [r["queue_wait"] for r in ok if r.get("queue_wait") is not None]
+    peak = max(sampler.samples, key=lambda s: s["rss_mb"])
+    return {
+        "rate": rate,
+        "arrivals": len(results),
+        "completed": len(ok),
+        "shared": sum(1 for r in ok if not r["leader"]),
+        "wall_time": wall,
+        "throughput_per_min": len(ok) / wall * 60,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_p99": percentile(latencies, 99),
+        "latency_by_shape": {shape: statistics.median(r["latency"] for r in ok if r["shape"] == shape)
+                             for shape in sorted({r["shape"] for r in ok})},
+        "queue_wait_p50": percentile(waits, 50),
+        "queue_wait_p95": percentile(waits, 95),
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "errors": dict(Counter(r["error"] for r in results if r["error"])),
+        "max_running": max(s["running"] for s in sampler.samples),
+        "max_pending": max(s["pending"] for s in sampler.samples),
+        "rss_start_mb": sampler.samples[0]["rss_mb"],
+        "rss_peak_mb": peak["rss_mb"],
+        "rss_end_mb": sampler.samples[-1]["rss_mb"],
+        "timeline": sampler.samples[::max(1, len(sampler.samples) // 12)],
+    }
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def print_stage(result: Dict[str, Any]) -> None:
+    print(f"\nrate {result['rate']}/s: {result['arrivals']} users, {result['completed']} completed "
+          f"({result['shared']} shared an identical run) in {result['wall_time']:.1f}s")
+    print(f"  throughput {result['throughput_per_min']:.1f} plans/min, error rate {result['error_rate']:.1%}"
+          + (f" {result['errors']}" if result["errors"] else ""))
+    print(f"  latency p50 {_seconds(result['latency_p50'])}s  p95 {_seconds(result['latency_p95'])}s  "
+          f"p99 {_seconds(result['latency_p99'])}s; queue wait p50 {_seconds(result['queue_wait_p50'])}s  "
+          f"p95 {_seconds(result['queue_wait_p95'])}s")
+    print("  median latency by trip: " + ", ".join(f"{shape} {seconds:.2f}s"
+                                                   for shape, seconds in result["latency_by_shape"].items()))
+    print(f"  RSS {result['rss_start_mb']:.0f} -> peak {result['rss_peak_mb']:.0f} -> "
+          f"{result['rss_end_mb']:.0f} MB; max {result['max_running']} running, {result['max_pending']} waiting")
+    print(f"  {'t s':>7}{'RSS MB':>9}{'running':>9}{'waiting':>9}{'done':>7}{'failed':>8}")
+    for sample in result["timeline"]:
+        print(f"  {sample['t']:>7.1f}{sample['rss_mb']:>9.0f}{sample['running']:>9}{sample['pending']:>9}"
+              f"{sample['complete']:>7}{sample['failed']:>8}")
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Human-readable regressions beyond ``tolerance`` (fractional), per arrival rate."""
+    regressions = []
+    for rate, result in current["stages"].items():
+        old_result = baseline.get("stages", {}).get(rate)
+        if not old_result:
+            continue
+        for metric, min_delta in REGRESSION_METRICS.items():
+            old, new = old_result.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > min_delta:
+                regressions.append(f"rate {rate}: {metric} {old:.3f} -> {new:.3f}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Concurrent-user load test")
+    parser.add_argument("--target", choices=["workflow", "app"], default="workflow")
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.5, 1.0, 2.0],
+                        help="Arrival rates (users per second), one stage each")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of arrivals per stage")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Trip shape weights ({', '.join(TRIPS)})")
+    parser.add_argument("--destinations", type=int, default=len(DESTINATIONS),
+                        help="Destination pool size; smaller pools repeat trips more often")
+    parser.add_argument("--workers", type=int, default=8, help="Job queue workers")
+    parser.add_argument("--max-pending", type=int, default=32, help="Job queue backlog limit")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier on simulated latencies")
+    parser.add_argument("--provider-rpm", type=float, help="Fake provider request quota (429s beyond it)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Injected transient LLM failures")
+    parser.add_argument("--response-cache", action="store_true", help="Serve repeat prompts from the response cache")
+    parser.add_argument("--sample-interval", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=600, help="Per-user AppTest timeout")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--save", help="Write results as a JSON baseline")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # Keep load-test threads out of the app's checkpoint, blob and response-cache databases
+    scratch = tempfile.mkdtemp(prefix="travel_load_")
+    os.environ.setdefault("TRAVEL_PLANNER_CHECKPOINT_PATH", os.path.join(scratch, "checkpoints.sqlite3"))
+    os.environ.setdefault("TRAVEL_PLANNER_BLOB_PATH", os.path.join(scratch, "blobs.sqlite3"))
+    os.environ.setdefault("TRAVEL_PLANNER_CACHE_PATH", os.path.join(scratch, "responses.sqlite3"))
+
+    import travel_planner_streamlit as tp
+    from provider_guard import DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, ProviderGuard, set_provider_guard
+
+    mix = parse_mix(args.mix)
+    quota = install_fakes(args.time_scale, args.provider_rpm, args.failure_rate)
+    # The limiter and backoff run on the same compressed clock as the fakes
+    set_provider_guard(ProviderGuard(requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE / args.time_scale,
+                                     tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE / args.time_scale,
+                                     base_delay=args.time_scale, max_delay=30 * args.time_scale))
+    registry = tp.AgentRegistry()
+
+    script = None
+    if args.target == "app":
+        import streamlit.logger
+        # Worker threads have no ScriptRunContext; the warning for each is noise here
+        streamlit.logger.get_logger("streamlit").setLevel("ERROR")
+        script = os.path.join(scratch, "app.py")
+        with open(script, "w", encoding="utf-8") as f:
+            f.write(_APP_SCRIPT)
+        # Lazily imported modules (e.g. pyarrow) are not safe to import from many threads at once
+        app_user(Trip(random.Random(0), {"weekend": 1.0}, 1), script, args.timeout)
+
+    print(f"target {args.target}, mix {args.mix}, {args.workers} workers, time scale {args.time_scale}"
+          + (f", provider quota {args.provider_rpm:.0f} rpm" if args.provider_rpm else ""))
+    report = {"config": {key: value for key, value in vars(args).items()
+                         if key not in ("save", "compare", "tolerance")}, "stages": {}}
+    for rate in args.rates:
+        result = run_stage(rate, args, registry, mix, script)
+        report["stages"][str(rate)] = result
+        print_stage(result)
+    if quota is not None:
+        print(f"\nfake provider rejected {quota.rejected} calls over quota")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
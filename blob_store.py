@@ -0,0 +1,216 @@
+"""
+Blob Store
+Content-addressed storage for large text in workflow state and checkpoints.
+
+Agent outputs are several KB each and are copied into every checkpoint and
+every retained job event. Strings of at least ``min_size`` characters are
+stored once, keyed by SHA-256, and replaced by ``{"__blob__": "<sha256>"}``:
+
+    compact = store.compact(state)   # references instead of text
+    state = store.expand(compact)    # the same text objects, via a bounded LRU
+
+Blobs are deduplicated across steps, threads and sessions. ``BlobSerializer``
+applies this to a LangGraph checkpointer, so checkpoints hold only references.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_BLOB_PATH = os.path.join(".travel_planner_cache", "blobs.sqlite3")
+
+BLOB_KEY = "__blob__"
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_MEMORY_MB = 32
+
+# Re-storing a blob refreshes its last use at most this often (pruning is by last use)
+TOUCH_INTERVAL = 3600
+
+
+class MissingBlobError(KeyError):
+    """A reference whose blob was pruned or never stored here."""
+
+
+class BlobStore:
+    """SQLite-backed, zlib-compressed blobs with an in-memory LRU of decoded text."""
+
+    def __init__(self, path: str = DEFAULT_BLOB_PATH, min_size: int = DEFAULT_MIN_SIZE,
+                 memory_mb: float = DEFAULT_MEMORY_MB):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.min_size = min_size
+        # Budget for the decoded-text LRU, counted in characters
+        self.memory_chars = int(memory_mb * 1024 * 1024)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_last_used ON blobs (last_used)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # digest -> (text, last touch)
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._memory_size = 0
+        # id() of each remembered text -> digest; state re-saved every step holds the same
+        # string objects, so this skips re-hashing them (the LRU keeps the ids alive)
+        self._ids: Dict[int, str] = {}
+        self.stats = {"puts": 0, "deduplicated": 0, "memory_hits": 0, "disk_reads": 0}
+
+    def _remember(self, digest: str, text: str, touched: float) -> None:
+        # Called with the lock held
+        if digest in self._memory:
+            self._memory.move_to_end(digest)
+            self._memory[digest] = (self._memory[digest][0], touched)
+            return
+        self._memory[digest] = (text, touched)
+        self._memory_size += len(text)
+        self._ids[id(text)] = digest
+        while self._memory_size > self.memory_chars and len(self._memory) > 1:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._forget(evicted)
+
+    def _forget(self, text: str) -> None:
+        self._memory_size -= len(text)
+        self._ids.pop(id(text), None)
+
+    def _known_digest(self, text: str) -> Optional[str]:
+        with self._lock:
+            digest = self._ids.get(id(text))
+            entry = self._memory.get(digest) if digest else None
+            return digest if entry is not None and entry[0] is text else None
+
+    def put(self, text: str) -> str:
+        """Store ``text`` (once per content) and return its digest."""
+        digest = self._known_digest(text) or hashlib.sha256(text.encode("utf-8")).hexdigest()
+        now = time.time()
+        with self._lock:
+            self.stats["puts"] += 1
+            cached = self._memory.get(digest)
+            if cached is not None and now - cached[1] < TOUCH_INTERVAL:
+                self.stats["deduplicated"] += 1
+                self._memory.move_to_end(digest)
+                return digest
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO blobs (digest, data, size, last_used) VALUES (?, ?, ?, ?)",
+                (digest, zlib.compress(text.encode("utf-8")), len(text), now)
+            )
+            if cursor.rowcount == 0:
+                self.stats["deduplicated"] += 1
+                self._conn.execute("UPDATE blobs SET last_used = ? WHERE digest = ?", (now, digest))
+            self._conn.commit()
+            self._remember(digest, cached[0] if cached else text, now)
+        return digest
+
+    def get(self, digest: str) -> str:
+        """Text for ``digest``; raises ``MissingBlobError`` if it is not stored."""
+        with self._lock:
+            cached = self._memory.get(digest)
+            if cached is not None:
+                self.stats["memory_hits"] += 1
+                self._memory.move_to_end(digest)
+                return cached[0]
+            row = self._conn.execute("SELECT data, last_used FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                raise MissingBlobError(digest)
+            self.stats["disk_reads"] += 1
+            text = zlib.decompress(row[0]).decode("utf-8")
+            self._remember(digest, text, row[1])
+            return text
+
+    def compact(self, value: Any) -> Any:
+        """Copy of ``value`` with long strings (in dicts, lists and tuples) replaced by references."""
+        if isinstance(value, str):
+            return {BLOB_KEY: self.put(value)} if len(value) >= self.min_size else value
+        if isinstance(value, dict):
+            return {key: self.compact(item) for key, item in value.items()}
+        if type(value) in (list, tuple):
+            return type(value)(self.compact(item) for item in value)
+        return value
+
+    def expand(self, value: Any) -> Any:
+        """Inverse of ``compact``."""
+        if isinstance(value, dict):
+            if len(value) == 1 and BLOB_KEY in value:
+                return self.get(value[BLOB_KEY])
+            return {key: self.expand(item) for key, item in value.items()}
+        if type(value) in (list, tuple):
+            return type(value)(self.expand(item) for item in value)
+        return value
+
+    def prune(self, older_than: float) -> int:
+        """Delete blobs not stored or re-stored for ``older_than`` seconds; returns how many.
+
+        Touches are batched, so a blob's recorded last use can lag its real one by up to
+        ``TOUCH_INTERVAL``; the window is widened by that much.
+        """
+        cutoff = time.time() - (older_than + TOUCH_INTERVAL)
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM blobs WHERE last_used < ?", (cutoff,))
+            self._conn.commit()
+            for digest in [d for d, (_, touched) in self._memory.items() if touched < cutoff]:
+                text, _ = self._memory.pop(digest)
+                self._forget(text)
+            return cursor.rowcount
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            blobs, chars, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+            ).fetchone()
+            return {"blobs": blobs, "text_mb": round(chars / 1e6, 2), "stored_mb": round(stored / 1e6, 2),
+                    "memory_mb": round(self._memory_size / 1e6, 2), **self.stats}
+
+
+class BlobSerializer:
+    """LangGraph ``SerializerProtocol`` wrapper that stores long strings in a ``BlobStore``."""
+
+    def __init__(self, inner, store: BlobStore):
+        self.inner = inner
+        self.store = store
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        return self.inner.dumps_typed(self.store.compact(obj))
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        return self.store.expand(self.inner.loads_typed(data))
+
+
+_default_store: Optional[BlobStore] = None
+_default_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """Process-wide store at ``TRAVEL_PLANNER_BLOB_PATH`` (or the default path).
+
+    ``TRAVEL_PLANNER_BLOB_MIN_SIZE`` and ``TRAVEL_PLANNER_BLOB_MEMORY_MB`` tune it.
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = BlobStore(
+                os.environ.get("TRAVEL_PLANNER_BLOB_PATH", DEFAULT_BLOB_PATH),
+                min_size=int(os.environ.get("TRAVEL_PLANNER_BLOB_MIN_SIZE", DEFAULT_MIN_SIZE)),
+                memory_mb=float(os.environ.get("TRAVEL_PLANNER_BLOB_MEMORY_MB", DEFAULT_MEMORY_MB)),
+            )
+        return _default_store
+
+
+def set_blob_store(store: Optional[BlobStore]) -> None:
+    """Replace the process-wide store (e.g. one at a temporary path)."""
+    global _default_store
+    with _default_lock:
+        _default_store = store
@@ -0,0 +1,157 @@
+"""
+Checkpoint Store
+Durable SQLite checkpointer for workflow threads, with retention-based pruning.
+
+Checkpoints survive restarts, so a run that failed part-way can be resumed
+from its last completed step with ``workflow.stream(None, config)``. Long
+strings in checkpoints are stored once in the ``BlobStore`` and referenced
+by hash.
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, Optional, Sequence
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from blob_store import BlobSerializer, BlobStore, get_blob_store
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(".travel_planner_cache", "checkpoints.sqlite3")
+
+# Threads untouched for this long are deleted; resuming is only useful shortly after a failure
+DEFAULT_RETENTION = 3 * 24 * 3600
+PRUNE_INTERVAL = 600
+
+
+class DurableCheckpointer(SqliteSaver):
+    """File-backed ``SqliteSaver`` usable from threads and event loops.
+
+    The sync methods of ``SqliteSaver`` already serialize access with a lock;
+    the async ones run those in a worker thread. Threads not written for
+    ``retention`` seconds (``0`` keeps everything) are deleted at start-up and
+    at most every ``prune_interval`` seconds afterwards, together with blobs
+    no checkpoint has stored in that window.
+    """
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_PATH, retention: float = DEFAULT_RETENTION,
+                 prune_interval: float = PRUNE_INTERVAL, blobs: Optional[BlobStore] = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL with NORMAL sync survives process crashes without an fsync per checkpoint
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self.blobs = blobs or get_blob_store()
+        super().__init__(conn, serde=BlobSerializer(JsonPlusSerializer(), self.blobs))
+        self.path = path
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        with self.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS thread_activity (
+                    thread_id TEXT PRIMARY KEY,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_thread_activity_updated ON thread_activity (updated_at)"
+            )
+        self.prune()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        self._touch(config["configurable"]["thread_id"])
+        return saved
+
+    def _touch(self, thread_id: str) -> None:
+        now = time.time()
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)",
+                (str(thread_id), now)
+            )
+        if now - self._last_prune >= self.prune_interval:
+            self.prune(now)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Delete threads idle for longer than ``retention``; returns how many were removed."""
+        now = now or time.time()
+        self._last_prune = now
+        if self.retention <= 0:
+            return 0
+        with self.cursor() as cur:
+            stale = [row[0] for row in cur.execute(
+                "SELECT thread_id FROM thread_activity WHERE updated_at < ?", (now - self.retention,)
+            ).fetchall()]
+            for thread_id in stale:
+                cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                cur.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+                cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (thread_id,))
+        # Every checkpoint write re-stores the blobs it references, so these are unreferenced
+        self.blobs.prune(self.retention)
+        return len(stale)
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    def stats(self) -> Dict[str, Any]:
+        with self.cursor(transaction=False) as cur:
+            (threads,) = cur.execute("SELECT COUNT(*) FROM thread_activity").fetchone()
+            (checkpoints,) = cur.execute("SELECT COUNT(*) FROM checkpoints").fetchone()
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {"threads": threads, "checkpoints": checkpoints, "size_mb": round(size / 1e6, 2),
+                "blobs": self.blobs.summary()}
+
+    # Async API: same storage, off the event loop
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes: Sequence, task_id: str, task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aget_delta_channel_history(self, *, config, channels):
+        return await asyncio.to_thread(
+            lambda: self.get_delta_channel_history(config=config, channels=channels)
+        )
+
+
+_default_checkpointer: Optional[DurableCheckpointer] = None
+_default_lock = threading.Lock()
+
+
+def get_checkpointer() -> DurableCheckpointer:
+    """Process-wide checkpointer at ``TRAVEL_PLANNER_CHECKPOINT_PATH`` (or the default path).
+
+    ``TRAVEL_PLANNER_CHECKPOINT_RETENTION_HOURS`` overrides the retention window.
+    """
+    global _default_checkpointer
+    with _default_lock:
+        if _default_checkpointer is None:
+            retention = os.environ.get("TRAVEL_PLANNER_CHECKPOINT_RETENTION_HOURS")
+            _default_checkpointer = DurableCheckpointer(
+                os.environ.get("TRAVEL_PLANNER_CHECKPOINT_PATH", DEFAULT_CHECKPOINT_PATH),
+                retention=float(retention) * 3600 if retention else DEFAULT_RETENTION
+            )
+        return _default_checkpointer
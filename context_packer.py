@@ -0,0 +1,123 @@
+"""
+Context Packer
+Token-budgeted, extractive compression of agent outputs for downstream prompts.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Phrases LLMs use to pad answers; sentences built around them carry no facts
+BOILERPLATE = (
+    "okay, here", "here's", "here is", "certainly", "i hope", "let me know",
+    "feel free", "enjoy your", "have a great", "happy travels", "i recommend checking",
+    "please note", "keep in mind", "disclaimer", "as an ai",
+)
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9*€$\"'(])")
+_FACT_PATTERN = re.compile(r"[$€£]\s?\d|\d+\s?(?:%|°|am|pm|km|min|hours?|nights?|days?)|\d{1,2}:\d{2}", re.I)
+_PROPER_NOUN = re.compile(r"\b[A-Z][a-zà-ÿ]+(?:\s+[A-Z][a-zà-ÿ]+)*")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for budgeting and reporting."""
+    return (len(text) + 3) // 4
+
+
+def split_units(text: str) -> List[str]:
+    """Split text into lines/sentences so nothing is ever cut mid-sentence."""
+    units = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        units.extend(part.strip() for part in _SENTENCE_SPLIT.split(line) if part.strip())
+    return units
+
+
+def score_unit(unit: str) -> float:
+    """Heuristic information density: prices, times, numbers and named places score high."""
+    lowered = unit.casefold()
+    if any(phrase in lowered for phrase in BOILERPLATE):
+        return 0.0
+    words = max(len(unit.split()), 1)
+    facts = len(_FACT_PATTERN.findall(unit))
+    names = len(_PROPER_NOUN.findall(unit))
+    score = (2.0 * facts + names) / words ** 0.5
+    if unit.startswith(("#", "**Day", "Day ")):
+        score += 1.0
+    # Header-only fragments ("**Important Notes:**") add structure but no content
+    if words <= 3 and not facts:
+        score *= 0.3
+    return score
+
+
+def _dedupe_key(unit: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", unit.casefold()).strip()[:80]
+
+
+class ContextPacker:
+    """Pack several upstream outputs into a shared token budget.
+
+    Each section gets ``weight / sum(weights)`` of ``total_tokens``. Within a
+    section the highest-scoring sentences are kept (in original order) until
+    the section budget is spent; budget a section does not need is handed to
+    the others.
+    """
+
+    def __init__(self, total_tokens: int, weights: Optional[Dict[str, float]] = None):
+        self.total_tokens = total_tokens
+        self.weights = weights or {}
+
+    def _select(self, units: List[Tuple[int, str, float]], budget: int) -> Tuple[List[int], int]:
+        chosen, used = [], 0
+        for index, unit, score in sorted(units, key=lambda u: -u[2]):
+            if score <= 0:
+                break
+            cost = estimate_tokens(unit) + 1
+            if used + cost > budget:
+                continue
+            chosen.append(index)
+            used += cost
+        return sorted(chosen), used
+
+    def compress(self, text: str, budget: int) -> str:
+        """Extractive summary of ``text`` within ``budget`` tokens."""
+        if estimate_tokens(text) <= budget:
+            return text.strip()
+        seen = set()
+        units = []
+        for index, unit in enumerate(split_units(text)):
+            key = _dedupe_key(unit)
+            if key in seen:
+                continue
+            seen.add(key)
+            units.append((index, unit, score_unit(unit)))
+        chosen, _ = self._select(units, budget)
+        by_index = {index: unit for index, unit, _ in units}
+        return "\n".join(by_index[index] for index in chosen)
+
+    def pack(self, sections: Dict[str, str]) -> Dict[str, str]:
+        """Compress every section so the total fits ``total_tokens``."""
+        names = [name for name, text in sections.items() if text]
+        if not names:
+            return {name: "" for name in sections}
+        weights = {name: self.weights.get(name, 1.0) for name in names}
+        weight_sum = sum(weights.values())
+        budgets = {name: int(self.total_tokens * weights[name] / weight_sum) for name in names}
+
+        # Sections that fit comfortably return their slack to the rest
+        needs = {name: estimate_tokens(sections[name]) for name in names}
+        slack = sum(max(0, budgets[name] - needs[name]) for name in names)
+        hungry = [name for name in names if needs[name] > budgets[name]]
+        if slack and hungry:
+            hungry_weight = sum(weights[name] for name in hungry)
+            for name in names:
+                if name in hungry:
+                    budgets[name] += int(slack * weights[name] / hungry_weight)
+                else:
+                    budgets[name] = needs[name]
+
+        packed = {name: "" for name in sections}
+        for name in names:
+            packed[name] = self.compress(sections[name], budgets[name])
+        return packed
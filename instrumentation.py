@@ -0,0 +1,224 @@
+"""
+Instrumentation
+Per-node performance records, cross-run aggregation and metric exports.
+
+Each workflow node produces one record (a plain dict, so it can live in the
+graph state and be checkpointed) with these keys:
+
+    node, start, end, wall_time, queue_wait, llm_calls, retries, fallbacks,
+    input_tokens, output_tokens, cached_tokens, cache_hits, prompt_tokens, cost_usd
+
+``cache_hits`` counts calls answered by the local response cache;
+``cached_tokens`` counts input tokens the provider read from its context cache.
+
+Agent calls are attributed to the running node through a context variable:
+the node wrapper opens a collector, and ``TravelAgent`` reports every call
+into whatever collector is active.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+_active_calls: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("agent_calls", default=None)
+
+# Upper bounds (seconds) of the node duration histogram
+DURATION_BUCKETS = [0.5, 1, 2, 5, 10, 20, 30, 60, 120]
+
+
+@contextmanager
+def collect_agent_calls() -> Iterator[List[Dict[str, Any]]]:
+    """Collect the result dicts of every agent call made inside the block."""
+    calls: List[Dict[str, Any]] = []
+    token = _active_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _active_calls.reset(token)
+
+
+def record_agent_call(result: Dict[str, Any]) -> None:
+    """Report an agent call to the active collector, if any."""
+    calls = _active_calls.get()
+    if calls is not None:
+        calls.append(result)
+
+
+def build_node_record(node: str, start: float, end: float, ready_at: float,
+                      calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Summarize one node execution; ``ready_at`` is when its inputs were available."""
+    return {
+        "node": node,
+        "start": start,
+        "end": end,
+        "wall_time": end - start,
+        "queue_wait": max(0.0, start - ready_at),
+        "llm_calls": sum(1 for c in calls if not c.get("cache_hit")),
+        "retries": sum(max(0, c.get("attempt", 1) - 1) for c in calls),
+        "fallbacks": sum(1 for c in calls if c.get("fallback")),
+        "input_tokens": sum(c.get("input_tokens", 0) for c in calls),
+        "output_tokens": sum(c.get("output_tokens", 0) for c in calls),
+        "cached_tokens": sum(c.get("cached_tokens", 0) for c in calls),
+        "cache_hits": sum(1 for c in calls if c.get("cache_hit")),
+        "prompt_tokens": max((c.get("prompt_tokens", 0) for c in calls), default=0),
+        "cost_usd": sum(c.get("cost_usd", 0.0) for c in calls),
+    }
+
+
+def inputs_ready_at(state: Dict[str, Any]) -> float:
+    """Latest end time among nodes already recorded, else the workflow start."""
+    records = state.get("node_metrics") or []
+    if records:
+        return max(r["end"] for r in records)
+    return state.get("workflow_start_time") or 0.0
+
+
+# =============================================================================
+# AGGREGATION
+# =============================================================================
+
+class MetricsAggregator:
+    """Thread-safe running totals per node across workflow runs."""
+
+    FIELDS = ["wall_time", "queue_wait", "llm_calls", "retries",
+              "input_tokens", "output_tokens", "cached_tokens", "cache_hits"]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+
+    def observe_run(self, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.runs += 1
+            for record in records:
+                totals = self.nodes.setdefault(record["node"], {
+                    "count": 0, "max_wall_time": 0.0,
+                    "buckets": [0] * len(DURATION_BUCKETS),
+                    **{field: 0 for field in self.FIELDS}
+                })
+                totals["count"] += 1
+                totals["max_wall_time"] = max(totals["max_wall_time"], record["wall_time"])
+                for field in self.FIELDS:
+                    totals[field] += record.get(field, 0)
+                for i, bound in enumerate(DURATION_BUCKETS):
+                    if record["wall_time"] <= bound:
+                        totals["buckets"][i] += 1
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One row per node with means, suitable for a table."""
+        with self._lock:
+            rows = []
+            for node, totals in sorted(self.nodes.items()):
+                count = totals["count"] or 1
+                rows.append({
+                    "node": node,
+                    "executions": totals["count"],
+                    "mean_wall_s": round(totals["wall_time"] / count, 3),
+                    "max_wall_s": round(totals["max_wall_time"], 3),
+                    "mean_queue_wait_s": round(totals["queue_wait"] / count, 3),
+                    "retries": totals["retries"],
+                    "cache_hits": totals["cache_hits"],
+                    "mean_input_tokens": round(totals["input_tokens"] / count),
+                    "mean_output_tokens": round(totals["output_tokens"] / count),
+                    "cached_input_ratio": round(totals["cached_tokens"] / totals["input_tokens"], 3)
+                    if totals["input_tokens"] else 0.0,
+                })
+            return rows
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            lines = [
+                "# HELP travel_planner_runs_total Completed workflow runs.",
+                "# TYPE travel_planner_runs_total counter",
+                f"travel_planner_runs_total {self.runs}",
+                "# HELP travel_planner_node_duration_seconds Node wall time.",
+                "# TYPE travel_planner_node_duration_seconds histogram",
+            ]
+            for node, totals in sorted(self.nodes.items()):
+                for bound, count in zip(DURATION_BUCKETS, totals["buckets"]):
+                    lines.append(f'travel_planner_node_duration_seconds_bucket{{node="{node}",le="{bound}"}} {count}')
+                lines.append(f'travel_planner_node_duration_seconds_bucket{{node="{node}",le="+Inf"}} {totals["count"]}')
+                lines.append(f'travel_planner_node_duration_seconds_sum{{node="{node}"}} {totals["wall_time"]:.6f}')
+                lines.append(f'travel_planner_node_duration_seconds_count{{node="{node}"}} {totals["count"]}')
+
+            counters = [
+                ("queue_wait", "travel_planner_node_queue_wait_seconds_total", "Time nodes waited after their inputs were ready."),
+                ("retries", "travel_planner_node_retries_total", "LLM call retries."),
+                ("cache_hits", "travel_planner_node_cache_hits_total", "Agent calls served from the response cache."),
+                ("llm_calls", "travel_planner_node_llm_calls_total", "Agent calls that reached the LLM."),
+                ("input_tokens", "travel_planner_node_input_tokens_total", "LLM input tokens."),
+                ("output_tokens", "travel_planner_node_output_tokens_total", "LLM output tokens."),
+                ("cached_tokens", "travel_planner_node_cached_tokens_total", "LLM input tokens read from the provider's context cache."),
+            ]
+            for field, metric, help_text in counters:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for node, totals in sorted(self.nodes.items()):
+                    value = totals[field]
+                    value = f"{value:.6f}" if isinstance(value, float) else str(value)
+                    lines.append(f'{metric}{{node="{node}"}} {value}')
+            return "\n".join(lines) + "\n"
+
+
+_aggregator = MetricsAggregator()
+
+
+def get_metrics_aggregator() -> MetricsAggregator:
+    """Process-wide aggregator shared by every session."""
+    return _aggregator
+
+
+# =============================================================================
+# OPENTELEMETRY EXPORT
+# =============================================================================
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def to_otel_spans(records: List[Dict[str, Any]], run_start: float, run_end: float,
+                  attributes: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """OTLP/JSON trace with a root ``travel_plan`` span and one child span per node."""
+    trace_id = os.urandom(16).hex()
+    root_id = os.urandom(8).hex()
+
+    def nanos(seconds: float) -> str:
+        return str(int(seconds * 1e9))
+
+    spans = [{
+        "traceId": trace_id,
+        "spanId": root_id,
+        "name": "travel_plan",
+        "kind": 1,
+        "startTimeUnixNano": nanos(run_start),
+        "endTimeUnixNano": nanos(run_end),
+        "attributes": [_attribute(k, v) for k, v in (attributes or {}).items()],
+    }]
+    for record in records:
+        spans.append({
+            "traceId": trace_id,
+            "spanId": os.urandom(8).hex(),
+            "parentSpanId": root_id,
+            "name": f"node.{record['node']}",
+            "kind": 1,
+            "startTimeUnixNano": nanos(record["start"]),
+            "endTimeUnixNano": nanos(record["end"]),
+            "attributes": [
+                _attribute(f"travel_planner.{key}", value)
+                for key, value in record.items() if key not in ("node", "start", "end")
+            ],
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_attribute("service.name", "ai-travel-planner")]},
+        "scopeSpans": [{"scope": {"name": "travel_planner.instrumentation"}, "spans": spans}],
+    }]}
@@ -0,0 +1,295 @@
+"""
+Job Queue
+In-process priority queue and worker pool for plan runs.
+
+Plans execute on worker threads instead of the Streamlit script thread, so a
+browser refresh or rerun no longer kills a run halfway. Callers keep the job
+ID (e.g. in ``st.session_state``) and follow the run from any later rerun:
+
+    job = get_job_queue().submit(workflow, run_input, config, priority=NORMAL)
+    for mode, output in get_job_queue().get(job.job_id).subscribe():  # "updates" / "custom" / "queue"
+        ...
+    final_state = job.result()
+
+Lower priority values run first (FIFO within a priority). Once ``max_pending``
+jobs are waiting for a worker, ``submit`` raises ``QueueFull`` instead of
+growing the backlog. Finished jobs stay retrievable for ``retention`` seconds
+without their ``custom`` (token stream) events, which the final state
+supersedes; with a ``BlobStore`` their remaining events and final state hold
+references to long text rather than copies.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from blob_store import BlobStore, get_blob_store
+
+# Resumes finish work that already started; batch-style submissions yield to people waiting
+HIGH = 0
+NORMAL = 10
+LOW = 20
+
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_PENDING = 32
+DEFAULT_RETENTION = 900.0
+
+# Live-progress stream modes, dropped from a job's history once it finishes
+TRANSIENT_MODES = ("custom",)
+
+
+class QueueFull(RuntimeError):
+    """Raised by ``JobQueue.submit`` when ``max_pending`` jobs are already waiting."""
+
+
+class Job:
+    """One workflow execution whose event stream any number of readers can follow."""
+
+    def __init__(self, workflow, run_input: Optional[Dict[str, Any]], config: Dict[str, Any],
+                 stream_mode: Sequence[str], priority: int = NORMAL, key: Optional[str] = None,
+                 metadata: Optional[Dict[str, Any]] = None, blobs: Optional[BlobStore] = None,
+                 on_start: Optional[Callable[["Job"], None]] = None):
+        self.job_id = uuid.uuid4().hex
+        self.key = key
+        # Caller context (e.g. the submitting session's options) for whoever re-attaches
+        self.metadata = metadata or {}
+        self.workflow = workflow
+        self.run_input = run_input
+        self.config = config
+        self.stream_mode = list(stream_mode)
+        self.priority = priority
+        self.subscribers = 1
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[BaseException] = None
+        self.blobs = blobs
+        self.on_start = on_start
+        self._final_state: Optional[Dict[str, Any]] = None
+        self._events: List[Tuple[str, Any]] = []
+        self._cond = threading.Condition()
+
+    def _compact(self, value: Any) -> Any:
+        return self.blobs.compact(value) if self.blobs is not None else value
+
+    def _expand(self, value: Any) -> Any:
+        return self.blobs.expand(value) if self.blobs is not None else value
+
+    @property
+    def final_state(self) -> Optional[Dict[str, Any]]:
+        """Merged state of a completed run (None until then, or if it failed)."""
+        return self._expand(self._final_state)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("complete", "failed")
+
+    def run(self) -> None:
+        with self._cond:
+            self.status = "running"
+            self.started_at = time.time()
+            self._cond.notify_all()
+        try:
+            if self.on_start is not None:
+                self.on_start(self)
+            for event in self.workflow.stream(self.run_input, self.config, stream_mode=self.stream_mode):
+                event = self._compact(event)
+                with self._cond:
+                    self._events.append(event)
+                    self._cond.notify_all()
+            # Nodes emit partial updates, so read the merged state back
+            self._final_state = self._compact(self.workflow.get_state(self.config).values)
+            status = "complete"
+        except BaseException as e:
+            self.error = e
+            status = "failed"
+        with self._cond:
+            self.status = status
+            self.finished_at = time.time()
+            # One event per streamed token adds up over the retention period. Readers
+            # already following the run keep the full list they are iterating.
+            self._events = [event for event in self._events if event[0] not in TRANSIENT_MODES]
+            self._cond.notify_all()
+
+    def subscribe(self, queue_position: Optional[Callable[["Job"], Optional[int]]] = None,
+                  poll: float = 0.5) -> Iterator[Tuple[str, Any]]:
+        """Yield every ``(mode, output)`` event from the start, until the run ends.
+
+        Readers that start after the run finished see no ``TRANSIENT_MODES`` events.
+
+        ``queue_position`` is a callable returning this job's place in the
+        worker queue (or None once it has started).
+        """
+        index = 0
+        last_position = None
+        with self._cond:
+            history = self._events
+        while True:
+            with self._cond:
+                if index >= len(history) and not self.done:
+                    self._cond.wait(poll)
+                events = history[index:]
+                index += len(events)
+                finished = self.done and index >= len(history)
+                queued = self.status == "queued"
+            if queued and queue_position is not None:
+                position = queue_position(self)
+                if position is not None and position != last_position:
+                    last_position = position
+                    yield "queue", {"position": position}
+            for event in events:
+                yield self._expand(event)
+            if finished:
+                return
+
+    def result(self) -> Dict[str, Any]:
+        """Final merged state; re-raises the run's error for every reader."""
+        with self._cond:
+            while not self.done:
+                self._cond.wait()
+        if self.error is not None:
+            raise self.error
+        return self.final_state
+
+
+class JobQueue:
+    """Priority queue of ``Job``s drained by a fixed pool of worker threads."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_pending: int = DEFAULT_MAX_PENDING,
+                 retention: float = DEFAULT_RETENTION, blobs: Optional[BlobStore] = None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self.blobs = blobs
+        self._heap: List[Tuple[int, int, Job]] = []
+        self._seq = itertools.count()
+        self._jobs: Dict[str, Job] = {}
+        self._callbacks: Dict[str, Callable[[Job], None]] = {}
+        self._running = 0
+        self._cond = threading.Condition()
+        self.stats = {"submitted": 0, "rejected": 0, "complete": 0, "failed": 0}
+        self._threads = [
+            threading.Thread(target=self._work, name=f"plan-worker-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, workflow, run_input: Optional[Dict[str, Any]], config: Dict[str, Any],
+               priority: int = NORMAL, stream_mode: Sequence[str] = ("updates", "custom"),
+               key: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None,
+               on_done: Optional[Callable[[Job], None]] = None,
+               on_start: Optional[Callable[[Job], None]] = None) -> Job:
+        """Queue a run; raises ``QueueFull`` when the backlog is at ``max_pending``.
+
+        ``on_start`` is called from the worker thread when it picks the job up, before
+        the workflow runs (it may replace ``job.run_input``); ``on_done`` is called
+        once from the worker thread when the job finishes.
+        """
+        with self._cond:
+            if len(self._heap) >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise QueueFull(f"{len(self._heap)} plans are already waiting for a worker")
+            self._prune()
+            job = Job(workflow, run_input, config, stream_mode, priority=priority, key=key, metadata=metadata,
+                      blobs=self.blobs, on_start=on_start)
+            self._jobs[job.job_id] = job
+            if on_done is not None:
+                self._callbacks[job.job_id] = on_done
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            self.stats["submitted"] += 1
+            self._cond.notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job with ``job_id``, or None once it has expired (or never existed here)."""
+        with self._cond:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> Optional[int]:
+        """1-based place among jobs waiting for a worker, or None once started."""
+        with self._cond:
+            for place, (_, _, queued) in enumerate(sorted(self._heap, key=lambda entry: entry[:2])):
+                if queued is job:
+                    return place + 1
+            return None
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current load and lifetime counters, for the dashboard."""
+        with self._cond:
+            return {"workers": self.workers, "running": self._running, "pending": len(self._heap),
+                    "max_pending": self.max_pending, **self.stats}
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition of queue depth and job outcomes."""
+        snapshot = self.snapshot()
+        lines = []
+        for field, help_text in [("running", "Plans currently running."),
+                                 ("pending", "Plans waiting for a worker.")]:
+            metric = f"travel_planner_queue_{field}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge", f"{metric} {snapshot[field]}"]
+        metric = "travel_planner_queue_jobs_total"
+        lines += [f"# HELP {metric} Plan jobs by outcome.", f"# TYPE {metric} counter"]
+        lines += [f'{metric}{{outcome="{outcome}"}} {snapshot[outcome]}'
+                  for outcome in ("submitted", "rejected", "complete", "failed")]
+        return "\n".join(lines) + "\n"
+
+    def _prune(self) -> None:
+        # Called with the lock held; finished jobs are only kept so sessions can collect them
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.done and job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, job = heapq.heappop(self._heap)
+                self._running += 1
+            try:
+                job.run()
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self.stats[job.status] += 1
+                    callback = self._callbacks.pop(job.job_id, None)
+                    # Expire older jobs even when no new submissions arrive
+                    self._prune()
+                if callback is not None:
+                    callback(job)
+
+
+_default_queue: Optional[JobQueue] = None
+_default_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Process-wide queue; ``TRAVEL_PLANNER_WORKERS`` and ``TRAVEL_PLANNER_MAX_PENDING`` size it."""
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue(
+                int(os.environ.get("TRAVEL_PLANNER_WORKERS", DEFAULT_WORKERS)),
+                int(os.environ.get("TRAVEL_PLANNER_MAX_PENDING", DEFAULT_MAX_PENDING)),
+                blobs=get_blob_store(),
+            )
+        return _default_queue
+
+
+def set_job_queue(queue: Optional[JobQueue]) -> None:
+    """Replace the process-wide queue (e.g. with a different worker count)."""
+    global _default_queue
+    with _default_lock:
+        _default_queue = queue
@@ -0,0 +1,213 @@
+"""
+Model Router
+Per-agent model tiers from a JSON routing table, with fallback and usage/cost reporting.
+
+The routing table is ``model_routes.json`` (or ``TRAVEL_PLANNER_MODEL_CONFIG``)
+merged over ``DEFAULT_ROUTING``:
+
+    {
+      "profiles": {
+        "lite": {"model": "gemini-2.0-flash-lite", "max_tokens": 2048, "timeout": 45,
+                 "input_cost_per_mtok": 0.075, "output_cost_per_mtok": 0.30,
+                 "cached_input_cost_per_mtok": 0.01875, "cache_min_tokens": 1024}
+      },
+      "agents": {
+        "WeatherAgent": {"tiers": ["lite", "full"], "temperature": 0.4}
+      }
+    }
+
+Each agent tries its tiers in order and moves to the next one when a call
+fails. Agent-level keys other than ``tiers`` override the profile fields for
+that agent, so e.g. an agent can keep its tier but get a smaller output cap.
+``cache_min_tokens`` (None disables) and ``cache_ttl`` control context caching
+of the agent's system prompt (see ``prompt_cache``). Edits to the file are
+picked up on the next plan without restarting the app.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_CONFIG_PATH = "model_routes.json"
+
+# Profiles must define these; temperature defaults to the agent's own
+REQUIRED_FIELDS = ("model", "max_tokens", "timeout")
+
+DEFAULT_ROUTING = {
+    "profiles": {
+        # Short summaries and link lists
+        "lite": {"model": "gemini-2.0-flash-lite", "max_tokens": 2048, "timeout": 45,
+                 "input_cost_per_mtok": 0.075, "output_cost_per_mtok": 0.30,
+                 "cached_input_cost_per_mtok": 0.01875},
+        "full": {"model": "gemini-2.0-flash-exp", "max_tokens": 8000, "timeout": 120,
+                 "input_cost_per_mtok": 0.10, "output_cost_per_mtok": 0.40,
+                 "cached_input_cost_per_mtok": 0.025},
+    },
+    "default_tiers": ["full"],
+    "agents": {
+        "WeatherAgent": {"tiers": ["lite", "full"]},
+        "ActivitiesAgent": {"tiers": ["lite", "full"]},
+    },
+}
+
+
+def load_routing(path: Optional[str] = None) -> Dict[str, Any]:
+    """Routing table from ``path`` merged over the defaults; a missing file means defaults only."""
+    routing = copy.deepcopy(DEFAULT_ROUTING)
+    path = path or os.environ.get("TRAVEL_PLANNER_MODEL_CONFIG", DEFAULT_CONFIG_PATH)
+    if not os.path.exists(path):
+        return routing
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    for name, profile in config.get("profiles", {}).items():
+        routing["profiles"].setdefault(name, {}).update(profile)
+    routing["agents"].update(config.get("agents", {}))
+    routing["default_tiers"] = config.get("default_tiers", routing["default_tiers"])
+    return routing
+
+
+class ModelRouter:
+    """Resolves each agent's tier list and keeps per-agent/per-model usage totals."""
+
+    USAGE_FIELDS = ["calls", "failures", "fallbacks", "latency", "input_tokens", "output_tokens",
+                    "cached_tokens", "cost_usd"]
+
+    def __init__(self, routing: Optional[Dict[str, Any]] = None):
+        self.routing = routing or load_routing()
+        self._check()
+        self._lock = threading.Lock()
+        self._usage: Dict[tuple, Dict[str, float]] = {}
+
+    def _check(self) -> None:
+        profiles = self.routing["profiles"]
+        for name, profile in profiles.items():
+            missing = [field for field in REQUIRED_FIELDS if field not in profile]
+            if missing:
+                raise ValueError(f"Model profile {name!r} is missing {', '.join(missing)}")
+        routes = [("default_tiers", self.routing["default_tiers"])]
+        routes += [(agent, route.get("tiers", [])) for agent, route in self.routing["agents"].items()]
+        for owner, tiers in routes:
+            unknown = [tier for tier in tiers if tier not in profiles]
+            if unknown:
+                raise ValueError(f"{owner}: unknown model profile(s) {', '.join(unknown)}")
+
+    def fingerprint(self) -> str:
+        """Hash of the routing table, so cached agents are rebuilt when it changes."""
+        return hashlib.sha256(json.dumps(self.routing, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def profiles_for(self, agent: str, temperature: float) -> List[Dict[str, Any]]:
+        """Resolved profiles in fallback order; ``temperature`` is the agent's default."""
+        route = self.routing["agents"].get(agent, {})
+        overrides = {key: value for key, value in route.items() if key != "tiers"}
+        tiers = route.get("tiers") or self.routing["default_tiers"]
+        return [
+            {"tier": tier, "temperature": temperature, **self.routing["profiles"][tier], **overrides}
+            for tier in tiers
+        ]
+
+    @staticmethod
+    def cost(profile: Dict[str, Any], input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+        """Estimated USD; ``cached_tokens`` of the input are billed at the cached-input rate."""
+        input_rate = profile.get("input_cost_per_mtok", 0.0)
+        cached_rate = profile.get("cached_input_cost_per_mtok", input_rate)
+        return ((input_tokens - cached_tokens) * input_rate + cached_tokens * cached_rate
+                + output_tokens * profile.get("output_cost_per_mtok", 0.0)) / 1e6
+
+    def record(self, agent: str, profile: Dict[str, Any], latency: float, input_tokens: int = 0,
+               output_tokens: int = 0, failed: bool = False, fallback: bool = False,
+               cached_tokens: int = 0) -> None:
+        """Count one call; ``fallback`` marks a success on a tier other than the agent's first."""
+        key = (agent, profile["tier"], profile["model"])
+        with self._lock:
+            usage = self._usage.setdefault(key, {field: 0 for field in self.USAGE_FIELDS})
+            usage["calls"] += 1
+            usage["failures"] += int(failed)
+            usage["fallbacks"] += int(fallback)
+            usage["latency"] += latency
+            usage["input_tokens"] += input_tokens
+            usage["output_tokens"] += output_tokens
+            usage["cached_tokens"] += cached_tokens
+            usage["cost_usd"] += self.cost(profile, input_tokens, output_tokens, cached_tokens)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One row per agent and model, for tuning the routing table."""
+        with self._lock:
+            rows = []
+            for (agent, tier, model), usage in sorted(self._usage.items()):
+                calls = usage["calls"] or 1
+                rows.append({
+                    "agent": agent,
+                    "tier": tier,
+                    "model": model,
+                    "calls": usage["calls"],
+                    "failures": usage["failures"],
+                    "fallbacks": usage["fallbacks"],
+                    "mean_latency_s": round(usage["latency"] / calls, 3),
+                    "mean_output_tokens": round(usage["output_tokens"] / calls),
+                    "cached_input_ratio": round(usage["cached_tokens"] / usage["input_tokens"], 3)
+                    if usage["input_tokens"] else 0.0,
+                    "cost_usd": round(usage["cost_usd"], 6),
+                })
+            return rows
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition of the per-agent/per-model counters."""
+        metrics = [
+            ("calls", "travel_planner_model_calls_total", "LLM calls per agent and model."),
+            ("failures", "travel_planner_model_failures_total", "Calls abandoned on a model tier."),
+            ("fallbacks", "travel_planner_model_fallbacks_total", "Calls answered by a fallback tier."),
+            ("latency", "travel_planner_model_latency_seconds_total", "Total LLM call latency."),
+            ("output_tokens", "travel_planner_model_output_tokens_total", "LLM output tokens."),
+            ("cost_usd", "travel_planner_model_cost_usd_total", "Estimated LLM cost in USD."),
+        ]
+        with self._lock:
+            usage = {key: dict(totals) for key, totals in self._usage.items()}
+        lines = []
+        for field, metric, help_text in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for (agent, tier, model), totals in sorted(usage.items()):
+                value = totals[field]
+                value = f"{value:.6f}" if isinstance(value, float) else str(value)
+                lines.append(f'{metric}{{agent="{agent}",tier="{tier}",model="{model}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+_default_router: Optional[ModelRouter] = None
+# (path, mtime) of the routing file the default router was loaded from; None once set explicitly
+_default_source: Optional[Tuple[str, Optional[int]]] = None
+_default_lock = threading.Lock()
+
+
+def _config_source() -> Tuple[str, Optional[int]]:
+    path = os.environ.get("TRAVEL_PLANNER_MODEL_CONFIG", DEFAULT_CONFIG_PATH)
+    try:
+        return path, os.stat(path).st_mtime_ns
+    except OSError:
+        return path, None
+
+
+def get_model_router() -> ModelRouter:
+    """Process-wide router, reloaded when the routing file is created, edited or removed.
+
+    A reload gives the router a new ``fingerprint``, so the agent registry
+    builds fresh agents on the next plan; usage totals start again from zero.
+    """
+    global _default_router, _default_source
+    with _default_lock:
+        source = _config_source()
+        if _default_router is None or (_default_source is not None and source != _default_source):
+            _default_router = ModelRouter(load_routing(source[0]))
+            _default_source = source
+        return _default_router
+
+
+def set_model_router(router: Optional[ModelRouter]) -> None:
+    """Replace the process-wide router; one set here is kept until replaced again."""
+    global _default_router, _default_source
+    with _default_lock:
+        _default_router = router
+        _default_source = None
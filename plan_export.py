@@ -0,0 +1,522 @@
+"""
+Plan Export
+Streaming Markdown, HTML, PDF and iCalendar renderers for finished travel plans.
+
+Every renderer is a generator of chunks (one per report section or PDF page),
+so large batches can be streamed to disk or into a zip archive without ever
+holding a whole report in memory:
+
+    with open("rome.pdf", "wb") as f:
+        for chunk in export_chunks(final_state, "pdf"):
+            f.write(chunk)
+
+The ICS calendar has one all-day event per itinerary day plus a timed event
+for every "9:00 AM - ..." style entry in that day.
+"""
+
+import hashlib
+import html
+import os
+import re
+import shutil
+import textwrap
+import threading
+import zipfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Format -> (file extension, MIME type)
+FORMATS = {
+    "md": ("md", "text/markdown"),
+    "html": ("html", "text/html"),
+    "pdf": ("pdf", "application/pdf"),
+    "ics": ("ics", "text/calendar"),
+}
+
+
+def report_sections(state: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """``(title, markdown)`` for each report section, in report order."""
+    return [
+        ("Itinerary", state.get('final_itinerary', '')),
+        ("Weather & Packing", state.get('weather_analysis', '')),
+        ("Accommodations", state.get('hotel_recommendations', '')),
+        ("Activities & Bookings", state.get('activity_bookings', '')),
+        ("Budget Breakdown", state.get('budget_estimate', '')),
+        ("Transportation", state.get('logistics_plan', '')),
+    ]
+
+
+def _trip_details(state: Dict[str, Any]) -> List[str]:
+    return [
+        f"Destination: {state['destination']}",
+        f"Duration: {state['num_days']} days",
+        f"Travelers: {state['headcount']}",
+        f"Budget: {state['budget_range']}",
+        f"Style: {state['travel_style']}",
+        f"Cost Estimate: ${state.get('total_cost_estimate', 0):,.2f}",
+    ]
+
+
+def file_name(state: Dict[str, Any], fmt: str) -> str:
+    return f"{state['destination'].replace(' ', '_')}_travel_plan.{FORMATS[fmt][0]}"
+
+
+# =============================================================================
+# MARKDOWN
+# =============================================================================
+
+def iter_markdown(state: Dict[str, Any]) -> Iterator[str]:
+    details = "\n".join(f"- {line}" for line in _trip_details(state))
+    yield (f"\n# {state['destination']} Travel Plan\n"
+           f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n"
+           f"## Trip Details\n{details}\n")
+    for title, body in report_sections(state):
+        yield f"\n## {title}\n{body}\n"
+
+
+# =============================================================================
+# HTML
+# =============================================================================
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_LIST_ITEM = re.compile(r"^\s*(?:([-*+])|(\d+)[.)])\s+(.*)$")
+_TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?$")
+_LINK = re.compile(r"\[([^\]]+)\]\(((?:https?://|mailto:)[^)\s]+)\)")
+_BOLD = re.compile(r"\*\*(.+?)\*\*")
+_ITALIC = re.compile(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])")
+_CODE = re.compile(r"`([^`]+)`")
+
+HTML_STYLE = ("body{font-family:-apple-system,Segoe UI,Helvetica,Arial,sans-serif;max-width:860px;"
+              "margin:2rem auto;padding:0 1rem;line-height:1.5;color:#222}"
+              "h1{color:#667eea}h2{border-bottom:2px solid #764ba2;padding-bottom:.2rem}"
+              "table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:.3rem .6rem}")
+
+
+def _inline_html(text: str) -> str:
+    text = html.escape(text)
+    text = _CODE.sub(r"<code>\1</code>", text)
+    text = _LINK.sub(r'<a href="\2">\1</a>', text)
+    text = _BOLD.sub(r"<strong>\1</strong>", text)
+    return _ITALIC.sub(r"<em>\1</em>", text)
+
+
+def _table_cells(line: str) -> List[str]:
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def markdown_to_html(markdown: str) -> Iterator[str]:
+    """Line-based converter for the Markdown the agents produce (headings, lists, tables)."""
+    block = None  # "p", "ul", "ol" or "table"
+    header_row = False
+
+    def close() -> str:
+        nonlocal block
+        tag, block = block, None
+        return {"p": "</p>\n", "ul": "</ul>\n", "ol": "</ol>\n", "table": "</table>\n"}.get(tag, "")
+
+    out = []
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        heading = _HEADING.match(stripped)
+        item = _LIST_ITEM.match(line)
+        if not stripped:
+            out.append(close())
+        elif heading:
+            level = min(6, len(heading.group(1)) + 1)  # the report owns h1/h2
+            out.append(close() + f"<h{level}>{_inline_html(heading.group(2))}</h{level}>\n")
+        elif stripped in ("---", "***", "___"):
+            out.append(close() + "<hr>\n")
+        elif stripped.startswith("|"):
+            if _TABLE_SEPARATOR.match(stripped):
+                continue
+            if block != "table":
+                out.append(close() + "<table>\n")
+                block, header_row = "table", True
+            cell = "th" if header_row else "td"
+            header_row = False
+            out.append("<tr>" + "".join(f"<{cell}>{_inline_html(c)}</{cell}>" for c in _table_cells(stripped))
+                       + "</tr>\n")
+        elif item:
+            tag = "ol" if item.group(2) else "ul"
+            if block != tag:
+                out.append(close() + f"<{tag}>\n")
+                block = tag
+            out.append(f"<li>{_inline_html(item.group(3))}</li>\n")
+        else:
+            if block != "p":
+                out.append(close() + "<p>")
+                block = "p"
+            else:
+                out.append("<br>\n")
+            out.append(_inline_html(stripped))
+        if len(out) >= 64:
+            yield "".join(out)
+            out = []
+    out.append(close())
+    yield "".join(out)
+
+
+def iter_html(state: Dict[str, Any]) -> Iterator[str]:
+    title = html.escape(f"{state['destination']} Travel Plan")
+    details = "".join(f"<li>{html.escape(line)}</li>" for line in _trip_details(state))
+    yield (f"<!DOCTYPE html>\n<html lang=\"en\"><head><meta charset=\"utf-8\">"
+           f"<title>{title}</title><style>{HTML_STYLE}</style></head><body>\n"
+           f"<h1>{title}</h1>\n<p>Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}</p>\n"
+           f"<h2>Trip Details</h2>\n<ul>{details}</ul>\n")
+    for section, body in report_sections(state):
+        yield f"<h2>{html.escape(section)}</h2>\n"
+        yield from markdown_to_html(body)
+    yield "</body></html>\n"
+
+
+# =============================================================================
+# PDF
+# =============================================================================
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US Letter, points
+PAGE_MARGIN = 54
+# (font resource, size) per line style
+PDF_STYLES = {"title": ("F2", 18), "h2": ("F2", 14), "h3": ("F2", 11), "body": ("F1", 10)}
+
+_PDF_REPLACEMENTS = str.maketrans({"→": "->", "←": "<-", "★": "*", "✓": "v", "≈": "~", "\t": "    "})
+
+
+def _plain_inline(text: str) -> str:
+    text = _LINK.sub(r"\1 (\2)", text)
+    text = _BOLD.sub(r"\1", text)
+    text = _ITALIC.sub(r"\1", text)
+    return _CODE.sub(r"\1", text)
+
+
+def _pdf_lines(markdown: str) -> Iterator[Tuple[str, str]]:
+    """``(style, text)`` lines from agent Markdown, with formatting flattened."""
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        heading = _HEADING.match(stripped)
+        item = _LIST_ITEM.match(line)
+        if not stripped:
+            yield "body", ""
+        elif heading:
+            yield "h3", _plain_inline(heading.group(2))
+        elif stripped.startswith("|"):
+            if not _TABLE_SEPARATOR.match(stripped):
+                yield "body", "   ".join(_plain_inline(cell) for cell in _table_cells(stripped))
+        elif item:
+            bullet = f"{item.group(2)}." if item.group(2) else "\u2022"
+            yield "body", f"{bullet} {_plain_inline(item.group(3))}"
+        else:
+            yield "body", _plain_inline(stripped)
+
+
+def _pdf_text(text: str) -> bytes:
+    encoded = text.translate(_PDF_REPLACEMENTS).encode("cp1252", errors="replace")
+    return encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class _PdfStream:
+    """Writes numbered objects and remembers their byte offsets for the xref table."""
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets: Dict[int, int] = {}
+
+    def emit(self, data: bytes) -> bytes:
+        self.offset += len(data)
+        return data
+
+    def obj(self, number: int, body: bytes) -> bytes:
+        self.offsets[number] = self.offset
+        return self.emit(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+
+def iter_pdf(state: Dict[str, Any]) -> Iterator[bytes]:
+    """Text-only PDF with the standard Helvetica fonts, one chunk per page."""
+    pdf = _PdfStream()
+    # 1 catalog, 2 page tree (written last, once the kids are known), 3-4 fonts
+    yield pdf.emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    yield pdf.obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    yield pdf.obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    yield pdf.obj(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+
+    def lines() -> Iterator[Tuple[str, str]]:
+        yield "title", f"{state['destination']} Travel Plan"
+        yield "body", f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        yield "h2", "Trip Details"
+        for detail in _trip_details(state):
+            yield "body", f"\u2022 {detail}"
+        for title, body in report_sections(state):
+            yield "h2", title
+            yield from _pdf_lines(body)
+
+    kids = []
+    next_number = 5
+
+    def page(commands: List[bytes]) -> Iterator[bytes]:
+        nonlocal next_number
+        content = b"\n".join(commands)
+        yield pdf.obj(next_number, b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        yield pdf.obj(next_number + 1, (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>"
+        ) % (PAGE_WIDTH, PAGE_HEIGHT, next_number))
+        kids.append(next_number + 1)
+        next_number += 2
+
+    commands: List[bytes] = []
+    y = PAGE_HEIGHT - PAGE_MARGIN
+    for style, text in lines():
+        font, size = PDF_STYLES[style]
+        leading = size * 1.4
+        if style != "body":
+            y -= size * 0.6  # space above headings
+        # Helvetica averages about half an em per character
+        width = int((PAGE_WIDTH - 2 * PAGE_MARGIN) / (size * 0.5))
+        for segment in textwrap.wrap(text, width) or [""]:
+            if y - leading < PAGE_MARGIN:
+                yield from page(commands)
+                commands, y = [], PAGE_HEIGHT - PAGE_MARGIN
+            y -= leading
+            if segment:
+                commands.append(b"BT /%s %d Tf %d %.1f Td (%s) Tj ET"
+                                % (font.encode(), size, PAGE_MARGIN, y, _pdf_text(segment)))
+    yield from page(commands)
+
+    kid_refs = b" ".join(b"%d 0 R" % kid for kid in kids)
+    yield pdf.obj(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kid_refs, len(kids)))
+    xref_at = pdf.offset
+    size = next_number
+    entries = [b"0000000000 65535 f \n"] + [b"%010d 00000 n \n" % pdf.offsets[n] for n in range(1, size)]
+    yield pdf.emit(b"xref\n0 %d\n" % size + b"".join(entries))
+    yield pdf.emit(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_at))
+
+
+# =============================================================================
+# ICALENDAR
+# =============================================================================
+
+_DAY_HEADING = re.compile(r"^\s*(?:#+\s*|\*\*)?\s*Day\s+(\d+)\b\s*[:.\-\u2013\u2014]?\s*(.*?)\s*(?:\*\*)?\s*$", re.I)
+_CLOCK = r"(\d{1,2})(?::(\d{2}))?\s*([AaPp]\.?[Mm]\.?)?"
+# "9:00 AM: ...", "9 AM - ...", "4:00 - 5:30 PM: ..." (after list markers and bold are stripped)
+_TIMED_ENTRY = re.compile(rf"^{_CLOCK}(?:\s*[-\u2013\u2014]\s*{_CLOCK})?\s*[-\u2013\u2014:]\s*(.+)$")
+DEFAULT_EVENT_MINUTES = 60
+
+
+def _plain_line(line: str) -> str:
+    text = _plain_inline(line).strip()
+    item = _LIST_ITEM.match(text)
+    return item.group(3).strip() if item else text
+
+
+def itinerary_days(itinerary: str) -> List[Tuple[int, str, List[str]]]:
+    """``(day number, title, plain-text lines)`` for each "Day N" heading in the itinerary."""
+    days: List[Tuple[int, str, List[str]]] = []
+    for line in itinerary.splitlines():
+        heading = _DAY_HEADING.match(line)
+        if heading:
+            number = int(heading.group(1))
+            # Numbering restarting means a recap or alternative plan follows; keep the first
+            if days and number <= days[-1][0]:
+                break
+            days.append((number, _plain_inline(heading.group(2)).strip(" *"), []))
+        elif days and line.strip():
+            days[-1][2].append(_plain_line(line))
+    return days
+
+
+def _clock(hour: Optional[str], minute: Optional[str], meridiem: Optional[str]) -> Optional[Tuple[int, int]]:
+    if hour is None:
+        return None
+    # A bare number is a list index or a quantity, not a time
+    if minute is None and meridiem is None:
+        return None
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower().startswith("p") else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+
+def _ics_text(text: str) -> str:
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _ics_line(line: str) -> str:
+    """Fold to 75-octet lines as RFC 5545 requires."""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts, chunk = [], b""
+    for char in line:
+        encoded = char.encode("utf-8")
+        if len(chunk) + len(encoded) > (75 if not parts else 74):
+            parts.append(chunk.decode("utf-8"))
+            chunk = b""
+        chunk += encoded
+    parts.append(chunk.decode("utf-8"))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _event(uid: str, stamp: str, start: str, end: str, summary: str, description: str = "",
+           all_day: bool = False) -> str:
+    kind = ";VALUE=DATE" if all_day else ""
+    lines = ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{stamp}", f"DTSTART{kind}:{start}", f"DTEND{kind}:{end}",
+             f"SUMMARY:{_ics_text(summary)}"]
+    if description:
+        lines.append(f"DESCRIPTION:{_ics_text(description)}")
+    lines.append("END:VEVENT")
+    return "".join(_ics_line(line) for line in lines)
+
+
+def _timed_entry(line: str) -> Optional[Tuple[Tuple[int, int], Optional[Tuple[int, int]], str]]:
+    """``(start, end or None, summary)`` for a timed itinerary line."""
+    match = _TIMED_ENTRY.match(line)
+    if not match:
+        return None
+    hour, minute, meridiem, end_hour, end_minute, end_meridiem, summary = match.groups()
+    # "4:00 - 5:30 PM" shares the meridiem; "4:00 PM - 5:30" keeps the first one
+    start = _clock(hour, minute, meridiem or end_meridiem)
+    end = _clock(end_hour, end_minute, end_meridiem or meridiem)
+    return (start, end, summary.strip()) if start else None
+
+
+def iter_ics(state: Dict[str, Any]) -> Iterator[str]:
+    """Calendar with an all-day event per itinerary day and its timed entries (floating local time)."""
+    start_date = datetime.strptime(state['start_date'], '%Y-%m-%d')
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    seed = f"{state['destination']}|{state['start_date']}"
+    uid = lambda *parts: hashlib.sha1("|".join(map(str, (seed,) + parts)).encode()).hexdigest() + "@ai-travel-planner"
+
+    yield "".join(_ics_line(line) for line in [
+        "BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//AI Travel Planner//EN", "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_ics_text(state['destination'])} trip"
+    ])
+    for number, title, lines in itinerary_days(state.get('final_itinerary', '')):
+        day = start_date + timedelta(days=number - 1)
+        chunk = [_event(uid(number), stamp, day.strftime('%Y%m%d'), (day + timedelta(days=1)).strftime('%Y%m%d'),
+                        f"Day {number}: {title}" if title else f"Day {number}", "\n".join(lines), all_day=True)]
+        entries = []
+        for line in lines:
+            entry = _timed_entry(line)
+            if entry:
+                (hour, minute), end, summary = entry
+                start = day.replace(hour=hour, minute=minute)
+                end = day.replace(hour=end[0], minute=end[1]) if end else None
+                entries.append((start, end if end and end > start else None, summary))
+        for index, (start, end, summary) in enumerate(entries):
+            if end is None:
+                later = [s for s, _, _ in entries[index + 1:] if s > start]
+                end = later[0] if later else start + timedelta(minutes=DEFAULT_EVENT_MINUTES)
+            chunk.append(_event(uid(number, index), stamp, start.strftime('%Y%m%dT%H%M%S'),
+                                end.strftime('%Y%m%dT%H%M%S'), summary[:120], summary))
+        yield "".join(chunk)
+    yield _ics_line("END:VCALENDAR")
+
+
+# =============================================================================
+# OUTPUT
+# =============================================================================
+
+RENDERERS = {"md": iter_markdown, "html": iter_html, "pdf": iter_pdf, "ics": iter_ics}
+
+
+def export_chunks(state: Dict[str, Any], fmt: str) -> Iterator[bytes]:
+    """Encoded chunks of ``state`` rendered as ``fmt`` (one of ``FORMATS``)."""
+    if fmt not in RENDERERS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    for chunk in RENDERERS[fmt](state):
+        yield chunk if isinstance(chunk, bytes) else chunk.encode("utf-8")
+
+
+def write_export(state: Dict[str, Any], fmt: str, path: str) -> int:
+    """Stream one report to ``path``; returns the bytes written."""
+    written = 0
+    with open(path, "wb") as f:
+        for chunk in export_chunks(state, fmt):
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+class ZipExporter:
+    """Thread-safe zip archive that plans are streamed into one entry at a time.
+
+    Entries are written to ``<path>.partial``, which replaces ``path`` on
+    ``close``, so an interrupted batch never leaves a zip without its central
+    directory. With ``resume`` the entries of an existing archive at ``path``
+    are carried over unless re-added; otherwise the archive is rewritten.
+    """
+
+    def __init__(self, path: str, formats: Sequence[str] = ("md",), resume: bool = False):
+        self.path = path
+        self.formats = list(formats)
+        self._partial = f"{path}.partial"
+        self._previous: List[str] = []
+        if resume and os.path.exists(path):
+            try:
+                with zipfile.ZipFile(path) as previous:
+                    self._previous = previous.namelist()
+            except zipfile.BadZipFile:
+                # Left by a version that appended in place and crashed; nothing to salvage
+                pass
+        self._written = set()
+        self._zip = zipfile.ZipFile(self._partial, "w", compression=zipfile.ZIP_DEFLATED)
+        self._lock = threading.Lock()
+
+    def contains(self, name: str) -> bool:
+        """True when the archive will hold ``name`` in every configured format."""
+        entries = {f"{name}.{FORMATS[fmt][0]}" for fmt in self.formats}
+        with self._lock:
+            return entries <= self._written | set(self._previous)
+
+    def add(self, state: Dict[str, Any], name: str) -> None:
+        """Add ``name.<ext>`` for every configured format."""
+        with self._lock:
+            for fmt in self.formats:
+                entry_name = f"{name}.{FORMATS[fmt][0]}"
+                if entry_name in self._written:
+                    continue
+                with self._zip.open(entry_name, "w", force_zip64=True) as entry:
+                    for chunk in export_chunks(state, fmt):
+                        entry.write(chunk)
+                self._written.add(entry_name)
+
+    def _carry_over(self) -> None:
+        # Called with the lock held, before the partial archive is finalized
+        carried = [name for name in self._previous if name not in self._written]
+        if not carried:
+            return
+        with zipfile.ZipFile(self.path) as previous:
+            for name in carried:
+                info = previous.getinfo(name)
+                target = zipfile.ZipInfo(name, date_time=info.date_time)
+                target.compress_type = zipfile.ZIP_DEFLATED
+                with previous.open(info) as source, self._zip.open(target, "w", force_zip64=True) as entry:
+                    shutil.copyfileobj(source, entry, 1 << 16)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._zip.fp is None:
+                return
+            try:
+                self._carry_over()
+            finally:
+                self._zip.close()
+            os.replace(self._partial, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def write_zip(path: str, plans: Iterable[Tuple[str, Dict[str, Any]]], formats: Sequence[str] = ("md",)) -> None:
+    """Stream ``(name, state)`` pairs into a zip archive."""
+    with ZipExporter(path, formats) as archive:
+        for name, state in plans:
+            archive.add(state, name)
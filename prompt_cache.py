@@ -0,0 +1,203 @@
+"""
+Prompt Cache
+Provider context caching for the stable prefix of agent prompts, with cached-token accounting.
+
+Every agent prompt is a stable prefix (the agent's system prompt, including
+its fixed task instructions and any JSON schema) followed by a variable
+suffix (the trip details and grounding sources). The prefix is identical
+across sessions, so it is registered once per model as Gemini cached content
+and later calls send only the suffix:
+
+    handle = get_prompt_cache().handle(llm, profile, system_prompt)
+    llm.invoke(suffix_messages, cached_content=handle) if handle else llm.invoke(all_messages)
+
+Prefixes shorter than the provider minimum (``cache_min_tokens`` in the model
+profile) are not registered; they still come first in every request, so
+implicit prefix caching applies where the provider offers it. Either way the
+cached input tokens reported back by the provider are tallied per agent.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from context_packer import estimate_tokens
+from provider_guard import error_names, status_code
+
+# Gemini rejects explicit caches below roughly this many input tokens
+DEFAULT_MIN_TOKENS = 1024
+DEFAULT_TTL = 3600
+
+# Re-register a prefix this long before its cached content expires
+REFRESH_MARGIN = 120
+
+# How Gemini answers a request naming cached content that expired, was deleted
+# or belongs to another model or API key (INVALID_ARGUMENT, PERMISSION_DENIED
+# "CachedContent not found" or NOT_FOUND), by status and langchain_core error type
+REJECTED_STATUS = {400, 403, 404}
+REJECTED_ERRORS = {"ModelInvalidRequestError", "ModelPermissionDeniedError", "ModelNotFoundError"}
+
+
+def handle_rejected(error: BaseException) -> bool:
+    """True when a call made with a cached-content handle failed because of the request itself.
+
+    Such a call is worth repeating once with the prefix inline; throttling,
+    server errors and context overflows (which an inline prefix only makes
+    worse) are left to the caller's retry policy.
+    """
+    names = error_names(error)
+    if "ContextOverflowError" in names:
+        return False
+    return status_code(error) in REJECTED_STATUS or bool(names & REJECTED_ERRORS)
+
+
+class PromptCache:
+    """Cached-content handles per (client, model, prefix) and per-agent cached-token totals."""
+
+    USAGE_FIELDS = ["calls", "cached_calls", "input_tokens", "cached_tokens", "latency", "cached_latency"]
+
+    def __init__(self, enabled: bool = True, ttl: float = DEFAULT_TTL):
+        self.enabled = enabled
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (handle or None, expires_at, client); a None handle records a failed
+        # registration so it is not retried on every call. Holding the client keeps
+        # its id() from being reused by another API key's client.
+        self._handles: Dict[Tuple, Tuple[Optional[str], float, Any]] = {}
+        self._registering: Dict[Tuple, threading.Lock] = {}
+        self._usage: Dict[str, Dict[str, float]] = {}
+        self.stats = {"registered": 0, "register_failures": 0, "invalidated": 0}
+
+    @staticmethod
+    def _key(client, model: str, prefix: str) -> Tuple:
+        return id(client), model, hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+    def handle(self, llm, profile: Dict[str, Any], prefix: str) -> Optional[str]:
+        """Name of the cached content holding ``prefix`` for ``llm``'s model, or None to send it inline."""
+        client = getattr(llm, "client", None)
+        min_tokens = profile.get("cache_min_tokens", DEFAULT_MIN_TOKENS)
+        if not self.enabled or client is None or min_tokens is None or estimate_tokens(prefix) < min_tokens:
+            return None
+        key = self._key(client, profile["model"], prefix)
+        with self._lock:
+            lock = self._registering.setdefault(key, threading.Lock())
+        # One registration per prefix; other callers wait for it rather than registering again
+        with lock:
+            with self._lock:
+                self._expire()
+                entry = self._handles.get(key)
+                if entry is not None and time.time() < entry[1] - REFRESH_MARGIN:
+                    return entry[0]
+            ttl = profile.get("cache_ttl", self.ttl)
+            name = self._register(client, profile["model"], prefix, ttl)
+            with self._lock:
+                self._handles[key] = (name, time.time() + ttl, client)
+            return name
+
+    def _register(self, client, model: str, prefix: str, ttl: float) -> Optional[str]:
+        from google.genai import types
+
+        try:
+            cached = client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"travel-planner-{hashlib.sha256(prefix.encode('utf-8')).hexdigest()[:12]}",
+                    system_instruction=prefix,
+                    ttl=f"{int(ttl)}s",
+                ),
+            )
+        except Exception:
+            with self._lock:
+                self.stats["register_failures"] += 1
+            return None
+        with self._lock:
+            self.stats["registered"] += 1
+        return cached.name
+
+    def _expire(self) -> None:
+        # Called with the lock held
+        now = time.time()
+        for key in [key for key, (_, expires_at, _) in self._handles.items() if expires_at <= now]:
+            del self._handles[key]
+
+    def invalidate(self, handle: str) -> None:
+        """Forget ``handle`` after the provider rejected it (e.g. deleted or expired early)."""
+        with self._lock:
+            for key in [key for key, (name, _, _) in self._handles.items() if name == handle]:
+                del self._handles[key]
+                self.stats["invalidated"] += 1
+
+    def record(self, agent: str, input_tokens: int, cached_tokens: int, latency: float) -> None:
+        """Count one LLM call; ``cached_tokens`` is the provider's cache-read input token count."""
+        with self._lock:
+            usage = self._usage.setdefault(agent, {field: 0 for field in self.USAGE_FIELDS})
+            usage["calls"] += 1
+            usage["input_tokens"] += input_tokens
+            usage["cached_tokens"] += cached_tokens
+            usage["latency"] += latency
+            if cached_tokens:
+                usage["cached_calls"] += 1
+                usage["cached_latency"] += latency
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One row per agent: share of input tokens read from cache, and latency with vs without."""
+        with self._lock:
+            rows = []
+            for agent, usage in sorted(self._usage.items()):
+                uncached_calls = usage["calls"] - usage["cached_calls"]
+                rows.append({
+                    "agent": agent,
+                    "calls": usage["calls"],
+                    "cached_calls": usage["cached_calls"],
+                    "input_tokens": usage["input_tokens"],
+                    "cached_tokens": usage["cached_tokens"],
+                    "cached_ratio": round(usage["cached_tokens"] / usage["input_tokens"], 3)
+                    if usage["input_tokens"] else 0.0,
+                    "mean_latency_cached_s": round(usage["cached_latency"] / usage["cached_calls"], 3)
+                    if usage["cached_calls"] else None,
+                    "mean_latency_uncached_s": round((usage["latency"] - usage["cached_latency"]) / uncached_calls, 3)
+                    if uncached_calls else None,
+                })
+            return rows
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition of per-agent input and cached-input tokens."""
+        metrics = [
+            ("input_tokens", "travel_planner_prompt_input_tokens_total", "LLM input tokens."),
+            ("cached_tokens", "travel_planner_prompt_cached_tokens_total", "LLM input tokens read from the provider's context cache."),
+            ("cached_calls", "travel_planner_prompt_cached_calls_total", "LLM calls with a context cache hit."),
+        ]
+        with self._lock:
+            usage = {agent: dict(totals) for agent, totals in self._usage.items()}
+        lines = []
+        for field, metric, help_text in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for agent, totals in sorted(usage.items()):
+                lines.append(f'{metric}{{agent="{agent}"}} {totals[field]}')
+        return "\n".join(lines) + "\n"
+
+
+_default_cache: Optional[PromptCache] = None
+_default_lock = threading.Lock()
+
+
+def get_prompt_cache() -> PromptCache:
+    """Process-wide cache; ``TRAVEL_PLANNER_PROMPT_CACHE=0`` turns explicit context caching off."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = PromptCache(
+                enabled=os.environ.get("TRAVEL_PLANNER_PROMPT_CACHE", "1") != "0",
+                ttl=float(os.environ.get("TRAVEL_PLANNER_PROMPT_CACHE_TTL", DEFAULT_TTL)),
+            )
+        return _default_cache
+
+
+def set_prompt_cache(cache: Optional[PromptCache]) -> None:
+    """Replace the process-wide cache (e.g. with one whose stats start from zero)."""
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
@@ -0,0 +1,353 @@
+"""
+Provider Guard
+Process-wide rate limiting, error-aware retries and circuit breaking for LLM calls.
+
+Every ``TravelAgent`` call goes through one shared ``ProviderGuard``:
+
+    delay = guard.acquire(prompt_tokens)     # may raise CircuitOpenError
+    ... call the provider ...
+    guard.record_success(output_tokens)      # or: delay = guard.retry_delay(e, attempt, max_retries)
+
+The guard only computes delays; callers sleep with ``time.sleep`` or
+``asyncio.sleep`` so the same instance serves threads and event loops.
+"""
+
+import os
+import re
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Iterator, Optional, Set
+
+# Gemini 2.0 Flash paid tier-1 quotas; override with TRAVEL_PLANNER_RPM / TRAVEL_PLANNER_TPM
+DEFAULT_REQUESTS_PER_MINUTE = 2000
+DEFAULT_TOKENS_PER_MINUTE = 4_000_000
+
+# Buckets hold this many seconds of quota, which bounds the burst size
+BURST_SECONDS = 10
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+FATAL_STATUS = {400, 401, 403, 404, 422}
+# Programming and validation errors never succeed on a second attempt
+FATAL_EXCEPTIONS = (ValueError, TypeError, KeyError, AttributeError, NotImplementedError, PermissionError)
+
+# Error classes matched by name anywhere in the exception's MRO, so SDK errors
+# are classified without importing the SDKs. langchain_google_genai raises the
+# langchain_core ``Model*Error`` types, which carry no status code themselves.
+RATE_LIMITED_ERRORS = {"ModelRateLimitError", "ResourceExhausted", "TooManyRequests", "RateLimitError"}
+FATAL_ERRORS = {"ModelAuthenticationError", "ModelPermissionDeniedError", "ModelInvalidRequestError",
+                "ModelNotFoundError", "ContextOverflowError"}
+RETRYABLE_ERRORS = {"ModelAPIError", "ModelConnectionError", "ModelTimeoutError"}
+
+_RETRY_IN = re.compile(r"retry(?:[ _-]?delay)?\W+(?:in\W+)?(\d+(?:\.\d+)?)\s*s", re.I)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider that is failing consistently."""
+
+
+def error_chain(exc: BaseException) -> Iterator[BaseException]:
+    """``exc`` followed by its explicit causes, e.g. the google.genai error a LangChain error wraps."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__
+
+
+def error_names(exc: BaseException) -> Set[str]:
+    """Class names in the MRO of every error in the chain."""
+    return {cls.__name__ for error in error_chain(exc) for cls in type(error).__mro__}
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """HTTP status of a provider error, if it or an error it was raised from carries one."""
+    for error in error_chain(exc):
+        for attr in ("status_code", "code", "http_status"):
+            value = getattr(error, attr, None)
+            if isinstance(value, int):
+                return value
+        response = getattr(error, "response", None)
+        value = getattr(response, "status_code", None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def classify_error(exc: BaseException) -> str:
+    """``"rate_limited"``, ``"retryable"`` or ``"fatal"``."""
+    if isinstance(exc, CircuitOpenError):
+        return "fatal"
+    code = status_code(exc)
+    names = error_names(exc)
+    if code == 429 or names & RATE_LIMITED_ERRORS:
+        return "rate_limited"
+    if code in FATAL_STATUS or names & FATAL_ERRORS:
+        return "fatal"
+    if code in RETRYABLE_STATUS or names & RETRYABLE_ERRORS:
+        return "retryable"
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return "retryable"
+    if isinstance(exc, FATAL_EXCEPTIONS):
+        return "fatal"
+    # Unknown transport/SDK errors keep the old behaviour of being retried
+    return "retryable"
+
+
+def _duration_seconds(value) -> Optional[float]:
+    """Protobuf duration as a message (``seconds``/``nanos``) or its JSON form (``"1.5s"``)."""
+    if hasattr(value, "seconds"):
+        return value.seconds + getattr(value, "nanos", 0) / 1e9
+    if isinstance(value, str) and value.endswith("s"):
+        try:
+            return float(value[:-1])
+        except ValueError:
+            return None
+    return None
+
+
+def _retry_info(details) -> Optional[float]:
+    """RetryInfo delay from gRPC status details or a google.genai error body."""
+    if isinstance(details, dict):
+        details = (details.get("error") or details).get("details")
+    if not isinstance(details, list):
+        return None
+    for detail in details:
+        if isinstance(detail, dict):
+            delay = _duration_seconds(detail.get("retryDelay") or detail.get("retry_delay"))
+        else:
+            delay = _duration_seconds(getattr(detail, "retry_delay", None))
+        if delay is not None:
+            return delay
+    return None
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Server-provided retry hint: Retry-After header, RetryInfo detail or "retry in Ns".
+
+    Checked on ``exc`` and the errors it was raised from, since LangChain wraps
+    the google.genai ``ClientError`` that holds the response.
+    """
+    for error in error_chain(exc):
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        delay = _retry_info(getattr(error, "details", None))
+        if delay is not None:
+            return max(0.0, delay)
+    for error in error_chain(exc):
+        match = _RETRY_IN.search(str(error))
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at ``per_minute``; ``0`` disables it.
+
+    ``reserve`` never blocks: it debits the bucket (possibly below zero) and
+    returns how long the caller must wait for its share, so concurrent callers
+    queue up in arrival order instead of all retrying at once.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Take ``amount`` and return the seconds to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level -= amount
+            return 0.0 if self._level >= 0 else -self._level / self.rate
+
+    def debit(self, amount: float) -> None:
+        """Charge usage known only after the call (e.g. output tokens)."""
+        if self.rate <= 0 or amount <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = max(self._level - amount, -self.capacity)
+
+
+class CircuitBreaker:
+    """Open after ``failure_threshold`` consecutive provider failures.
+
+    While open every call fails fast; after ``reset_timeout`` seconds a single
+    probe call is let through (half-open) and its outcome closes or re-opens
+    the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_neutral(self) -> None:
+        """The provider answered but the call still failed (bad request, throttled)."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; True when this failure opened the circuit."""
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self._failures >= self.failure_threshold):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+                return True
+            return False
+
+
+class ProviderGuard:
+    """Shared request/token limits, retry policy and circuit breaker for one provider."""
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 base_delay: float = 1.0, max_delay: float = 30.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "calls": 0, "limiter_waits": 0, "limiter_wait_seconds": 0.0,
+            "retries": 0, "rate_limited": 0, "fatal_errors": 0,
+            "breaker_trips": 0, "breaker_rejections": 0,
+        }
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def acquire(self, prompt_tokens: int) -> float:
+        """Admit one call; returns the seconds to wait before making it."""
+        if not self.breaker.allow():
+            self._count("breaker_rejections")
+            raise CircuitOpenError("LLM provider circuit is open after repeated failures; try again shortly")
+        self._count("calls")
+        delay = max(self.requests.reserve(1), self.tokens.reserve(prompt_tokens))
+        if delay > 0:
+            self._count("limiter_waits")
+            self._count("limiter_wait_seconds", delay)
+        return delay
+
+    def record_success(self, output_tokens: int = 0) -> None:
+        self.breaker.record_success()
+        self.tokens.debit(output_tokens)
+
+    def retry_delay(self, exc: BaseException, attempt: int, max_retries: int) -> Optional[float]:
+        """Seconds to back off before retrying ``exc``, or None to give up and re-raise."""
+        kind = classify_error(exc)
+        if kind == "fatal":
+            if not isinstance(exc, CircuitOpenError):
+                self.breaker.record_neutral()
+                self._count("fatal_errors")
+            return None
+        if kind == "rate_limited":
+            # Throttling is handled by backing off, not by opening the circuit
+            self.breaker.record_neutral()
+            self._count("rate_limited")
+        elif self.breaker.record_failure():
+            self._count("breaker_trips")
+        if attempt >= max_retries:
+            return None
+        self._count("retries")
+        # Full jitter keeps concurrent sessions from retrying in lockstep
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        hint = retry_after_seconds(exc)
+        if hint is not None:
+            delay = min(self.max_delay, hint) + random.uniform(0, self.base_delay)
+        return delay
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition of the counters and the breaker state."""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        metrics = [
+            ("calls", "travel_planner_llm_calls_admitted_total", "Calls admitted by the limiter."),
+            ("limiter_waits", "travel_planner_llm_limiter_waits_total", "Calls delayed by the rate limiter."),
+            ("limiter_wait_seconds", "travel_planner_llm_limiter_wait_seconds_total", "Total rate limiter delay."),
+            ("retries", "travel_planner_llm_retries_total", "Retried provider calls."),
+            ("rate_limited", "travel_planner_llm_rate_limited_total", "Provider rate-limit (429) responses."),
+            ("fatal_errors", "travel_planner_llm_fatal_errors_total", "Non-retryable provider errors."),
+            ("breaker_trips", "travel_planner_llm_breaker_trips_total", "Times the circuit breaker opened."),
+            ("breaker_rejections", "travel_planner_llm_breaker_rejections_total", "Calls rejected by the open circuit."),
+        ]
+        lines = []
+        for field, metric, help_text in metrics:
+            value = stats[field]
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value:.6f}" if isinstance(value, float) else f"{metric} {value}")
+        lines.append("# HELP travel_planner_llm_breaker_open Whether the circuit breaker is open.")
+        lines.append("# TYPE travel_planner_llm_breaker_open gauge")
+        lines.append(f"travel_planner_llm_breaker_open {int(self.breaker.state != 'closed')}")
+        return "\n".join(lines) + "\n"
+
+
+_default_guard: Optional[ProviderGuard] = None
+_default_lock = threading.Lock()
+
+
+def get_provider_guard() -> ProviderGuard:
+    """Process-wide guard so every session shares one view of the provider's limits."""
+    global _default_guard
+    with _default_lock:
+        if _default_guard is None:
+            _default_guard = ProviderGuard(
+                float(os.environ.get("TRAVEL_PLANNER_RPM", DEFAULT_REQUESTS_PER_MINUTE)),
+                float(os.environ.get("TRAVEL_PLANNER_TPM", DEFAULT_TOKENS_PER_MINUTE)),
+            )
+        return _default_guard
+
+
+def set_provider_guard(guard: Optional[ProviderGuard]) -> None:
+    """Replace the process-wide guard (e.g. with tighter limits for a load test)."""
+    global _default_guard
+    with _default_lock:
+        _default_guard = guard
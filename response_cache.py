@@ -0,0 +1,162 @@
+"""
+Response Cache
+Persistent SQLite cache for agent responses, keyed on normalized prompts.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional, Sequence
+
+DEFAULT_CACHE_PATH = os.path.join(".travel_planner_cache", "responses.sqlite3")
+
+# Seconds an entry stays valid, per agent. Forecasts go stale within hours,
+# destination research is good for a week.
+DEFAULT_TTL = 24 * 3600
+AGENT_TTLS = {
+    "WeatherAgent": 3 * 3600,
+    "ResearchAgent": 7 * 24 * 3600,
+}
+
+
+def normalize_prompt(text: str) -> str:
+    """Collapse whitespace and case so cosmetically different prompts share a key."""
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class ResponseCache:
+    """SQLite-backed response store with per-agent TTL and LRU eviction."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 5000,
+                 ttls: Optional[Dict[str, int]] = None, default_ttl: int = DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = dict(AGENT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                agent TEXT NOT NULL,
+                content TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_access ON responses (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(agent: str, system_prompt: str, temperature: float, prompt: str,
+                 model: Optional[str] = None, max_tokens: Optional[int] = None) -> str:
+        """Entries are per model and output limit, so model tiers never share answers."""
+        payload = json.dumps([
+            agent,
+            normalize_prompt(system_prompt),
+            round(float(temperature), 3),
+            normalize_prompt(prompt),
+            model,
+            max_tokens,
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, agent: str) -> int:
+        return self.ttls.get(agent, self.default_ttl)
+
+    def _count(self, agent: str, outcome: str) -> None:
+        counters = self.stats.setdefault(agent, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def get(self, key: str, agent: str) -> Optional[str]:
+        """Return cached content, or None on a miss or an expired entry."""
+        return self.get_any([key], agent)
+
+    def get_any(self, keys: Sequence[str], agent: str) -> Optional[str]:
+        """Content of the first live entry among ``keys``; counts one hit or miss."""
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                row = self._conn.execute(
+                    "SELECT content, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    continue
+                if row[1] <= now:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                    continue
+                self._conn.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+                self._count(agent, "hits")
+                return row[0]
+            self._count(agent, "misses")
+            return None
+
+    def set(self, key: str, agent: str, content: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, agent, content, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, agent, content, now + self.ttl_for(agent), now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired rows, then least recently used rows above max_entries."""
+        self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self.stats.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return count
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache:
+    """Process-wide cache at ``TRAVEL_PLANNER_CACHE_PATH`` (or the default path)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(
+                os.environ.get("TRAVEL_PLANNER_CACHE_PATH", DEFAULT_CACHE_PATH)
+            )
+        return _default_cache
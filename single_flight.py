@@ -0,0 +1,121 @@
+"""
+Single Flight
+Deduplicates concurrent identical plan runs across sessions.
+
+Sessions that submit the same normalized trip inputs while a plan is still
+running subscribe to that one execution instead of starting their own:
+
+    flight, leader = get_single_flight().join(key, workflow, run_input, config)
+    for mode, output in flight.subscribe():   # "updates" / "custom" / "queue"
+        ...
+    final_state = flight.result()
+
+Runs are jobs on the shared ``JobQueue`` worker pool. Each subscriber replays
+the stream from the beginning, so late joiners catch up, and while a run is
+waiting for a worker its subscribers receive ``("queue", {"position": n})`` events.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from job_queue import NORMAL, Job, JobQueue, get_job_queue
+
+# Inputs that determine a plan; everything else in the state is derived or run-scoped
+PLAN_INPUT_FIELDS = ["destination", "num_days", "travel_style", "budget_range", "start_date",
+                     "interests", "headcount", "multi_city", "cities"]
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def plan_key(state: Dict[str, Any], *, credentials: str, **options) -> str:
+    """Key for ``state``'s trip inputs plus run ``options`` (workflow flags, thread scope).
+
+    ``credentials`` is a digest of the caller's API key (``AgentRegistry.make_key``),
+    so a run is only shared with sessions that would have billed the same key.
+    """
+    inputs = {field: _normalize(state.get(field)) for field in PLAN_INPUT_FIELDS}
+    # Interests are a set; city order is the visiting order and stays significant
+    inputs["interests"] = sorted(inputs["interests"] or [])
+    payload = json.dumps({"inputs": inputs, "options": options, "credentials": credentials}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Registry of in-flight plans keyed by ``plan_key``, run on a ``JobQueue``."""
+
+    def __init__(self, queue: Optional[JobQueue] = None):
+        self.queue = queue or get_job_queue()
+        self._flights: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self.stats = {"started": 0, "shared": 0}
+
+    @property
+    def max_running(self) -> int:
+        return self.queue.workers
+
+    def join(self, key: str, workflow, run_input: Optional[Dict[str, Any]], config: Dict[str, Any],
+             stream_mode: Sequence[str] = ("updates", "custom"), priority: int = NORMAL,
+             metadata: Optional[Dict[str, Any]] = None,
+             on_done: Optional[Callable[[Job], None]] = None,
+             on_start: Optional[Callable[[Job], None]] = None) -> Tuple[Job, bool]:
+        """Return ``(flight, leader)``; ``leader`` is False when an identical run was already in flight.
+
+        ``metadata``, ``on_done`` and ``on_start`` only apply when this call starts the run.
+        Raises ``QueueFull`` when a new run would exceed the queue's backlog limit.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and not flight.done:
+                flight.subscribers += 1
+                self.stats["shared"] += 1
+                return flight, False
+            flight = self.queue.submit(workflow, run_input, config, priority=priority, stream_mode=stream_mode,
+                                       key=key, metadata=metadata,
+                                       on_done=lambda job: self._finished(job, on_done), on_start=on_start)
+            self._flights[key] = flight
+            self.stats["started"] += 1
+        return flight, True
+
+    def _finished(self, flight: Job, on_done: Optional[Callable[[Job], None]]) -> None:
+        with self._lock:
+            # Later identical requests start a new run (and hit the response cache)
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        if on_done is not None:
+            on_done(flight)
+
+    def queue_position(self, flight: Job) -> Optional[int]:
+        """1-based place among runs waiting for a worker, or None once started."""
+        return self.queue.position(flight)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+_default_flight: Optional[SingleFlight] = None
+_default_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Process-wide registry on the process-wide ``JobQueue``."""
+    global _default_flight
+    with _default_lock:
+        if _default_flight is None:
+            _default_flight = SingleFlight()
+        return _default_flight
+
+
+def set_single_flight(flight: Optional[SingleFlight]) -> None:
+    """Replace the process-wide registry (e.g. one on a dedicated queue)."""
+    global _default_flight
+    with _default_lock:
+        _default_flight = flight
@@ -0,0 +1,49 @@
+"""BlobStore pruning against a controlled clock."""
+
+import pytest
+
+import blob_store
+from blob_store import TOUCH_INTERVAL, BlobStore, MissingBlobError
+
+DAY = 24 * 3600
+TEXT = "itinerary " * 200
+
+
+class Clock:
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(blob_store.time, "time", clock)
+    return clock
+
+
+def test_batched_touch_does_not_expose_a_retained_blob(tmp_path, clock):
+    path = str(tmp_path / "blobs.sqlite3")
+    store = BlobStore(path)
+    start = clock.now
+    digest = store.put(TEXT)
+    # Re-stored within TOUCH_INTERVAL: served from memory, last_used on disk stays at start
+    clock.now = start + 50 * 60
+    store.put(TEXT)
+    clock.now = start + 50 * 60 + 3 * DAY - 60
+    assert store.prune(3 * DAY) == 0
+    assert store.get(digest) == TEXT
+    # A fresh process reads it from disk
+    assert BlobStore(path).get(digest) == TEXT
+
+
+def test_blobs_unused_past_the_window_are_pruned(tmp_path, clock):
+    store = BlobStore(str(tmp_path / "blobs.sqlite3"))
+    start = clock.now
+    digest = store.put(TEXT)
+    clock.now = start + 3 * DAY + TOUCH_INTERVAL + 1
+    assert store.prune(3 * DAY) == 1
+    with pytest.raises(MissingBlobError):
+        store.get(digest)
@@ -0,0 +1,68 @@
+"""JobQueue scheduling hooks with a stub workflow."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+from job_queue import JobQueue
+
+
+class StubWorkflow:
+    """Streams one update per run; runs block until ``release`` is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.inputs = []
+
+    def stream(self, run_input, config, stream_mode):
+        self.inputs.append(run_input)
+        self.release.wait(5)
+        yield "updates", {"done": {"step": "done"}}
+
+    def get_state(self, config):
+        return SimpleNamespace(values={"thread": config["configurable"]["thread_id"]})
+
+
+def config(name):
+    return {"configurable": {"thread_id": name}}
+
+
+def test_run_start_is_recorded_when_a_worker_picks_the_job_up():
+    import travel_planner_streamlit as tp
+
+    queue = JobQueue(workers=1)
+    workflow = StubWorkflow()
+    first = queue.submit(workflow, {"workflow_start_time": 0.0}, config("first"), on_start=tp.mark_run_start)
+    second = queue.submit(workflow, {"workflow_start_time": time.time()}, config("second"),
+                          on_start=tp.mark_run_start)
+    time.sleep(0.3)
+    workflow.release.set()
+    second.result()
+
+    assert first.run_input["workflow_start_time"] == first.started_at
+    # The queued job's clock starts after its wait, not at submission
+    assert workflow.inputs[1]["workflow_start_time"] == second.started_at
+    assert second.started_at - second.submitted_at >= 0.3
+
+
+def test_finished_jobs_expire_without_new_submissions():
+    queue = JobQueue(workers=1, retention=0.2)
+    workflow = StubWorkflow()
+    workflow.release.set()
+    job = queue.submit(workflow, {}, config("only"))
+    job.result()
+    assert queue.get(job.job_id) is job
+    time.sleep(0.3)
+    assert queue.get(job.job_id) is None
+
+    # Completions prune as well, so nobody has to look expired jobs up
+    old = queue.submit(workflow, {}, config("old"))
+    old.result()
+    slow = StubWorkflow()
+    last = queue.submit(slow, {}, config("last"))
+    time.sleep(0.3)
+    assert old.job_id in queue._jobs
+    slow.release.set()
+    last.result()
+    time.sleep(0.05)
+    assert old.job_id not in queue._jobs
@@ -0,0 +1,142 @@
+"""PromptCache against the offline ``client.caches`` fake, and TravelAgent's inline fallback."""
+
+import asyncio
+import types
+
+import pytest
+
+from benchmarks.fakes import FakeCachedContents, FakeChatModel, provider_error
+from model_router import ModelRouter, load_routing
+from prompt_cache import PromptCache, handle_rejected
+from provider_guard import ProviderGuard
+
+PREFIX = "You are a travel research expert. " * 20
+PROFILE = {"model": "gemini-2.0-flash", "cache_min_tokens": 0}
+
+
+def fake_llm():
+    return types.SimpleNamespace(client=types.SimpleNamespace(caches=FakeCachedContents()))
+
+
+def test_registers_prefix_once_and_reuses_handle():
+    cache, llm = PromptCache(), fake_llm()
+    handle = cache.handle(llm, PROFILE, PREFIX)
+    assert handle and llm.client.caches.text(handle) == PREFIX
+    assert cache.handle(llm, PROFILE, PREFIX) == handle
+    assert llm.client.caches.created == 1
+    assert cache.stats["registered"] == 1
+
+
+def test_prefix_below_minimum_is_sent_inline():
+    cache, llm = PromptCache(), fake_llm()
+    assert cache.handle(llm, {"model": "gemini-2.0-flash", "cache_min_tokens": 1024}, PREFIX) is None
+    # Profiles without a minimum use Gemini's
+    assert cache.handle(llm, {"model": "gemini-2.0-flash"}, PREFIX) is None
+    assert cache.handle(llm, {"model": "gemini-2.0-flash", "cache_min_tokens": None}, PREFIX) is None
+    assert llm.client.caches.created == 0
+
+
+def test_disabled_cache_never_registers():
+    cache, llm = PromptCache(enabled=False), fake_llm()
+    assert cache.handle(llm, PROFILE, PREFIX) is None
+    assert llm.client.caches.created == 0
+
+
+def test_failed_registration_is_not_retried_on_every_call():
+    cache, llm = PromptCache(), fake_llm()
+    calls = []
+
+    def create(model, config):
+        calls.append(model)
+        raise provider_error(400, "Cached content is too small.")
+
+    llm.client.caches.create = create
+    assert cache.handle(llm, PROFILE, PREFIX) is None
+    assert cache.handle(llm, PROFILE, PREFIX) is None
+    assert len(calls) == 1
+    assert cache.stats["register_failures"] == 1
+
+
+def test_invalidated_handle_is_registered_again():
+    cache, llm = PromptCache(), fake_llm()
+    handle = cache.handle(llm, PROFILE, PREFIX)
+    cache.invalidate(handle)
+    assert cache.stats["invalidated"] == 1
+    assert cache.handle(llm, PROFILE, PREFIX) == handle
+    assert llm.client.caches.created == 2
+
+
+@pytest.mark.parametrize("code, rejected", [(400, True), (403, True), (404, True), (429, False)])
+def test_handle_rejected_matches_provider_errors(code, rejected):
+    assert handle_rejected(provider_error(code, "CachedContent not found (or permission denied)")) is rejected
+
+
+def test_handle_rejected_ignores_transient_and_overflow_errors():
+    from google.genai.errors import ServerError
+    from langchain_google_genai.chat_models import GoogleContextOverflowError
+
+    assert not handle_rejected(ServerError(503, {"error": {"code": 503, "status": "UNAVAILABLE"}}))
+    assert not handle_rejected(GoogleContextOverflowError(400, {"error": {"code": 400}}))
+    assert not handle_rejected(TimeoutError())
+
+
+@pytest.fixture
+def agent():
+    import travel_planner_streamlit as tp
+
+    routing = load_routing()
+    for profile in routing["profiles"].values():
+        profile["cache_min_tokens"] = 0
+    agent = tp.TravelAgent("ResearchAgent", "Research", PREFIX, api_key="offline-test",
+                           guard=ProviderGuard(base_delay=0), router=ModelRouter(routing),
+                           prompt_cache=PromptCache())
+    fake = FakeChatModel("ResearchAgent", time_scale=0)
+    for tier in agent.tiers:
+        tier["llm"] = fake
+    return agent
+
+
+def expire(agent):
+    """Drop every registered prefix on the provider side, as an early expiry would."""
+    caches = agent.tiers[0]["llm"].client.caches
+    for name in list(caches._contents):
+        caches.delete(name)
+
+
+def test_agent_sends_prefix_as_cached_content(agent):
+    result = agent.invoke("Plan three days in Rome")
+    assert result["cached_tokens"] > 0
+    assert agent.prompt_cache.stats["registered"] == 1
+
+
+def test_agent_falls_back_inline_when_cached_content_is_rejected(agent):
+    first = agent.invoke("Plan three days in Rome")
+    expire(agent)
+    result = agent.invoke("Plan three days in Rome")
+    # Same reply as with the cached prefix, sent inline without burning a retry
+    assert result["content"] == first["content"]
+    assert result["cached_tokens"] == 0
+    assert result["attempt"] == 1
+    assert agent.prompt_cache.stats["invalidated"] == 1
+    assert agent.guard.stats["retries"] == 0 and agent.guard.stats["fatal_errors"] == 0
+    # The next call registers the prefix again
+    assert agent.invoke("Plan three days in Rome")["cached_tokens"] > 0
+    assert agent.prompt_cache.stats["registered"] == 2
+
+
+def test_streaming_fallback_discards_partial_output(agent):
+    agent.invoke("Plan three days in Rome")
+    expire(agent)
+    tokens = []
+    result = agent.invoke("Plan three days in Rome", on_token=tokens.append)
+    assert None in tokens
+    streamed = tokens[len(tokens) - tokens[::-1].index(None):]
+    assert "".join(streamed) == result["content"]
+
+
+def test_async_fallback(agent):
+    agent.invoke("Plan three days in Rome")
+    expire(agent)
+    result = asyncio.run(agent.ainvoke("Plan three days in Rome"))
+    assert result["cached_tokens"] == 0
+    assert agent.prompt_cache.stats["invalidated"] == 1
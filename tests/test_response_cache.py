@@ -0,0 +1,41 @@
+"""ResponseCache lookups and TravelAgent's per-tier cache keys."""
+
+from benchmarks.fakes import FakeChatModel
+from model_router import ModelRouter, load_routing
+from provider_guard import ProviderGuard
+from response_cache import ResponseCache
+
+
+class BrokenModel:
+    client = None
+
+    def invoke(self, *args, **kwargs):
+        raise TimeoutError("lite tier unavailable")
+
+
+def test_get_any_returns_first_live_entry_and_counts_once(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"))
+    cache.set("b", "Agent", "from b")
+    cache.set("c", "Agent", "from c")
+    assert cache.get_any(["a", "b", "c"], "Agent") == "from b"
+    assert cache.get_any(["a", "d"], "Agent") is None
+    assert cache.stats["Agent"] == {"hits": 1, "misses": 1}
+
+
+def test_fallback_tier_answers_are_served_from_cache(tmp_path):
+    import travel_planner_streamlit as tp
+
+    cache = ResponseCache(str(tmp_path / "responses.sqlite3"))
+    agent = tp.TravelAgent("WeatherAgent", "Weather", "You are a weather analyst.", api_key="offline-test",
+                           cache=cache, guard=ProviderGuard(base_delay=0), router=ModelRouter(load_routing()))
+    assert len(agent.tiers) == 2
+    agent.tiers[0]["llm"] = BrokenModel()
+    agent.tiers[1]["llm"] = FakeChatModel("WeatherAgent", time_scale=0)
+
+    first = agent.invoke("Forecast for Rome")
+    assert first["fallback"]
+    second = agent.invoke("Forecast for Rome")
+    assert second.get("cache_hit") and second["content"] == first["content"]
+    # Lite and full answers are kept apart
+    assert agent._cache_key(agent._as_messages("Forecast for Rome"), 0) != \
+        agent._cache_key(agent._as_messages("Forecast for Rome"), 1)
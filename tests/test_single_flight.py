@@ -0,0 +1,24 @@
+"""plan_key: which sessions may share one plan run."""
+
+from single_flight import plan_key
+
+STATE = {"destination": "Rome", "num_days": 3, "travel_style": "Balanced", "budget_range": "Moderate",
+         "start_date": "2026-11-20", "interests": ["food", "history"], "headcount": 2,
+         "multi_city": False, "cities": []}
+
+
+def key(state=STATE, credentials="alice", **options):
+    return plan_key(state, credentials=credentials, use_cache=True, scope=None, **options)
+
+
+def test_equivalent_inputs_share_a_key():
+    variant = dict(STATE, destination="  rome ", interests=["history", "food"], workflow_start_time=1.0)
+    assert key(variant) == key()
+
+
+def test_different_credentials_never_share_a_run():
+    assert key(credentials="alice") != key(credentials="mallory")
+
+
+def test_options_are_part_of_the_key():
+    assert key(incremental=True) != key(incremental=False)
@@ -0,0 +1,183 @@
+"""WeatherClient against a local Open-Meteo stub served by ``http.server``."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from weather_client import WeatherClient
+
+PLACES = {"rome": {"name": "Rome", "latitude": 41.89, "longitude": 12.51}}
+
+
+class OpenMeteoStub:
+    """Geocoding and forecast endpoints with request counts, injectable delay and status."""
+
+    def __init__(self):
+        self.requests = {"/v1/search": 0, "/v1/forecast": 0}
+        self.delay = 0.0
+        self.status = 200
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                with stub._lock:
+                    stub.requests[url.path] = stub.requests.get(url.path, 0) + 1
+                time.sleep(stub.delay)
+                if stub.status != 200:
+                    self._reply(stub.status, {"error": True, "reason": "stub failure"})
+                elif url.path == "/v1/search":
+                    place = PLACES.get(params["name"].strip().casefold())
+                    self._reply(200, {"results": [place]} if place else {})
+                else:
+                    days = ["2026-11-20", "2026-11-21", "2026-11-22"]
+                    self._reply(200, {"daily": {
+                        "time": days,
+                        "temperature_2m_max": [16.0, 17.5, 15.2],
+                        "temperature_2m_min": [8.1, 9.0, 7.4],
+                        "weathercode": [0, 61, 3],
+                        "precipitation_probability_max": [5, 70, 20],
+                    }})
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client timed out and hung up
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = OpenMeteoStub()
+    yield server
+    server.close()
+
+
+def make_client(stub, **kwargs):
+    return WeatherClient(geocode_url=f"{stub.base}/v1/search", forecast_url=f"{stub.base}/v1/forecast",
+                         **kwargs)
+
+
+def test_forecast_is_formatted(stub):
+    result = make_client(stub).get_forecast("Rome", "2026-11-20", num_days=3)
+    assert result["location"] == "Rome (41.89°, 12.51°)"
+    assert result["num_days"] == 3
+    assert result["forecast"][1] == {"date": "2026-11-21", "temp_max_c": 17.5, "temp_min_c": 9.0,
+                                     "conditions": "Slight rain", "precipitation_prob": 70}
+
+
+def test_base_urls_from_environment(stub, monkeypatch):
+    monkeypatch.setenv("OPEN_METEO_GEOCODE_URL", f"{stub.base}/v1/search")
+    monkeypatch.setenv("OPEN_METEO_FORECAST_URL", f"{stub.base}/v1/forecast")
+    assert WeatherClient().get_forecast("Rome", "2026-11-20", num_days=3)["num_days"] == 3
+
+
+def test_repeat_lookups_are_served_from_cache(stub):
+    client = make_client(stub)
+    first = client.get_forecast("Rome", "2026-11-20", num_days=3)
+    # Case and whitespace variants share the geocoding entry
+    assert client.get_forecast("  rome ", "2026-11-20", num_days=3) == first
+    assert stub.requests == {"/v1/search": 1, "/v1/forecast": 1}
+    assert client.stats["cache_hits"] == 2 and client.stats["upstream_calls"] == 2
+
+
+def test_entries_expire_after_their_ttl(stub):
+    client = make_client(stub, forecast_ttl=0.2)
+    client.get_forecast("Rome", "2026-11-20", num_days=3)
+    client.get_forecast("Rome", "2026-11-20", num_days=3)
+    assert stub.requests["/v1/forecast"] == 1
+    time.sleep(0.3)
+    client.get_forecast("Rome", "2026-11-20", num_days=3)
+    assert stub.requests["/v1/forecast"] == 2
+    # The geocoding TTL is much longer, so the location was not fetched again
+    assert stub.requests["/v1/search"] == 1
+
+
+def test_concurrent_requests_are_collapsed(stub):
+    client = make_client(stub)
+    stub.delay = 0.3
+    callers = 8
+    barrier = threading.Barrier(callers)
+    results = []
+
+    def lookup():
+        barrier.wait()
+        results.append(client.geocode("Rome"))
+
+    threads = [threading.Thread(target=lookup) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [PLACES["rome"]] * callers
+    assert stub.requests["/v1/search"] == 1
+    assert client.stats["upstream_calls"] == 1
+    assert client.stats["coalesced"] + client.stats["cache_hits"] == callers - 1
+    assert client.stats["coalesced"] >= 1
+
+
+def test_unknown_location(stub):
+    assert make_client(stub).get_forecast("Atlantis", "2026-11-20") == {"error": "Location not found: Atlantis"}
+
+
+def test_server_errors_are_reported_and_not_cached(stub):
+    client = make_client(stub)
+    stub.status = 503
+    result = client.get_forecast("Rome", "2026-11-20", num_days=3)
+    assert "503" in result["error"]
+    stub.status = 200
+    assert client.get_forecast("Rome", "2026-11-20", num_days=3)["num_days"] == 3
+    assert stub.requests["/v1/search"] == 2
+
+
+def test_concurrent_callers_share_the_leaders_error(stub):
+    client = make_client(stub)
+    stub.status, stub.delay = 500, 0.3
+    callers = 4
+    barrier = threading.Barrier(callers)
+    errors = []
+
+    def lookup():
+        barrier.wait()
+        errors.append(client.get_forecast("Rome", "2026-11-20")["error"])
+
+    threads = [threading.Thread(target=lookup) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == callers and all("500" in error for error in errors)
+    assert stub.requests["/v1/search"] == 1
+
+
+def test_timeout_is_reported(stub):
+    client = make_client(stub, timeout=0.1)
+    stub.delay = 0.5
+    assert "error" in client.get_forecast("Rome", "2026-11-20")
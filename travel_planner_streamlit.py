@@ -5,23 +5,41 @@ A multi-agent AI system for comprehensive travel planning using LangGraph and Ge
 
 import streamlit as st
 import os
+import re
 import json
 import time
 from datetime import datetime, timedelta
-from typing import TypedDict, List, Dict, Any, Optional, Sequence, Annotated
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypedDict, List, Dict, Any, Optional, Sequence, Annotated, Callable
 import warnings
 import operator
+import asyncio
+import hashlib
+import threading
+import uuid
 
-# LangChain and LangGraph imports
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
-from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.tools import tool
+# LangChain, LangGraph, the Gemini client and the HTTP stack take seconds to
+# import, so they are imported where first used (creating agents, compiling
+# the graph, grounding); the form renders before any of them load.
+# benchmarks/bench_startup.py keeps them off the startup path.
 
-# Utility imports
-import requests
-from bs4 import BeautifulSoup
+from response_cache import ResponseCache, get_default_cache
+from provider_guard import CircuitOpenError, ProviderGuard, get_provider_guard
+from model_router import ModelRouter, get_model_router
+from prompt_cache import PromptCache, get_prompt_cache, handle_rejected
+from job_queue import HIGH, NORMAL, QueueFull, get_job_queue
+from single_flight import get_single_flight, plan_key
+from plan_export import FORMATS, export_chunks, file_name, iter_markdown
+from trip_schemas import (
+    BudgetBreakdown, HotelShortlist, LogisticsPlan, hotels_unavailable, parse_structured,
+    render_budget, render_hotels, render_logistics, repair_prompt, schema_instructions,
+    summarize_budget, summarize_hotels, summarize_logistics
+)
+from context_packer import ContextPacker, estimate_tokens
+from instrumentation import (
+    build_node_record, collect_agent_calls, get_metrics_aggregator,
+    inputs_ready_at, record_agent_call, to_otel_spans
+)
 
 warnings.filterwarnings('ignore')
 
@@ -29,15 +47,17 @@ warnings.filterwarnings('ignore')
 # PAGE CONFIGURATION
 # =============================================================================
 
-st.set_page_config(
-    page_title="AI Travel Planner",
-    page_icon="✈️",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+def configure_page():
+    """Page config and custom CSS; called from main() so headless imports skip it."""
+    st.set_page_config(
+        page_title="AI Travel Planner",
+        page_icon="✈️",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
 
-# Custom CSS
-st.markdown("""
+    # Custom CSS
+    st.markdown("""
 <style>
     .main-header {
         font-size: 3rem;
@@ -74,22 +94,29 @@ st.markdown("""
         background-color: #764ba2;
     }
 </style>
-""", unsafe_allow_html=True)
+    """, unsafe_allow_html=True)
 
 # =============================================================================
 # TOOL DEFINITIONS
 # =============================================================================
 
-@tool
+_ddgs_class = None
+
+def _ddgs():
+    """The DuckDuckGo client class, resolved on first search (a failed import is not cached by Python)."""
+    global _ddgs_class
+    if _ddgs_class is None:
+        try:
+            from ddgs import DDGS
+        except Exception:
+            from duckduckgo_search import DDGS
+        _ddgs_class = DDGS
+    return _ddgs_class
+
 def web_search_tool(query: str, max_results: int = 6) -> List[Dict[str, Any]]:
     """Search the web using DuckDuckGo."""
     try:
-        from ddgs import DDGS
-    except Exception:
-        from duckduckgo_search import DDGS
-    
-    try:
-        with DDGS() as ddgs:
+        with _ddgs()() as ddgs:
             results = list(ddgs.text(query, max_results=max_results))
         
         formatted_results = []
@@ -104,67 +131,143 @@ def web_search_tool(query: str, max_results: int = 6) -> List[Dict[str, Any]]:
     except Exception as e:
         return [{"title": "Search Error", "url": "", "snippet": f"Error: {str(e)}"}]
 
-@tool
 def get_weather_forecast(destination: str, start_date: str, num_days: int = 7) -> Dict[str, Any]:
     """Get weather forecast using Open-Meteo API."""
+    from weather_client import get_weather_client
+    
+    return get_weather_client().get_forecast(destination, start_date, num_days)
+
+# =============================================================================
+# GROUNDING
+# =============================================================================
+
+def _format_search_results(results: List[Dict[str, Any]], max_snippets: int = 5,
+                           max_chars: int = 220) -> str:
+    """Compact bullet list of search hits, dropping errors and duplicate URLs/snippets."""
+    seen_urls, seen_snippets = set(), set()
+    lines = []
+    for r in results:
+        if r.get("title") == "Search Error":
+            continue
+        url = r.get("url", "")
+        snippet = " ".join(r.get("snippet", "").split())
+        fingerprint = snippet.casefold()[:120]
+        if not snippet or (url and url in seen_urls) or fingerprint in seen_snippets:
+            continue
+        seen_urls.add(url)
+        seen_snippets.add(fingerprint)
+        if len(snippet) > max_chars:
+            snippet = snippet[:max_chars].rsplit(" ", 1)[0] + "…"
+        lines.append(f"- {r.get('title', '')}: {snippet} ({url})")
+        if len(lines) >= max_snippets:
+            break
+    return "\n".join(lines)
+
+def _format_forecast(forecast: Dict[str, Any]) -> str:
+    if forecast.get("error"):
+        return ""
+    lines = [f"Location: {forecast.get('location', '')}"]
+    for day in forecast.get("forecast", []):
+        lines.append(
+            f"- {day['date']}: {day['conditions']}, {day['temp_min_c']}-{day['temp_max_c']}°C, "
+            f"{day['precipitation_prob']}% rain"
+        )
+    return "\n".join(lines)
+
+def _grounding_fetchers(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Zero-argument fetchers, one per grounded node, returning compact context text."""
+    destination = state["destination"]
+    return {
+        "research": lambda: _format_search_results(web_search_tool(
+            f"{destination} top attractions restaurants travel tips", max_results=8
+        )),
+        "hotel": lambda: _format_search_results(web_search_tool(
+            f"{destination} {state['budget_range']} hotels", max_results=8
+        )),
+        "weather": lambda: _format_forecast(get_weather_forecast(
+            destination, state["start_date"], state["num_days"]
+        )),
+    }
+
+def _timed_fetch(fetch) -> tuple:
+    start = time.time()
     try:
-        # Geocode
-        geocode_url = "https://geocoding-api.open-meteo.com/v1/search"
-        geo_response = requests.get(geocode_url, params={"name": destination, "count": 1}, timeout=10)
-        geo_data = geo_response.json()
-        
-        if not geo_data.get("results"):
-            return {"error": f"Location not found: {destination}"}
-        
-        location = geo_data["results"][0]
-        lat, lon = location["latitude"], location["longitude"]
-        
-        # Weather forecast
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = (start + timedelta(days=num_days - 1)).strftime('%Y-%m-%d')
-        
-        weather_url = "https://api.open-meteo.com/v1/forecast"
-        weather_params = {
-            "latitude": lat,
-            "longitude": lon,
-            "daily": "temperature_2m_max,temperature_2m_min,weathercode,precipitation_probability_max",
-            "timezone": "auto",
-            "start_date": start.strftime('%Y-%m-%d'),
-            "end_date": end
-        }
-        
-        weather_response = requests.get(weather_url, params=weather_params, timeout=10)
-        weather_data = weather_response.json()
-        
-        daily = weather_data.get("daily", {})
-        weather_codes = {
-            0: "Clear sky", 1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
-            45: "Foggy", 61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain",
-            71: "Slight snow", 95: "Thunderstorm"
-        }
-        
-        forecast = []
-        for i in range(len(daily.get("time", []))):
-            forecast.append({
-                "date": daily["time"][i],
-                "temp_max_c": daily["temperature_2m_max"][i],
-                "temp_min_c": daily["temperature_2m_min"][i],
-                "conditions": weather_codes.get(daily["weathercode"][i], "Unknown"),
-                "precipitation_prob": daily["precipitation_probability_max"][i]
-            })
-        
-        return {
-            "location": f"{location.get('name')} ({lat:.2f}°, {lon:.2f}°)",
-            "forecast": forecast,
-            "num_days": len(forecast)
+        context = fetch()
+    except Exception:
+        context = ""
+    return context, time.time() - start
+
+def _grounding_update(results: Dict[str, tuple], elapsed: float) -> Dict[str, Any]:
+    grounding, stats = {}, {}
+    for node_name, (context, fetch_time) in results.items():
+        grounding[node_name] = context
+        stats[node_name] = {
+            "fetch_time": fetch_time,
+            "prompt_tokens_added": estimate_tokens(_grounding_block(context)) if context else 0
         }
-    except Exception as e:
-        return {"error": str(e)}
+    stats["_total"] = {"fetch_time": elapsed}
+    return {"grounding": grounding, "grounding_stats": stats, "current_step": "grounding_complete"}
+
+def grounding_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the web searches and forecast fetch concurrently before any LLM call."""
+    start = time.time()
+    fetchers = _grounding_fetchers(state)
+    with ThreadPoolExecutor(max_workers=len(fetchers)) as executor:
+        futures = {name: executor.submit(_timed_fetch, fetch) for name, fetch in fetchers.items()}
+        results = {name: future.result() for name, future in futures.items()}
+    return _grounding_update(results, time.time() - start)
+
+async def agrounding_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Async variant of grounding_node."""
+    start = time.time()
+    fetchers = _grounding_fetchers(state)
+    names = list(fetchers)
+    outcomes = await asyncio.gather(
+        *(asyncio.to_thread(_timed_fetch, fetchers[name]) for name in names)
+    )
+    return _grounding_update(dict(zip(names, outcomes)), time.time() - start)
+
+def _grounding_block(context: str) -> str:
+    return f"""
+    
+    Base your answer on these live sources and keep it concise; do not invent details beyond them:
+{context}"""
+
+def _with_grounding(prompt: str, state: Dict[str, Any], node_name: str) -> str:
+    context = (state.get("grounding") or {}).get(node_name)
+    if not context:
+        return prompt
+    return prompt + _grounding_block(context)
 
 # =============================================================================
 # STATE DEFINITION
 # =============================================================================
 
+def _keep_last(current: str, new: str) -> str:
+    """Reducer for status fields written by concurrent branches."""
+    return new
+
+def _accumulate_timings(current: Dict[str, float], new: Dict[str, float]) -> Dict[str, float]:
+    """Reducer that sums per-node wall time, so revisions add to the first pass."""
+    merged = dict(current or {})
+    for node, elapsed in (new or {}).items():
+        merged[node] = merged.get(node, 0.0) + elapsed
+    return merged
+
+def _merge_city_results(current: Dict[str, Dict[str, str]],
+                        new: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+    """Reducer merging per-city agent outputs written by concurrent city sub-graphs."""
+    merged = {city: dict(fields) for city, fields in (current or {}).items()}
+    for city, fields in (new or {}).items():
+        merged.setdefault(city, {}).update(fields)
+    return merged
+
+def _merge_dicts(current: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Reducer for per-node dicts written by concurrent branches."""
+    merged = dict(current or {})
+    merged.update(new or {})
+    return merged
+
 class TravelPlannerState(TypedDict):
     destination: str
     num_days: int
@@ -182,13 +285,85 @@ class TravelPlannerState(TypedDict):
     logistics_plan: str
     final_itinerary: str
     activity_bookings: str
-    messages: Annotated[Sequence[BaseMessage], operator.add]
-    current_step: str
+    messages: Annotated[list, operator.add]
+    current_step: Annotated[str, _keep_last]
     revision_count: int
     workflow_start_time: float
     workflow_end_time: float
     total_cost_estimate: float
-    errors: list
+    errors: Annotated[list, operator.add]
+    node_timings: Annotated[Dict[str, float], _accumulate_timings]
+    node_metrics: Annotated[list, operator.add]
+    grounding: Dict[str, str]
+    grounding_stats: Dict[str, Dict[str, Any]]
+    city_results: Annotated[Dict[str, Dict[str, str]], _merge_city_results]
+    # Structured agent outputs (model_dump() of trip_schemas models, {} when unparsed)
+    budget_breakdown: Dict[str, Any]
+    hotel_shortlist: Dict[str, Any]
+    logistics_details: Dict[str, Any]
+    node_cache: Annotated[Dict[str, Dict[str, Any]], _merge_dicts]
+    reused_nodes: Annotated[Dict[str, float], _merge_dicts]
+
+class CityPlanState(TypedDict):
+    """Input/state of one city's research/weather/hotel sub-graph."""
+    city: str
+    destination: str
+    num_days: int
+    start_date: str
+    travel_style: str
+    budget_range: str
+    headcount: int
+    interests: list
+    multi_city: bool
+    cities: list
+    revision_count: int
+    workflow_start_time: float
+    current_step: Annotated[str, _keep_last]
+    city_results: Annotated[Dict[str, Dict[str, str]], _merge_city_results]
+    node_metrics: Annotated[list, operator.add]
+    node_timings: Annotated[Dict[str, float], _accumulate_timings]
+
+def build_initial_state(destination: str, num_days: int, travel_style: str,
+                        budget_range: str, start_date: str, interests: list,
+                        headcount: int, multi_city: bool = False,
+                        cities: Optional[list] = None) -> Dict[str, Any]:
+    """Initial TravelPlannerState for a trip request (start_date is YYYY-MM-DD)."""
+    from langchain_core.messages import HumanMessage
+    
+    return {
+        "destination": destination,
+        "num_days": num_days,
+        "travel_style": travel_style,
+        "budget_range": budget_range,
+        "start_date": start_date,
+        "interests": interests,
+        "headcount": headcount,
+        "multi_city": multi_city,
+        "cities": cities if multi_city and cities else [destination],
+        "research_results": "",
+        "weather_analysis": "",
+        "hotel_recommendations": "",
+        "budget_estimate": "",
+        "logistics_plan": "",
+        "final_itinerary": "",
+        "activity_bookings": "",
+        "messages": [HumanMessage(content=f"Plan trip to {destination}")],
+        "current_step": "initialized",
+        "revision_count": 0,
+        "workflow_start_time": time.time(),
+        "workflow_end_time": 0.0,
+        "total_cost_estimate": 0.0,
+        "errors": [],
+        "node_timings": {},
+        "node_metrics": [],
+        "grounding": {},
+        "grounding_stats": {},
+        "city_results": {},
+        "budget_breakdown": {},
+        "hotel_shortlist": {},
+        "logistics_details": {},
+        "reused_nodes": {}
+    }
 
 # =============================================================================
 # AGENT CLASS
@@ -196,251 +371,1317 @@ class TravelPlannerState(TypedDict):
 
 class TravelAgent:
     def __init__(self, name: str, role: str, system_prompt: str, 
-                 api_key: str, temperature: float = 0.7):
+                 api_key: str, temperature: float = 0.7,
+                 cache: Optional[ResponseCache] = None,
+                 guard: Optional[ProviderGuard] = None,
+                 output_schema=None,
+                 router: Optional[ModelRouter] = None,
+                 prompt_cache: Optional[PromptCache] = None):
         self.name = name
         self.role = role
         self.system_prompt = system_prompt
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash-exp",
-            google_api_key=api_key,
-            temperature=temperature,
-            max_tokens=8000,
-            timeout=120
-        )
-    
-    def invoke(self, messages: List, max_retries: int = 2) -> Dict[str, Any]:
-        start_time = time.time()
-        full_messages = [SystemMessage(content=self.system_prompt)] + messages
+        self.cache = cache
+        self.guard = guard or get_provider_guard()
+        self.router = router or get_model_router()
+        self.prompt_cache = prompt_cache or get_prompt_cache()
+        # Agents with a pydantic output_schema answer in JSON (see invoke_structured)
+        self.output_schema = output_schema
+        json_mode = {}
+        if output_schema is not None:
+            self.system_prompt = f"{system_prompt}\n\n{schema_instructions(output_schema)}"
+            json_mode = {"response_mime_type": "application/json"}
+        from langchain_google_genai import ChatGoogleGenerativeAI
         
-        for attempt in range(max_retries + 1):
+        # Model tiers in fallback order, from the routing table
+        self.tiers = [
+            {
+                "profile": profile,
+                "llm": ChatGoogleGenerativeAI(
+                    model=profile["model"],
+                    google_api_key=api_key,
+                    temperature=profile["temperature"],
+                    max_tokens=profile["max_tokens"],
+                    timeout=profile["timeout"],
+                    **json_mode
+                )
+            }
+            for profile in self.router.profiles_for(name, temperature)
+        ]
+        self.temperature = self.tiers[0]["profile"]["temperature"]
+    
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        content = chunk.content
+        if isinstance(content, list):
+            return "".join(
+                part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+            )
+        return content or ""
+    
+    @staticmethod
+    def _as_messages(messages) -> List:
+        """A bare prompt string is a single human turn."""
+        if isinstance(messages, str):
+            from langchain_core.messages import HumanMessage
+            return [HumanMessage(content=messages)]
+        return messages
+    
+    def _full_messages(self, messages: List) -> List:
+        from langchain_core.messages import SystemMessage
+        return [SystemMessage(content=self.system_prompt)] + messages
+    
+    def _stream_call(self, llm, full_messages: List, on_token: Callable[[Optional[str]], None], **options):
+        from langchain_core.messages import AIMessage
+        from langchain_core.messages.ai import add_usage
+        parts, usage = [], None
+        for chunk in llm.stream(full_messages, **options):
+            text = self._chunk_text(chunk)
+            if text:
+                parts.append(text)
+                on_token(text)
+            usage = add_usage(usage, chunk.usage_metadata) if chunk.usage_metadata else usage
+        return AIMessage(content="".join(parts), usage_metadata=usage)
+    
+    async def _astream_call(self, llm, full_messages: List, on_token: Callable[[Optional[str]], None],
+                            **options):
+        from langchain_core.messages import AIMessage
+        from langchain_core.messages.ai import add_usage
+        parts, usage = [], None
+        async for chunk in llm.astream(full_messages, **options):
+            text = self._chunk_text(chunk)
+            if text:
+                parts.append(text)
+                on_token(text)
+            usage = add_usage(usage, chunk.usage_metadata) if chunk.usage_metadata else usage
+        return AIMessage(content="".join(parts), usage_metadata=usage)
+    
+    def _send(self, llm, messages: List, on_token: Optional[Callable[[Optional[str]], None]], **options):
+        if on_token:
+            return self._stream_call(llm, messages, on_token, **options)
+        return llm.invoke(messages, **options)
+    
+    async def _asend(self, llm, messages: List, on_token: Optional[Callable[[Optional[str]], None]],
+                     **options):
+        if on_token:
+            return await self._astream_call(llm, messages, on_token, **options)
+        return await llm.ainvoke(messages, **options)
+    
+    def _cache_rejected(self, handle: str, error: Exception,
+                        on_token: Optional[Callable[[Optional[str]], None]]) -> bool:
+        """True (after forgetting ``handle``) when a call failed because the provider refused the cached prefix."""
+        if not handle_rejected(error):
+            return False
+        self.prompt_cache.invalidate(handle)
+        if on_token:
+            on_token(None)
+        return True
+    
+    def _call(self, tier: Dict[str, Any], messages: List,
+              on_token: Optional[Callable[[Optional[str]], None]]):
+        """One request: the system prompt as cached content when registered, else inline before ``messages``."""
+        handle = self.prompt_cache.handle(tier["llm"], tier["profile"], self.system_prompt)
+        if handle:
             try:
-                response = self.llm.invoke(full_messages)
-                elapsed = time.time() - start_time
-                return {
-                    "agent": self.name,
-                    "content": response.content,
-                    "elapsed_time": elapsed,
-                    "attempt": attempt + 1
-                }
+                return self._send(tier["llm"], messages, on_token, cached_content=handle)
             except Exception as e:
-                if attempt == max_retries:
+                if not self._cache_rejected(handle, e, on_token):
                     raise
-                time.sleep(2 ** attempt)
+        return self._send(tier["llm"], self._full_messages(messages), on_token)
+    
+    async def _acall(self, tier: Dict[str, Any], messages: List,
+                     on_token: Optional[Callable[[Optional[str]], None]]):
+        """Async variant of _call; registering a prefix runs off the event loop."""
+        handle = await asyncio.to_thread(self.prompt_cache.handle, tier["llm"], tier["profile"],
+                                         self.system_prompt)
+        if handle:
+            try:
+                return await self._asend(tier["llm"], messages, on_token, cached_content=handle)
+            except Exception as e:
+                if not self._cache_rejected(handle, e, on_token):
+                    raise
+        return await self._asend(tier["llm"], self._full_messages(messages), on_token)
+    
+    @staticmethod
+    def _prompt_tokens(messages: List) -> int:
+        return sum(estimate_tokens(str(m.content)) for m in messages)
+    
+    def _result(self, response, start_time: float, attempt: int, prompt_tokens: int,
+                tier_index: int, call_start: float) -> Dict[str, Any]:
+        usage = getattr(response, "usage_metadata", None) or {}
+        profile = self.tiers[tier_index]["profile"]
+        latency = time.time() - call_start
+        result = {
+            "agent": self.name,
+            "content": response.content,
+            "elapsed_time": time.time() - start_time,
+            "attempt": attempt + 1,
+            "model": profile["model"],
+            "fallback": tier_index > 0,
+            "prompt_tokens": prompt_tokens,
+            "input_tokens": usage.get("input_tokens", prompt_tokens),
+            "output_tokens": usage.get("output_tokens", estimate_tokens(str(response.content))),
+            # Input tokens the provider read from its context cache (explicit or implicit)
+            "cached_tokens": (usage.get("input_token_details") or {}).get("cache_read", 0)
+        }
+        result["cost_usd"] = self.router.cost(profile, result["input_tokens"], result["output_tokens"],
+                                              result["cached_tokens"])
+        self.router.record(self.name, profile, latency, result["input_tokens"],
+                           result["output_tokens"], fallback=tier_index > 0,
+                           cached_tokens=result["cached_tokens"])
+        self.prompt_cache.record(self.name, result["input_tokens"], result["cached_tokens"], latency)
+        record_agent_call(result)
+        return result
+    
+    def _tier_retries(self, tier_index: int, max_retries: int) -> int:
+        # Lighter tiers hand over to the next one on their first failure
+        return max_retries if tier_index == len(self.tiers) - 1 else 0
+    
+    def _give_up(self, tier_index: int, error: Exception, call_start: float) -> bool:
+        """Record an abandoned tier; True when the error should be raised instead of falling back."""
+        self.router.record(self.name, self.tiers[tier_index]["profile"], time.time() - call_start,
+                           failed=True)
+        return tier_index == len(self.tiers) - 1 or isinstance(error, CircuitOpenError)
+    
+    def _cache_key(self, messages: List, tier_index: int = 0) -> Optional[str]:
+        """Response cache key for ``messages`` answered by the given model tier (the first by default)."""
+        if self.cache is None:
+            return None
+        profile = self.tiers[tier_index]["profile"]
+        prompt = "\n".join(str(m.content) for m in messages)
+        return self.cache.make_key(self.name, self.system_prompt, profile["temperature"], prompt,
+                                   model=profile["model"], max_tokens=profile["max_tokens"])
+    
+    def _cached_result(self, messages: List, start_time: float) -> Optional[Dict[str, Any]]:
+        """A cached answer from any model tier, preferring the first tier's."""
+        if self.cache is None:
+            return None
+        keys = [self._cache_key(messages, tier_index) for tier_index in range(len(self.tiers))]
+        content = self.cache.get_any(keys, self.name)
+        if content is None:
+            return None
+        result = {
+            "agent": self.name,
+            "content": content,
+            "elapsed_time": time.time() - start_time,
+            "attempt": 0,
+            "cache_hit": True,
+            "prompt_tokens": self._prompt_tokens(messages),
+            "input_tokens": 0,
+            "output_tokens": 0
+        }
+        record_agent_call(result)
+        return result
+    
+    def _store(self, key: Optional[str], result: Dict[str, Any]) -> Dict[str, Any]:
+        if key is not None and result["content"]:
+            self.cache.set(key, self.name, result["content"])
+        return result
+    
+    def _parse(self, result: Dict[str, Any], messages: List) -> Optional[List]:
+        """Set ``result["data"]``; returns the repair conversation if the reply did not validate."""
+        from langchain_core.messages import AIMessage, HumanMessage
+        data, error = parse_structured(self.output_schema, result["content"])
+        result["data"] = data
+        if error is None:
+            return None
+        # Never serve a reply that failed validation from the cache, whichever tier gave it
+        for tier_index in range(len(self.tiers)):
+            key = self._cache_key(messages, tier_index)
+            if key is not None:
+                self.cache.delete(key)
+        return messages + [AIMessage(content=result["content"]), HumanMessage(content=repair_prompt(error))]
+    
+    def invoke_structured(self, messages, max_retries: int = 2) -> Dict[str, Any]:
+        """``invoke`` plus ``result["data"]``, the validated ``output_schema`` instance.
+        
+        A reply that does not validate gets one repair request; if that fails
+        too, ``data`` is None and callers fall back to the prose content.
+        """
+        messages = self._as_messages(messages)
+        result = self.invoke(messages, max_retries)
+        repair = self._parse(result, messages)
+        if repair:
+            result = self.invoke(repair, max_retries)
+            self._parse(result, repair)
+        return result
+    
+    async def ainvoke_structured(self, messages, max_retries: int = 2) -> Dict[str, Any]:
+        """Async variant of invoke_structured."""
+        messages = self._as_messages(messages)
+        result = await self.ainvoke(messages, max_retries)
+        repair = self._parse(result, messages)
+        if repair:
+            result = await self.ainvoke(repair, max_retries)
+            self._parse(result, repair)
+        return result
+    
+    def invoke(self, messages, max_retries: int = 2,
+               on_token: Optional[Callable[[Optional[str]], None]] = None) -> Dict[str, Any]:
+        """Call the LLM through the shared provider guard.
+        
+        ``messages`` is a list of LangChain messages or a bare prompt string.
+        
+        Calls wait for the process-wide request/token limiter; transient
+        errors are retried with jittered backoff (or the server's retry hint)
+        and client errors such as bad requests or auth failures are raised
+        immediately. An agent with several model tiers moves to the next,
+        larger tier when a call fails instead of retrying the lighter one.
+        The system prompt is sent as provider cached content once it is
+        registered (see ``prompt_cache``). When ``on_token`` is given the
+        response is streamed and each text delta is passed to it;
+        ``on_token(None)`` means discard partial output before a retry.
+        """
+        start_time = time.time()
+        messages = self._as_messages(messages)
+        cached = self._cached_result(messages, start_time)
+        if cached:
+            if on_token:
+                on_token(cached["content"])
+            return cached
+        prompt_tokens = self._prompt_tokens(self._full_messages(messages))
+        
+        for tier_index, tier in enumerate(self.tiers):
+            retries = self._tier_retries(tier_index, max_retries)
+            for attempt in range(retries + 1):
+                delay = self.guard.acquire(prompt_tokens)
+                if delay:
+                    time.sleep(delay)
+                call_start = time.time()
+                try:
+                    response = self._call(tier, messages, on_token)
+                except Exception as e:
+                    if on_token:
+                        on_token(None)
+                    delay = self.guard.retry_delay(e, attempt, retries)
+                    if delay is None:
+                        if self._give_up(tier_index, e, call_start):
+                            raise
+                        break
+                    time.sleep(delay)
+                    continue
+                result = self._result(response, start_time, attempt, prompt_tokens, tier_index, call_start)
+                self.guard.record_success(result["output_tokens"])
+                # A fallback tier's answer is stored under that tier's key, which
+                # lookups also check, so it serves while the first tier keeps failing
+                return self._store(self._cache_key(messages, tier_index), result)
+    
+    async def ainvoke(self, messages, max_retries: int = 2,
+                      on_token: Optional[Callable[[Optional[str]], None]] = None) -> Dict[str, Any]:
+        """Async variant of invoke; limiter waits and backoff yield to the event loop."""
+        start_time = time.time()
+        messages = self._as_messages(messages)
+        cached = self._cached_result(messages, start_time)
+        if cached:
+            if on_token:
+                on_token(cached["content"])
+            return cached
+        prompt_tokens = self._prompt_tokens(self._full_messages(messages))
+        
+        for tier_index, tier in enumerate(self.tiers):
+            retries = self._tier_retries(tier_index, max_retries)
+            for attempt in range(retries + 1):
+                delay = self.guard.acquire(prompt_tokens)
+                if delay:
+                    await asyncio.sleep(delay)
+                call_start = time.time()
+                try:
+                    response = await self._acall(tier, messages, on_token)
+                except Exception as e:
+                    if on_token:
+                        on_token(None)
+                    delay = self.guard.retry_delay(e, attempt, retries)
+                    if delay is None:
+                        if self._give_up(tier_index, e, call_start):
+                            raise
+                        break
+                    await asyncio.sleep(delay)
+                    continue
+                result = self._result(response, start_time, attempt, prompt_tokens, tier_index, call_start)
+                self.guard.record_success(result["output_tokens"])
+                # A fallback tier's answer is stored under that tier's key, which
+                # lookups also check, so it serves while the first tier keeps failing
+                return self._store(self._cache_key(messages, tier_index), result)
 
 # =============================================================================
 # NODE FUNCTIONS
 # =============================================================================
 
-def create_agents(api_key: str) -> Dict:
-    """Create all specialized agents."""
+def create_agents(api_key: str, cache: Optional[ResponseCache] = None) -> Dict:
+    """Create all specialized agents, optionally sharing a response cache.
+    
+    System prompts carry everything that is the same for every trip, so they
+    form the stable prompt prefix that providers can cache; the node prompt
+    builders only add the trip details.
+    """
     
     research_prompt = """You are a travel research expert. Find top attractions, restaurants, 
-    and accommodations. Keep responses concise and actionable."""
+    accommodations, and local tips. Keep responses concise and actionable."""
     
-    weather_prompt = """You are a weather analyst. Provide weather forecasts, packing 
-    recommendations, and activity suggestions based on weather."""
+    weather_prompt = """You are a weather analyst. Provide a daily weather summary, a packing 
+    list, and activity suggestions based on weather."""
     
     hotel_prompt = """You are an accommodation specialist. Find hotels matching budget and 
-    preferences. Provide booking links and neighborhood recommendations."""
+    preferences. Provide 3-5 hotel recommendations with booking links and neighborhood 
+    recommendations."""
     
     budget_prompt = """You are a budget expert. Calculate realistic trip costs with detailed 
-    breakdowns. Include daily budgets and money-saving tips."""
+    breakdowns. Include daily budgets, per-category and per-person totals, a total cost 
+    estimate, and money-saving tips."""
     
     logistics_prompt = """You are a logistics expert. Plan efficient routes and transportation. 
-    Suggest local transit options and intercity connections."""
+    Suggest local transit options, transit passes, and routing tips, plus transportation 
+    between cities for multi-city routes."""
     
     planner_prompt = """You are a master itinerary planner. Create detailed day-by-day schedules 
-    with specific times, locations, and practical tips."""
+    with specific times, locations, costs, and practical tips."""
     
     activities_prompt = """You are an activities specialist. Find booking links for tours and 
-    attractions on major platforms like Viator and GetYourGuide."""
+    attractions on official websites and major platforms like Viator and GetYourGuide."""
     
     return {
-        "research": TravelAgent("ResearchAgent", "Research", research_prompt, api_key, 0.6),
-        "weather": TravelAgent("WeatherAgent", "Weather", weather_prompt, api_key, 0.5),
-        "hotel": TravelAgent("HotelAgent", "Hotels", hotel_prompt, api_key, 0.6),
-        "budget": TravelAgent("BudgetAgent", "Budget", budget_prompt, api_key, 0.5),
-        "logistics": TravelAgent("LogisticsAgent", "Logistics", logistics_prompt, api_key, 0.6),
-        "planner": TravelAgent("PlannerAgent", "Planner", planner_prompt, api_key, 0.7),
-        "activities": TravelAgent("ActivitiesAgent", "Activities", activities_prompt, api_key, 0.6)
+        "research": TravelAgent("ResearchAgent", "Research", research_prompt, api_key, 0.6, cache),
+        "weather": TravelAgent("WeatherAgent", "Weather", weather_prompt, api_key, 0.5, cache),
+        "hotel": TravelAgent("HotelAgent", "Hotels", hotel_prompt, api_key, 0.6, cache,
+                             output_schema=HotelShortlist),
+        "budget": TravelAgent("BudgetAgent", "Budget", budget_prompt, api_key, 0.5, cache,
+                              output_schema=BudgetBreakdown),
+        "logistics": TravelAgent("LogisticsAgent", "Logistics", logistics_prompt, api_key, 0.6, cache,
+                                 output_schema=LogisticsPlan),
+        "planner": TravelAgent("PlannerAgent", "Planner", planner_prompt, api_key, 0.7, cache),
+        "activities": TravelAgent("ActivitiesAgent", "Activities", activities_prompt, api_key, 0.6, cache)
     }
 
-def research_node(state: TravelPlannerState, agents: Dict) -> TravelPlannerState:
-    """Research destination information."""
-    if state.get("revision_count") is None:
-        state["revision_count"] = 0
+def _token_emitter(node_name: str) -> Optional[Callable[[Optional[str]], None]]:
+    """Forward streamed tokens to LangGraph's ``custom`` stream mode, if running in a graph."""
+    from langgraph.config import get_stream_writer
     
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return None
+    
+    def emit(delta: Optional[str]) -> None:
+        if delta is None:
+            writer({"node": node_name, "reset": True})
+        else:
+            writer({"node": node_name, "delta": delta})
+    return emit
+
+# Token budgets for upstream context, replacing fixed character cuts. Weights
+# mirror the relative sizes of the old limits (research gets the most room).
+PLANNER_CONTEXT_TOKENS = int(os.environ.get("PLANNER_CONTEXT_TOKENS", 900))
+ACTIVITIES_CONTEXT_TOKENS = int(os.environ.get("ACTIVITIES_CONTEXT_TOKENS", 400))
+PLANNER_PACKER = ContextPacker(PLANNER_CONTEXT_TOKENS, weights={
+    "research": 1.5, "weather": 0.8, "hotels": 0.8, "budget": 0.6, "logistics": 0.8
+})
+ACTIVITIES_PACKER = ContextPacker(ACTIVITIES_CONTEXT_TOKENS)
+
+# Each node is split into a prompt builder and an update builder so the sync
+# and async variants share everything except the agent call itself. Prompt
+# builders return only the per-trip suffix; fixed instructions belong in the
+# agent's system prompt (create_agents), the prefix shared by every session.
+
+def _research_prompt(state: TravelPlannerState) -> str:
     prompt = f"""Research {state['destination']} for {state['num_days']} days.
     Style: {state['travel_style']}, Budget: {state['budget_range']}, 
-    Travelers: {state['headcount']}, Interests: {', '.join(state['interests'])}
-    Find top attractions, dining, accommodations, and local tips."""
-    
-    response = agents["research"].invoke([HumanMessage(content=prompt)])
-    state["research_results"] = response["content"]
-    state["current_step"] = "research_complete"
-    return state
+    Travelers: {state['headcount']}, Interests: {', '.join(state['interests'])}"""
+    return _with_grounding(prompt, state, "research")
 
-def weather_node(state: TravelPlannerState, agents: Dict) -> TravelPlannerState:
-    """Analyze weather and provide recommendations."""
+def _research_update(state: TravelPlannerState, content: str) -> Dict[str, Any]:
+    update = {
+        "research_results": content,
+        "current_step": "research_complete"
+    }
+    if state.get("revision_count") is None:
+        update["revision_count"] = 0
+    return update
+
+def research_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Research destination information."""
+    response = agents["research"].invoke(_research_prompt(state))
+    return _research_update(state, response["content"])
+
+async def aresearch_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Async variant of research_node."""
+    response = await agents["research"].ainvoke(_research_prompt(state))
+    return _research_update(state, response["content"])
+
+def _weather_prompt(state: TravelPlannerState) -> str:
     prompt = f"""Analyze weather for {state['destination']} from {state['start_date']} 
-    for {state['num_days']} days. Provide daily summary, packing list, and activity suggestions."""
-    
-    response = agents["weather"].invoke([HumanMessage(content=prompt)])
-    state["weather_analysis"] = response["content"]
-    state["current_step"] = "weather_complete"
-    return state
+    for {state['num_days']} days."""
+    return _with_grounding(prompt, state, "weather")
 
-def hotel_node(state: TravelPlannerState, agents: Dict) -> TravelPlannerState:
-    """Find hotel recommendations."""
+def _weather_update(state: TravelPlannerState, content: str) -> Dict[str, Any]:
+    return {
+        "weather_analysis": content,
+        "current_step": "weather_complete"
+    }
+
+def weather_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Analyze weather and provide recommendations."""
+    response = agents["weather"].invoke(_weather_prompt(state))
+    return _weather_update(state, response["content"])
+
+async def aweather_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Async variant of weather_node."""
+    response = await agents["weather"].ainvoke(_weather_prompt(state))
+    return _weather_update(state, response["content"])
+
+def _hotel_prompt(state: TravelPlannerState, broaden: bool = False) -> str:
     checkout = (datetime.strptime(state['start_date'], '%Y-%m-%d') + 
                 timedelta(days=state['num_days'])).strftime('%Y-%m-%d')
     
-    retry_instruction = ""
-    if state.get("revision_count", 0) > 0:
-        retry_instruction = "BROADEN your search to find any available accommodations."
-    
     prompt = f"""Find accommodations for {state['destination']}.
     Check-in: {state['start_date']}, Check-out: {checkout}
-    Guests: {state['headcount']}, Budget: {state['budget_range']}
-    {retry_instruction}
-    Provide 3-5 hotel recommendations with booking links."""
-    
-    response = agents["hotel"].invoke([HumanMessage(content=prompt)])
-    state["hotel_recommendations"] = response["content"]
-    state["current_step"] = "hotel_complete"
-    return state
+    Guests: {state['headcount']}, Budget: {state['budget_range']}"""
+    if broaden:
+        prompt += "\n    BROADEN your search to find any available accommodations."
+    return _with_grounding(prompt, state, "hotel")
 
-def budget_node(state: TravelPlannerState, agents: Dict) -> TravelPlannerState:
-    """Calculate trip budget."""
-    prompt = f"""Estimate budget for {state['destination']} - {state['num_days']} days, 
-    {state['headcount']} people, {state['budget_range']} budget.
-    Provide daily breakdown and total cost estimate."""
-    
-    response = agents["budget"].invoke([HumanMessage(content=prompt)])
-    state["budget_estimate"] = response["content"]
-    
-    # Extract cost estimate
-    import re
-    cost_match = re.search(r'\$[\d,]+', response["content"])
-    if cost_match:
-        cost_str = cost_match.group().replace("$", "").replace(",", "")
-        try:
-            state["total_cost_estimate"] = float(cost_str)
-        except:
-            state["total_cost_estimate"] = 0.0
+def _hotel_update(state: TravelPlannerState, result: Dict[str, Any]) -> Dict[str, Any]:
+    hotels = result.get("data")
+    return {
+        "hotel_recommendations": render_hotels(hotels) if hotels else result["content"],
+        "hotel_shortlist": hotels.model_dump() if hotels else {},
+        "current_step": "hotel_complete"
+    }
+
+def _hotels_unavailable(result_or_state: Dict[str, Any]) -> bool:
+    """No bookable hotel, from the structured shortlist or, failing that, the prose."""
+    shortlist = result_or_state.get("hotel_shortlist")
+    if shortlist:
+        return hotels_unavailable(HotelShortlist.model_validate(shortlist))
+    return "unavailable" in result_or_state.get("hotel_recommendations", "").lower()
+
+def _needs_hotel_retry(state: TravelPlannerState, update: Dict[str, Any]) -> bool:
+    return _hotels_unavailable(update) and state.get("revision_count", 0) < 1
+
+def _hotel_retry_update(state: TravelPlannerState, update: Dict[str, Any]) -> Dict[str, Any]:
+    update["revision_count"] = state.get("revision_count", 0) + 1
+    return update
+
+def hotel_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Find hotel recommendations, retrying once with a broadened search.
     
-    state["current_step"] = "budget_complete"
-    return state
+    The availability check runs here rather than in the planner, so the retry
+    overlaps the other branches and the planner only ever sees usable hotels.
+    """
+    response = agents["hotel"].invoke_structured(_hotel_prompt(state))
+    update = _hotel_update(state, response)
+    if _needs_hotel_retry(state, update):
+        response = agents["hotel"].invoke_structured(_hotel_prompt(state, broaden=True))
+        update = _hotel_retry_update(state, _hotel_update(state, response))
+    return update
 
-def logistics_node(state: TravelPlannerState, agents: Dict) -> TravelPlannerState:
-    """Plan transportation and routes."""
-    if state["multi_city"]:
-        prompt = f"""Plan multi-city logistics: {' → '.join(state['cities'])}
-        Duration: {state['num_days']} days. Find transportation between cities and local options."""
+async def ahotel_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Async variant of hotel_node."""
+    response = await agents["hotel"].ainvoke_structured(_hotel_prompt(state))
+    update = _hotel_update(state, response)
+    if _needs_hotel_retry(state, update):
+        response = await agents["hotel"].ainvoke_structured(_hotel_prompt(state, broaden=True))
+        update = _hotel_retry_update(state, _hotel_update(state, response))
+    return update
+
+def _budget_prompt(state: TravelPlannerState) -> str:
+    return f"""Estimate budget for {state['destination']} - {state['num_days']} days, 
+    {state['headcount']} people, {state['budget_range']} budget."""
+
+_LABELLED_TOTAL = re.compile(r"total[^$\n]{0,40}\$\s?(\d[\d,]*(?:\.\d+)?)", re.I)
+_DOLLAR_AMOUNT = re.compile(r"\$\s?(\d[\d,]*(?:\.\d+)?)")
+
+def _prose_total(content: str) -> Optional[float]:
+    """Fallback when the budget reply did not validate: an amount labelled "total", else the largest one."""
+    match = _LABELLED_TOTAL.search(content)
+    amounts = [match.group(1)] if match else _DOLLAR_AMOUNT.findall(content)
+    values = [float(amount.replace(",", "")) for amount in amounts]
+    return max(values) if values else None
+
+def _budget_update(state: TravelPlannerState, result: Dict[str, Any]) -> Dict[str, Any]:
+    budget = result.get("data")
+    if budget:
+        update = {
+            "budget_estimate": render_budget(budget),
+            "budget_breakdown": budget.model_dump(),
+            "total_cost_estimate": budget.total
+        }
     else:
-        prompt = f"""Plan local logistics for {state['destination']}.
-        Suggest best transportation, transit passes, and routing tips."""
+        update = {"budget_estimate": result["content"], "budget_breakdown": {}}
+        total = _prose_total(result["content"])
+        if total is not None:
+            update["total_cost_estimate"] = total
     
-    response = agents["logistics"].invoke([HumanMessage(content=prompt)])
-    state["logistics_plan"] = response["content"]
-    state["current_step"] = "logistics_complete"
-    return state
+    update["current_step"] = "budget_complete"
+    return update
+
+def budget_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Calculate trip budget."""
+    response = agents["budget"].invoke_structured(_budget_prompt(state))
+    return _budget_update(state, response)
+
+async def abudget_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Async variant of budget_node."""
+    response = await agents["budget"].ainvoke_structured(_budget_prompt(state))
+    return _budget_update(state, response)
+
+def _logistics_prompt(state: TravelPlannerState) -> str:
+    if state["multi_city"]:
+        return f"""Plan multi-city logistics: {' → '.join(state['cities'])}
+        Duration: {state['num_days']} days."""
+    return f"""Plan local logistics for {state['destination']}."""
+
+def _logistics_update(state: TravelPlannerState, result: Dict[str, Any]) -> Dict[str, Any]:
+    plan = result.get("data")
+    return {
+        "logistics_plan": render_logistics(plan) if plan else result["content"],
+        "logistics_details": plan.model_dump() if plan else {},
+        "current_step": "logistics_complete"
+    }
+
+def logistics_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Plan transportation and routes."""
+    response = agents["logistics"].invoke_structured(_logistics_prompt(state))
+    return _logistics_update(state, response)
+
+async def alogistics_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Async variant of logistics_node."""
+    response = await agents["logistics"].ainvoke_structured(_logistics_prompt(state))
+    return _logistics_update(state, response)
 
-def planner_node(state: TravelPlannerState, agents: Dict) -> TravelPlannerState:
+# Planner section -> (state field, model, one-line summary) for structured agent outputs
+STRUCTURED_SECTIONS = {
+    "hotels": ("hotel_shortlist", HotelShortlist, summarize_hotels),
+    "budget": ("budget_breakdown", BudgetBreakdown, summarize_budget),
+    "logistics": ("logistics_details", LogisticsPlan, summarize_logistics),
+}
+
+def _planner_prompt(state: TravelPlannerState) -> str:
+    sections = {
+        "research": state.get('research_results', ''),
+        "weather": state.get('weather_analysis', ''),
+        "hotels": state.get('hotel_recommendations', ''),
+        "budget": state.get('budget_estimate', ''),
+        "logistics": state.get('logistics_plan', '')
+    }
+    # Structured outputs are already compact; only prose goes through the packer
+    summaries = {}
+    for section, (field, model, summarize) in STRUCTURED_SECTIONS.items():
+        if state.get(field):
+            summaries[section] = summarize(model.model_validate(state[field]))
+            sections[section] = ""
+    context = PLANNER_PACKER.pack(sections)
+    context.update(summaries)
+    allocation = ""
+    if state.get("city_results"):
+        days = allocate_days(state['num_days'], state['cities'])
+        allocation = "Day allocation: " + ", ".join(f"{city} {n} days" for city, n in days.items())
+    return f"""Create detailed {state['num_days']}-day itinerary for {state['destination']}.
+    {allocation}
+    Research: {context['research']}
+    Weather: {context['weather']}
+    Hotels: {context['hotels']}
+    Budget: {context['budget']}
+    Logistics: {context['logistics']}"""
+
+def _planner_update(state: TravelPlannerState, content: str) -> Dict[str, Any]:
+    update = {
+        "final_itinerary": content,
+        "current_step": "planner_complete"
+    }
+    if state.get("city_results"):
+        # Publish the merged city sections so the report shows every city
+        update.update({field: state[field] for field in CITY_FIELDS.values()})
+    return update
+
+def planner_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
     """Create final itinerary."""
-    hotels_content = state.get("hotel_recommendations", "").lower()
-    revision_count = state.get("revision_count", 0)
-    
-    if "unavailable" in hotels_content and revision_count < 1:
-        state["final_itinerary"] = "REVISE_HOTEL"
-        state["revision_count"] = revision_count + 1
+    state = _with_city_sections(state)
+    response = agents["planner"].invoke(_planner_prompt(state),
+                                        on_token=_token_emitter("planner"))
+    return _planner_update(state, response["content"])
+
+async def aplanner_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Async variant of planner_node."""
+    state = _with_city_sections(state)
+    response = await agents["planner"].ainvoke(_planner_prompt(state),
+                                               on_token=_token_emitter("planner"))
+    return _planner_update(state, response["content"])
+
+def _activities_prompt(state: TravelPlannerState) -> str:
+    itinerary = ACTIVITIES_PACKER.compress(state.get('final_itinerary', ''),
+                                           ACTIVITIES_PACKER.total_tokens)
+    return f"""Find booking links for activities in this itinerary:
+    {itinerary}"""
+
+def _activities_update(state: TravelPlannerState, content: str) -> Dict[str, Any]:
+    return {
+        "activity_bookings": content,
+        "current_step": "activities_complete"
+    }
+
+def activities_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Find activity booking links."""
+    response = agents["activities"].invoke(_activities_prompt(state),
+                                           on_token=_token_emitter("activities"))
+    return _activities_update(state, response["content"])
+
+async def aactivities_node(state: TravelPlannerState, agents: Dict) -> Dict[str, Any]:
+    """Async variant of activities_node."""
+    response = await agents["activities"].ainvoke(_activities_prompt(state),
+                                                  on_token=_token_emitter("activities"))
+    return _activities_update(state, response["content"])
+
+def finalize_node(state: TravelPlannerState) -> Dict[str, Any]:
+    """Finalize workflow."""
+    return {
+        "workflow_end_time": time.time(),
+        "current_step": "complete"
+    }
+
+async def afinalize_node(state: TravelPlannerState) -> Dict[str, Any]:
+    """Async variant of finalize_node."""
+    return finalize_node(state)
+
+def parallel_time_saved(state: Dict[str, Any]) -> float:
+    """Seconds saved versus running every recorded node back to back."""
+    timings = state.get("node_timings") or {}
+    elapsed = state.get("workflow_end_time", 0.0) - state.get("workflow_start_time", 0.0)
+    if not timings or elapsed <= 0:
+        return 0.0
+    return max(0.0, sum(timings.values()) - elapsed)
+
+# =============================================================================
+# MULTI-CITY MAP-REDUCE
+# =============================================================================
+
+# Agent kind -> TravelPlannerState field holding the merged per-city text
+CITY_FIELDS = {
+    "research": "research_results",
+    "weather": "weather_analysis",
+    "hotel": "hotel_recommendations",
+}
+CITY_PROMPTS = {
+    "research": _research_prompt,
+    "weather": _weather_prompt,
+    "hotel": _hotel_prompt,
+}
+
+def allocate_days(num_days: int, cities: list) -> Dict[str, int]:
+    """Split the trip across cities in visit order, e.g. 10 days over 3 cities -> 4-3-3."""
+    unique = list(dict.fromkeys(cities))
+    if not unique:
+        return {}
+    base, extra = divmod(num_days, len(unique))
+    return {city: max(1, base + (1 if i < extra else 0)) for i, city in enumerate(unique)}
+
+def uses_city_fanout(state: Dict[str, Any]) -> bool:
+    return bool(state.get("multi_city")) and len(set(state.get("cities") or [])) > 1
+
+def city_payloads(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One CityPlanState per city with its own day count and start date."""
+    payloads = []
+    start = datetime.strptime(state["start_date"], '%Y-%m-%d')
+    for city, days in allocate_days(state["num_days"], state["cities"]).items():
+        payloads.append({
+            "city": city,
+            "destination": city,
+            "num_days": days,
+            "start_date": start.strftime('%Y-%m-%d'),
+            "travel_style": state["travel_style"],
+            "budget_range": state["budget_range"],
+            "headcount": state["headcount"],
+            "interests": state["interests"],
+            "multi_city": False,
+            "cities": [city],
+            "revision_count": 0,
+            "workflow_start_time": state.get("workflow_start_time", time.time()),
+            "city_results": {},
+            "node_metrics": [],
+            "node_timings": {},
+            "node_cache": {
+                key: entry for key, entry in (state.get("node_cache") or {}).items()
+                if key == f"city_plan@{city}"
+            }
+        })
+        start += timedelta(days=days)
+    return payloads
+
+def _with_city_sections(state: Dict[str, Any]) -> Dict[str, Any]:
+    """State view whose research/weather/hotel fields merge the per-city results."""
+    city_results = state.get("city_results") or {}
+    if not city_results:
         return state
+    view = dict(state)
+    days = allocate_days(state["num_days"], state["cities"])
+    for kind, field in CITY_FIELDS.items():
+        view[field] = "\n\n".join(
+            f"### {city} ({days[city]} days)\n{city_results[city].get(kind, '')}"
+            for city in days if city in city_results
+        )
+    return view
+
+def _city_view(state: Dict[str, Any], kind: str, grounded: bool) -> Dict[str, Any]:
+    view = dict(state)
+    if grounded:
+        context, _ = _timed_fetch(_grounding_fetchers(state)[kind])
+        view["grounding"] = {kind: context}
+    return view
+
+def _city_update(state: Dict[str, Any], kind: str, content: str) -> Dict[str, Any]:
+    return {
+        "city_results": {state["city"]: {kind: content}},
+        "current_step": f"{kind}_complete"
+    }
+
+def city_agent_node(kind: str, state: Dict[str, Any], agents: Dict,
+                    grounded: bool = True) -> Dict[str, Any]:
+    """Run one agent for one city, retrying hotels once with a broadened search."""
+    view = _city_view(state, kind, grounded)
+    if kind == "hotel":
+        return _city_update(state, kind, hotel_node(view, agents)["hotel_recommendations"])
+    response = agents[kind].invoke(CITY_PROMPTS[kind](view))
+    return _city_update(state, kind, response["content"])
+
+async def acity_agent_node(kind: str, state: Dict[str, Any], agents: Dict,
+                           grounded: bool = True) -> Dict[str, Any]:
+    """Async variant of city_agent_node."""
+    view = await asyncio.to_thread(_city_view, state, kind, grounded)
+    if kind == "hotel":
+        return _city_update(state, kind, (await ahotel_node(view, agents))["hotel_recommendations"])
+    response = await agents[kind].ainvoke(CITY_PROMPTS[kind](view))
+    return _city_update(state, kind, response["content"])
+
+def create_city_subgraph(agents: Dict, grounded: bool = True, use_async: bool = False):
+    """Compile the per-city sub-graph: research, weather and hotel run concurrently."""
+    from langgraph.graph import StateGraph, START, END
     
-    prompt = f"""Create detailed {state['num_days']}-day itinerary for {state['destination']}.
+    subgraph = StateGraph(CityPlanState)
+    for kind in CITY_PROMPTS:
+        if use_async:
+            node_fn = (lambda k: lambda s, a: acity_agent_node(k, s, a, grounded))(kind)
+        else:
+            node_fn = (lambda k: lambda s, a: city_agent_node(k, s, a, grounded))(kind)
+        label = (lambda k: lambda s: f"{k}@{s['city']}")(kind)
+        subgraph.add_node(kind, instrumented(label, node_fn, agents, use_async))
+        subgraph.add_edge(START, kind)
+        subgraph.add_edge(kind, END)
+    return subgraph.compile()
+
+# =============================================================================
+# INCREMENTAL RE-PLANNING
+# =============================================================================
+
+# Bookkeeping fields that change on every run without changing any node's output
+VOLATILE_FIELDS = {
+    "messages", "current_step", "errors", "workflow_start_time", "workflow_end_time",
+    "node_timings", "node_metrics", "node_cache", "reused_nodes", "grounding_stats",
+}
+
+# Reducer fields that must start empty on each run instead of merging into the last one
+RUN_SCOPED_FIELDS = ["messages", "errors", "node_timings", "node_metrics", "city_results", "reused_nodes"]
+
+# Dict fields tracked per key ("grounding.weather"), so a node only depends on its own entry
+NESTED_FIELDS = {"grounding"}
+
+class ReadTracker(dict):
+    """State view that records which fields a node reads."""
     
-    Research: {state.get('research_results', '')[:1500]}
-    Weather: {state.get('weather_analysis', '')[:800]}
-    Hotels: {state.get('hotel_recommendations', '')[:800]}
-    Budget: {state.get('budget_estimate', '')[:600]}
-    Logistics: {state.get('logistics_plan', '')[:800]}
+    def __init__(self, state: Dict[str, Any], reads: Optional[set] = None, prefix: str = ""):
+        super().__init__(state)
+        self.reads = set() if reads is None else reads
+        self._prefix = prefix
     
-    Create day-by-day schedule with times, locations, costs, and practical tips."""
+    def _value(self, key, value):
+        if not self._prefix and key in NESTED_FIELDS and isinstance(value, dict):
+            return ReadTracker(value, self.reads, f"{key}.")
+        self.reads.add(f"{self._prefix}{key}")
+        return value
     
-    response = agents["planner"].invoke([HumanMessage(content=prompt)])
-    state["final_itinerary"] = response["content"]
-    state["current_step"] = "planner_complete"
-    return state
+    def _read_all(self):
+        # Copying or iterating the view (dict(state), {**state}) reads every field
+        if self._prefix:
+            self.reads.add(self._prefix[:-1])
+        else:
+            self.reads.update(super().keys())
+    
+    def __getitem__(self, key):
+        return self._value(key, super().__getitem__(key))
+    
+    def get(self, key, default=None):
+        return self._value(key, super().get(key, default))
+    
+    def __contains__(self, key):
+        self.reads.add(f"{self._prefix}{key}")
+        return super().__contains__(key)
+    
+    def __iter__(self):
+        self._read_all()
+        return super().__iter__()
+    
+    def keys(self):
+        self._read_all()
+        return super().keys()
+    
+    def items(self):
+        self._read_all()
+        return super().items()
+    
+    def values(self):
+        self._read_all()
+        return super().values()
 
-def activities_node(state: TravelPlannerState, agents: Dict) -> TravelPlannerState:
-    """Find activity booking links."""
-    if state.get("final_itinerary") == "REVISE_HOTEL":
-        return state
+def _field_value(state: Dict[str, Any], field: str) -> Any:
+    name, _, key = field.partition(".")
+    value = state.get(name)
+    return (value or {}).get(key) if key else value
+
+def input_fingerprint(state: Dict[str, Any], fields) -> str:
+    """Hash of the non-volatile ``fields`` (``name`` or ``name.key``) of ``state``."""
+    payload = {field: _field_value(state, field) for field in sorted(fields) if field not in VOLATILE_FIELDS}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def reusable(name, node_fn, use_async: bool = False):
+    """Wrap a node so it is skipped when the fields it read last time are unchanged.
     
-    prompt = f"""Find booking links for activities in this itinerary:
-    {state.get('final_itinerary', '')[:2000]}
+    Each execution stores the fields the node read, their fingerprint and the
+    update it returned in ``node_cache``. When the graph runs again on the same
+    thread and the fingerprint still matches, the stored update is replayed
+    instead. Upstream outputs are ordinary fields, so a node that re-executes
+    changes the fingerprint of everything downstream of it.
+    """
+    def label_for(state: Dict[str, Any]) -> str:
+        return name(state) if callable(name) else name
     
-    Find official websites and major platforms (Viator, GetYourGuide, etc.)."""
+    def replay(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        label = label_for(state)
+        entry = (state.get("node_cache") or {}).get(label)
+        if entry is None or input_fingerprint(state, entry["reads"]) != entry["fingerprint"]:
+            return None
+        update = dict(entry["update"])
+        update["reused_nodes"] = {label: entry["elapsed"]}
+        return update
     
-    response = agents["activities"].invoke([HumanMessage(content=prompt)])
-    state["activity_bookings"] = response["content"]
-    state["current_step"] = "activities_complete"
-    return state
+    def remember(state: Dict[str, Any], tracker: ReadTracker, update: Dict[str, Any],
+                 start: float) -> Dict[str, Any]:
+        reads = sorted(tracker.reads - VOLATILE_FIELDS)
+        timings = update.get("node_timings") or {}
+        update["node_cache"] = {label_for(state): {
+            "reads": reads,
+            "fingerprint": input_fingerprint(state, reads),
+            "update": {key: value for key, value in update.items()
+                       if key not in ("node_timings", "node_metrics", "node_cache")},
+            "elapsed": sum(timings.values()) if timings else time.time() - start,
+        }}
+        return update
+    
+    if use_async:
+        async def arun(state: Dict[str, Any]) -> Dict[str, Any]:
+            update = replay(state)
+            if update is not None:
+                return update
+            start = time.time()
+            tracker = ReadTracker(state)
+            return remember(state, tracker, await node_fn(tracker), start)
+        return arun
+    
+    def run(state: Dict[str, Any]) -> Dict[str, Any]:
+        update = replay(state)
+        if update is not None:
+            return update
+        start = time.time()
+        tracker = ReadTracker(state)
+        return remember(state, tracker, node_fn(tracker), start)
+    return run
 
-def finalize_node(state: TravelPlannerState) -> TravelPlannerState:
-    """Finalize workflow."""
-    state["workflow_end_time"] = time.time()
-    state["current_step"] = "complete"
-    return state
+def fresh_run_input(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Input for another run on an existing thread.
+    
+    Accumulating fields are overwritten rather than merged into the previous
+    run's values; ``node_cache`` is left out so it carries over.
+    """
+    from langgraph.types import Overwrite
+    
+    run_input = dict(state)
+    for field in RUN_SCOPED_FIELDS:
+        run_input[field] = Overwrite(state.get(field) or ([] if field in ("messages", "errors", "node_metrics") else {}))
+    return run_input
 
 # =============================================================================
 # WORKFLOW CREATION
 # =============================================================================
 
-def create_workflow(agents: Dict):
-    """Create the LangGraph workflow."""
+def instrumented(name, node_fn, agents: Dict, use_async: bool = False):
+    """Wrap a node so it records node_timings and node_metrics.
+    
+    ``name`` is the node label, or a callable deriving it from the state.
+    """
+    def finish(state: Dict[str, Any], update: Dict[str, Any], start: float,
+               calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+        end = time.time()
+        label = name(state) if callable(name) else name
+        update["node_timings"] = {label: end - start}
+        update["node_metrics"] = [
+            build_node_record(label, start, end, inputs_ready_at(state), calls)
+        ]
+        return update
+    
+    if use_async:
+        async def arun(state: Dict[str, Any]) -> Dict[str, Any]:
+            start = time.time()
+            with collect_agent_calls() as calls:
+                update = await node_fn(state, agents)
+            return finish(state, update, start, calls)
+        return arun
+    
+    def run(state: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.time()
+        with collect_agent_calls() as calls:
+            update = node_fn(state, agents)
+        return finish(state, update, start, calls)
+    return run
+
+# Nodes that only read user inputs and can therefore run concurrently
+PARALLEL_NODES = ["research", "weather", "hotel", "budget", "logistics"]
+
+# Workflow flags the app's sidebar starts with
+DEFAULT_WORKFLOW_OPTIONS = {"parallel": True, "grounded": True, "incremental": True}
+
+# Sync and async implementation of each agent node
+NODE_FUNCTIONS = {
+    "research": (research_node, aresearch_node),
+    "weather": (weather_node, aweather_node),
+    "hotel": (hotel_node, ahotel_node),
+    "budget": (budget_node, abudget_node),
+    "logistics": (logistics_node, alogistics_node),
+    "planner": (planner_node, aplanner_node),
+    "activities": (activities_node, aactivities_node),
+}
+
+def create_workflow(agents: Dict, parallel: bool = False, use_async: bool = False,
+                    grounded: bool = True, incremental: bool = False, checkpointer=None):
+    """Create the LangGraph workflow.
+    
+    With ``parallel=True`` the input-only agents fan out from the start of the
+    graph and join at the planner, so a plan costs roughly the slowest agent
+    instead of the sum of all of them; multi-city trips additionally run one
+    research/weather/hotel sub-graph per city via ``Send``. With
+    ``use_async=True`` the graph is built from the async node variants and
+    must be driven with ``astream`` (see ``AsyncPlanRunner``). With
+    ``grounded=True`` a grounding stage fetches web search results and the
+    forecast up front and the research, weather and hotel prompts summarize
+    that data instead of recalling it. With ``incremental=True`` a re-run on
+    the same thread (see ``fresh_run_input``) replays every node whose inputs
+    did not change.
+    
+    Checkpoints go to the shared on-disk ``get_checkpointer()`` unless another
+    ``checkpointer`` is given, so a failed run can be resumed from its last
+    completed step with ``workflow.stream(None, config)``.
+    """
+    from langgraph.graph import StateGraph, START, END
+    from langgraph.types import Send
+    from checkpoint_store import get_checkpointer
+    
+    def add_node(name: str, node, label=None):
+        if incremental:
+            node = reusable(label or name, node, use_async)
+        workflow.add_node(name, node)
     
-    def router_check(state: TravelPlannerState) -> str:
-        if state.get("final_itinerary") == "REVISE_HOTEL":
-            return "hotel"
-        return "activities"
     
     workflow = StateGraph(TravelPlannerState)
     
     # Add nodes with agents passed as argument
-    workflow.add_node("research", lambda s: research_node(s, agents))
-    workflow.add_node("weather", lambda s: weather_node(s, agents))
-    workflow.add_node("hotel", lambda s: hotel_node(s, agents))
-    workflow.add_node("budget", lambda s: budget_node(s, agents))
-    workflow.add_node("logistics", lambda s: logistics_node(s, agents))
-    workflow.add_node("planner", lambda s: planner_node(s, agents))
-    workflow.add_node("activities", lambda s: activities_node(s, agents))
-    workflow.add_node("finalize", finalize_node)
+    for node_name, (sync_fn, async_fn) in NODE_FUNCTIONS.items():
+        add_node(node_name, instrumented(node_name, async_fn if use_async else sync_fn,
+                                         agents, use_async))
+    workflow.add_node("finalize", afinalize_node if use_async else finalize_node)
+    if grounded:
+        if use_async:
+            grounding_fn = lambda s, _agents: agrounding_node(s)
+        else:
+            grounding_fn = lambda s, _agents: grounding_node(s)
+        add_node("grounding", instrumented("grounding", grounding_fn, agents, use_async))
     
     # Define edges
-    workflow.set_entry_point("research")
-    workflow.add_edge("research", "weather")
-    workflow.add_edge("weather", "hotel")
-    workflow.add_edge("hotel", "budget")
-    workflow.add_edge("budget", "logistics")
-    workflow.add_edge("logistics", "planner")
-    
-    workflow.add_conditional_edges(
-        "planner",
-        router_check,
-        {"hotel": "hotel", "activities": "activities"}
-    )
+    if parallel:
+        # Every branch runs in the same superstep; the planner is scheduled
+        # once all of them have written their results. The hotel branch
+        # retries its own search, so the planner never has to send it back.
+        city_graph = create_city_subgraph(agents, grounded, use_async)
+        
+        # Only the merged results go back to the parent, never the city-level inputs
+        def city_output(result: Dict[str, Any]) -> Dict[str, Any]:
+            return {key: result[key] for key in ("city_results", "node_metrics", "node_timings")}
+        
+        if use_async:
+            async def city_plan(state: Dict[str, Any]) -> Dict[str, Any]:
+                return city_output(await city_graph.ainvoke(state))
+        else:
+            def city_plan(state: Dict[str, Any]) -> Dict[str, Any]:
+                return city_output(city_graph.invoke(state))
+        add_node("city_plan", city_plan, label=lambda s: f"city_plan@{s['city']}")
+        
+        def route_start(state: TravelPlannerState) -> list:
+            # Multi-city trips map each city onto its own sub-graph; budget and
+            # logistics still cover the whole trip.
+            if uses_city_fanout(state):
+                return [Send("city_plan", payload) for payload in city_payloads(state)] + ["budget", "logistics"]
+            return ["grounding"] if grounded else list(PARALLEL_NODES)
+        
+        destinations = (["grounding"] if grounded else []) + PARALLEL_NODES + ["city_plan"]
+        workflow.add_conditional_edges(START, route_start, destinations)
+        for node_name in PARALLEL_NODES:
+            if grounded:
+                workflow.add_edge("grounding", node_name)
+            workflow.add_edge(node_name, "planner")
+        workflow.add_edge("city_plan", "planner")
+    else:
+        if grounded:
+            workflow.add_edge(START, "grounding")
+        workflow.add_edge("grounding" if grounded else START, "research")
+        workflow.add_edge("research", "weather")
+        workflow.add_edge("weather", "hotel")
+        workflow.add_edge("hotel", "budget")
+        workflow.add_edge("budget", "logistics")
+        workflow.add_edge("logistics", "planner")
     
+    workflow.add_edge("planner", "activities")
     workflow.add_edge("activities", "finalize")
     workflow.add_edge("finalize", END)
     
-    memory = MemorySaver()
-    return workflow.compile(checkpointer=memory)
+    return workflow.compile(checkpointer=checkpointer or get_checkpointer())
+
+# =============================================================================
+# AGENT REGISTRY
+# =============================================================================
+
+class AgentRegistry:
+    """Process-wide cache of agent sets and compiled workflows.
+    
+    Entries are keyed by a hash of the API key plus the model configuration,
+    so reruns and repeat plans reuse the same LLM clients (and their HTTP
+    connections) and compiled graphs. Entries unused for ``idle_ttl`` seconds
+    are dropped. Building runs under a per-key lock, so a slow cold start for
+    one key never blocks lookups for another.
+    """
+    
+    def __init__(self, idle_ttl: float = 1800):
+        self.idle_ttl = idle_ttl
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._building: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(api_key: str, use_cache: bool) -> str:
+        config = f"{get_model_router().fingerprint()}|cache={use_cache}"
+        return hashlib.sha256(f"{api_key}|{config}".encode("utf-8")).hexdigest()
+    
+    def evict_idle(self) -> int:
+        """Drop idle entries and return how many were removed."""
+        cutoff = time.time() - self.idle_ttl
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry["last_used"] < cutoff]
+            for key in stale:
+                del self._entries[key]
+                if key in self._building and not self._building[key].locked():
+                    del self._building[key]
+        return len(stale)
+    
+    def get(self, api_key: str, use_cache: bool = True, **workflow_options) -> Dict[str, Any]:
+        """Return ``{"agents", "workflow", "init_time", "reused", "key"}`` for these settings.
+        
+        ``workflow_options`` are passed through to ``create_workflow``. ``key`` is
+        the entry's ``make_key`` digest, which identifies the credentials in use.
+        """
+        start = time.time()
+        self.evict_idle()
+        key = self.make_key(api_key, use_cache)
+        workflow_key = tuple(sorted(workflow_options.items()))
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            reused = entry is not None and workflow_key in entry["workflows"]
+            building = self._building.setdefault(key, threading.Lock())
+        
+        if not reused:
+            # Build outside the registry lock; sessions wanting the same key wait here
+            # and then find the other session's result
+            with building:
+                with self._lock:
+                    entry = self._entries.get(key)
+                    reused = entry is not None and workflow_key in entry["workflows"]
+                if entry is None:
+                    entry = {
+                        "agents": create_agents(api_key, cache=get_default_cache() if use_cache else None),
+                        "workflows": {},
+                        "last_used": start
+                    }
+                if not reused:
+                    workflow = create_workflow(entry["agents"], **workflow_options)
+                    with self._lock:
+                        entry["workflows"][workflow_key] = workflow
+                        self._entries[key] = entry
+        
+        with self._lock:
+            entry["last_used"] = time.time()
+        
+        return {
+            "agents": entry["agents"],
+            "workflow": entry["workflows"][workflow_key],
+            "init_time": time.time() - start,
+            "reused": reused,
+            "key": key
+        }
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+@st.cache_resource
+def get_agent_registry() -> AgentRegistry:
+    """Registry shared by every Streamlit session in this process."""
+    return AgentRegistry()
+
+# =============================================================================
+# ASYNC RUNNER
+# =============================================================================
+
+class AsyncPlanRunner:
+    """Drive an async workflow with ``astream`` under bounded concurrency.
+    
+    One event loop can serve many trip plans at once: LLM calls and retry
+    backoff are awaited, and at most ``max_concurrency`` plans are in flight.
+    """
+    
+    def __init__(self, workflow, max_concurrency: int = 16):
+        self.workflow = workflow
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so the semaphore binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+    
+    async def run(self, initial_state: Dict[str, Any], config: Dict[str, Any],
+                  on_update=None) -> Dict[str, Any]:
+        """Run one plan, calling ``on_update(node_name, update)`` as nodes finish."""
+        async with self._get_semaphore():
+            async for output in self.workflow.astream(initial_state, config):
+                if on_update is None:
+                    continue
+                for node_name, node_output in output.items():
+                    on_update(node_name, node_output)
+            snapshot = await self.workflow.aget_state(config)
+            return snapshot.values
+    
+    async def run_many(self, jobs: List[tuple]) -> List[Any]:
+        """Run ``(initial_state, config)`` pairs concurrently; failures are returned, not raised."""
+        return await asyncio.gather(
+            *(self.run(state, config) for state, config in jobs),
+            return_exceptions=True
+        )
+
+# =============================================================================
+# REPORT
+# =============================================================================
+
+def mark_run_start(job) -> None:
+    """Job-start hook: time the run from when a worker picks it up, not from submission."""
+    if job.run_input is not None:
+        job.run_input = {**job.run_input, "workflow_start_time": job.started_at}
+
+
+def record_run_metrics(job) -> None:
+    """Job-completion hook: add a run's node metrics to the process aggregates exactly once."""
+    if job.final_state is not None:
+        get_metrics_aggregator().observe_run(job.final_state.get('node_metrics') or [])
+
+
+def render_markdown_report(state: Dict[str, Any]) -> str:
+    """Full Markdown travel plan for a finished workflow state."""
+    return "".join(iter_markdown(state))
 
 # =============================================================================
 # STREAMLIT APPLICATION
 # =============================================================================
 
+def render_performance_dashboard(final_state: Dict[str, Any]):
+    """Per-node waterfall for this run, aggregates across runs, and metric exports."""
+    records = final_state.get('node_metrics') or []
+    if not records:
+        return
+    
+    with st.expander("📈 Performance Dashboard"):
+        import altair as alt
+        
+        run_start = final_state['workflow_start_time']
+        run_end = final_state.get('workflow_end_time') or max(r["end"] for r in records)
+        rows = [
+            {
+                **{k: v for k, v in record.items() if k not in ("start", "end")},
+                "step": f"{i + 1}. {record['node']}",
+                "start_s": round(record["start"] - run_start, 3),
+                "end_s": round(record["end"] - run_start, 3)
+            }
+            for i, record in enumerate(records)
+        ]
+        
+        st.subheader("This run")
+        chart = alt.Chart(alt.Data(values=rows)).mark_bar().encode(
+            x=alt.X("start_s:Q", title="Seconds since start"),
+            x2="end_s:Q",
+            y=alt.Y("step:N", sort=None, title=None),
+            color=alt.Color("node:N", legend=None),
+            tooltip=["node:N", "wall_time:Q", "queue_wait:Q", "retries:Q",
+                     "input_tokens:Q", "output_tokens:Q", "cached_tokens:Q", "cache_hits:Q"]
+        )
+        st.altair_chart(chart)
+        st.dataframe(rows)
+        
+        aggregator = get_metrics_aggregator()
+        st.subheader(f"All runs in this process ({aggregator.runs})")
+        st.dataframe(aggregator.summary())
+        
+        guard = get_provider_guard()
+        st.subheader(f"LLM provider (circuit {guard.breaker.state.replace('_', '-')})")
+        st.dataframe([guard.stats])
+        
+        router = get_model_router()
+        st.subheader("Model routing")
+        st.dataframe(router.summary())
+        
+        prompt_cache = get_prompt_cache()
+        st.subheader("Prompt prefix caching")
+        st.caption("Share of input tokens the provider served from its context cache, "
+                   "and call latency with and without a cache hit.")
+        st.dataframe(prompt_cache.summary())
+        
+        queue = get_job_queue()
+        st.subheader("Plan queue")
+        st.dataframe([queue.snapshot()])
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="📥 Prometheus metrics",
+                data=(aggregator.to_prometheus() + guard.to_prometheus() + router.to_prometheus()
+                      + prompt_cache.to_prometheus() + queue.to_prometheus()),
+                file_name="travel_planner_metrics.prom",
+                mime="text/plain"
+            )
+        with col2:
+            spans = to_otel_spans(records, run_start, run_end,
+                                  {"destination": final_state.get('destination', '')})
+            st.download_button(
+                label="📥 OpenTelemetry spans (OTLP JSON)",
+                data=json.dumps(spans, indent=2),
+                file_name="travel_planner_trace.json",
+                mime="application/json"
+            )
+
 def main():
+    configure_page()
+    
     # Header
     st.markdown('<h1 class="main-header">✈️ AI Travel Planner</h1>', unsafe_allow_html=True)
     st.markdown("### Powered by Multi-Agent AI System with LangGraph & Gemini")
@@ -462,6 +1703,30 @@ def main():
         
         st.success("✅ API Key configured")
         
+        parallel_mode = st.checkbox(
+            "⚡ Parallel agent execution",
+            value=DEFAULT_WORKFLOW_OPTIONS["parallel"],
+            help="Run research, weather, hotel, budget and logistics agents concurrently"
+        )
+        
+        grounded_mode = st.checkbox(
+            "🔎 Ground agents with live search & weather",
+            value=DEFAULT_WORKFLOW_OPTIONS["grounded"],
+            help="Fetch web results and the Open-Meteo forecast before the LLM calls"
+        )
+        
+        use_cache = st.checkbox(
+            "💾 Reuse cached agent responses",
+            value=True,
+            help="Serve identical trip requests from the local response cache"
+        )
+        
+        incremental_mode = st.checkbox(
+            "♻️ Reuse unchanged sections",
+            value=DEFAULT_WORKFLOW_OPTIONS["incremental"],
+            help="When re-planning, only re-run agents whose inputs changed"
+        )
+        
         st.markdown("---")
         st.markdown("### 🤖 AI Agents")
         st.markdown("""
@@ -537,176 +1802,322 @@ def main():
         cities = [city.strip() for city in cities_input.split(",")]
     
     # Generate button
-    if st.button("🚀 Generate Travel Plan", type="primary"):
+    generate = st.button("🚀 Generate Travel Plan", type="primary")
+    
+    # A failed run keeps its checkpoints, so it can continue after the last completed step
+    failed_run = st.session_state.get("failed_run")
+    resume = False
+    if failed_run and not generate:
+        st.warning(f"⚠️ The last plan for {failed_run['destination']} did not finish. "
+                   "Completed agents were saved.")
+        if failed_run.get("error"):
+            st.error(f"❌ Error during planning: {failed_run['error']}")
+        resume = st.button("🔁 Resume from last completed step", key="resume_plan")
+    
+    # Plans run on the job queue, so a rerun (refresh, widget change, download)
+    # re-attaches to the session's job instead of losing it
+    plan_job = st.session_state.get("plan_job")
+    flights = get_single_flight()
+    
+    if generate or resume:
         if not api_key:
             st.error("❌ Please provide your Google API key in the sidebar")
             return
         
-        # Initialize
+        workflow_options = failed_run["options"] if resume else {
+            "parallel": parallel_mode,
+            "grounded": grounded_mode,
+            "incremental": incremental_mode
+        }
+        
+        # Initialize (agents and compiled graphs are reused across reruns)
         with st.spinner("🤖 Initializing AI agents..."):
             try:
-                agents = create_agents(api_key)
-                workflow = create_workflow(agents)
+                resources = get_agent_registry().get(api_key, use_cache=use_cache, **workflow_options)
+                workflow = resources["workflow"]
             except Exception as e:
                 st.error(f"❌ Failed to initialize: {str(e)}")
                 return
+        init_source = "reused" if resources["reused"] else "cold start"
+        st.caption(f"🤖 Agents ready in {resources['init_time'] * 1000:.1f} ms ({init_source})")
         
         # Prepare state
-        initial_state = {
-            "destination": destination,
-            "num_days": num_days,
-            "travel_style": travel_style,
-            "budget_range": budget_range,
-            "start_date": start_date.strftime('%Y-%m-%d'),
-            "interests": interests,
-            "headcount": headcount,
-            "multi_city": multi_city,
-            "cities": cities if multi_city else [destination],
-            "research_results": "",
-            "weather_analysis": "",
-            "hotel_recommendations": "",
-            "budget_estimate": "",
-            "logistics_plan": "",
-            "final_itinerary": "",
-            "activity_bookings": "",
-            "messages": [HumanMessage(content=f"Plan trip to {destination}")],
-            "current_step": "initialized",
-            "revision_count": 0,
-            "workflow_start_time": time.time(),
-            "workflow_end_time": 0.0,
-            "total_cost_estimate": 0.0,
-            "errors": []
-        }
-        
-        config = {"configurable": {"thread_id": f"trip_{int(time.time())}"}}
-        
-        # Progress tracking
-        progress_bar = st.progress(0)
-        status_text = st.empty()
+        initial_state = build_initial_state(
+            destination=destination,
+            num_days=num_days,
+            travel_style=travel_style,
+            budget_range=budget_range,
+            start_date=start_date.strftime('%Y-%m-%d'),
+            interests=interests,
+            headcount=headcount,
+            multi_city=multi_city,
+            cities=cities
+        )
         
-        steps = ["research", "weather", "hotel", "budget", "logistics", "planner", "activities", "finalize"]
-        current_step_idx = 0
+        # The compiled graph (and its checkpointer) is shared, so thread IDs must be
+        # unique per session. Re-plans reuse the session's thread so unchanged
+        # nodes can be replayed from its last checkpoint.
+        if resume:
+            thread_id = failed_run["thread_id"]
+            run_input = None
+        elif incremental_mode:
+            thread_id = st.session_state.setdefault("plan_thread_id", f"trip_{uuid.uuid4().hex}")
+            run_input = fresh_run_input(initial_state)
+        else:
+            thread_id = f"trip_{uuid.uuid4().hex}"
+            run_input = initial_state
+        config = {"configurable": {"thread_id": thread_id}}
+        st.session_state.pop("failed_run", None)
         
+        # Identical concurrent requests share one run. Resumes and re-plans build on
+        # their own thread's checkpoints, so they only dedupe per thread; a first plan
+        # on a thread has nothing to reuse and is keyed on its inputs alone. Only
+        # sessions using the same API key share a run, since the leader's key pays for it.
+        replanning = resume or (incremental_mode and bool(workflow.get_state(config).values))
+        scope = thread_id if replanning else None
         try:
-            for output in workflow.stream(initial_state, config):
-                for node_name, node_output in output.items():
-                    if node_name != "__end__" and node_name in steps:
-                        current_step_idx = steps.index(node_name) + 1
-                        progress = current_step_idx / len(steps)
-                        progress_bar.progress(progress)
-                        status_text.text(f"✅ Completed: {node_name.title()}")
-                        final_state = node_output
+            flight, leader = flights.join(
+                plan_key(initial_state, credentials=resources["key"], use_cache=use_cache, scope=scope,
+                         **workflow_options),
+                workflow, run_input, config,
+                priority=HIGH if resume else NORMAL,
+                metadata={"options": workflow_options, "use_cache": use_cache, "destination": destination},
+                on_start=mark_run_start,
+                on_done=record_run_metrics
+            )
+        except QueueFull:
+            st.warning(f"⏳ The planner is busy ({flights.queue.pending()} plans waiting). "
+                       "Please try again in a minute.")
+            return
+        plan_job = {"job_id": flight.job_id, "leader": leader, "shown": False}
+        st.session_state["plan_job"] = plan_job
+        # Session state does not survive a browser refresh; the URL does
+        st.query_params["plan_job"] = flight.job_id
+        reattached = False
+    elif plan_job or "plan_job" in st.query_params:
+        job_id = plan_job["job_id"] if plan_job else st.query_params["plan_job"]
+        flight = get_job_queue().get(job_id)
+        if flight is None:
+            # Finished long enough ago to have expired from the queue
+            st.session_state.pop("plan_job", None)
+            st.query_params.pop("plan_job", None)
+            return
+        if plan_job is None:
+            plan_job = st.session_state["plan_job"] = {"job_id": job_id, "leader": True, "shown": False}
+        leader = plan_job["leader"]
+        workflow_options = flight.metadata["options"]
+        use_cache = flight.metadata["use_cache"]
+        reattached = True
+    else:
+        return
+    
+    workflow = flight.workflow
+    config = flight.config
+    
+    # Progress tracking
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    
+    steps = ["grounding", "city_plan", "research", "weather", "hotel", "budget", "logistics", "planner", "activities", "finalize"]
+    completed_steps = set()
+    
+    # Live previews filled from the planner/activities token streams
+    live_placeholders = {"planner": st.empty(), "activities": st.empty()}
+    live_titles = {"planner": "📋 Itinerary (live)", "activities": "🎫 Activity Bookings (live)"}
+    live_text = {}
+    last_render = 0.0
+    # A re-attached session replays the stream, so its own clock can't time first content
+    first_content_time = plan_job.get("first_content_time")
+    
+    if not leader:
+        status_text.text(f"🤝 Shared result: joined an identical plan already in progress "
+                         f"({flight.subscribers} sessions)")
+    
+    try:
+        for mode, output in flight.subscribe(flights.queue_position):
+            if mode == "queue":
+                status_text.text(f"⏳ Queued: position {output['position']} "
+                                 f"({flights.max_running} plans run at a time)")
+                continue
+            if mode == "custom":
+                node_name = output.get("node")
+                if node_name not in live_placeholders:
+                    continue
+                if output.get("reset"):
+                    live_text[node_name] = ""
+                else:
+                    if first_content_time is None and not reattached:
+                        first_content_time = time.time()
+                    live_text[node_name] = live_text.get(node_name, "") + output["delta"]
+                # Re-rendering markdown per token is expensive; refresh ~10x per second
+                if time.time() - last_render > 0.1:
+                    live_placeholders[node_name].markdown(
+                        f"#### {live_titles[node_name]}\n\n{live_text[node_name]}"
+                    )
+                    last_render = time.time()
+                continue
             
-            # Display results
-            progress_bar.progress(1.0)
+            for node_name, node_output in output.items():
+                if node_name != "__end__" and node_name in steps:
+                    completed_steps.add(node_name)
+                    progress = len(completed_steps) / len(steps)
+                    progress_bar.progress(progress)
+                    if node_output and node_output.get("reused_nodes"):
+                        status_text.text(f"♻️ Reused: {node_name.title()}")
+                    else:
+                        status_text.text(f"✅ Completed: {node_name.title()}")
+        
+        final_state = flight.result()
+        first_showing = not plan_job["shown"]
+        plan_job.update(shown=True, first_content_time=first_content_time)
+        
+        for placeholder in live_placeholders.values():
+            placeholder.empty()
+        
+        # Display results
+        progress_bar.progress(1.0)
+        if leader:
             status_text.text("✅ All agents completed!")
-            
+        else:
+            status_text.text(f"✅ All agents completed! 🤝 Shared result "
+                             f"({flight.subscribers} sessions, one run)")
+        
+        if first_showing:
             st.balloons()
-            
-            # Metrics
-            st.header("📊 Trip Summary")
-            
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <h3>💰 Estimated Cost</h3>
-                    <h2>${final_state.get('total_cost_estimate', 0):,.2f}</h2>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                elapsed = final_state['workflow_end_time'] - final_state['workflow_start_time']
-                st.markdown(f"""
-                <div class="metric-card">
-                    <h3>⏱️ Processing Time</h3>
-                    <h2>{elapsed:.1f}s</h2>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col3:
-                st.markdown(f"""
-                <div class="metric-card">
-                    <h3>🔄 Revisions</h3>
-                    <h2>{final_state.get('revision_count', 0)}</h2>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # Itinerary
-            st.header("📋 Your Detailed Itinerary")
-            with st.expander("View Full Itinerary", expanded=True):
-                st.markdown(final_state.get('final_itinerary', 'No itinerary generated'))
-            
-            # Weather
-            st.header("🌤️ Weather Forecast & Packing")
-            with st.expander("View Weather Analysis"):
-                st.markdown(final_state.get('weather_analysis', 'No weather data'))
-            
-            # Hotels
-            st.header("🏨 Accommodation Recommendations")
-            with st.expander("View Hotel Options"):
-                st.markdown(final_state.get('hotel_recommendations', 'No hotels found'))
-            
-            # Activities
-            st.header("🎫 Activity Bookings")
-            with st.expander("View Booking Links"):
-                st.markdown(final_state.get('activity_bookings', 'No activities found'))
-            
-            # Budget
-            st.header("💵 Budget Breakdown")
-            with st.expander("View Detailed Budget"):
-                st.markdown(final_state.get('budget_estimate', 'No budget calculated'))
-            
-            # Logistics
-            st.header("🚗 Transportation & Logistics")
-            with st.expander("View Logistics Plan"):
-                st.markdown(final_state.get('logistics_plan', 'No logistics plan'))
-            
-            # Download option
-            st.header("💾 Export Your Plan")
-            
-            full_report = f"""
-# {destination} Travel Plan
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}
-
-## Trip Details
-- Destination: {destination}
-- Duration: {num_days} days
-- Travelers: {headcount}
-- Budget: {budget_range}
-- Style: {travel_style}
-- Cost Estimate: ${final_state.get('total_cost_estimate', 0):,.2f}
-
-## Itinerary
-{final_state.get('final_itinerary', '')}
-
-## Weather & Packing
-{final_state.get('weather_analysis', '')}
-
-## Accommodations
-{final_state.get('hotel_recommendations', '')}
-
-## Activities & Bookings
-{final_state.get('activity_bookings', '')}
-
-## Budget Breakdown
-{final_state.get('budget_estimate', '')}
-
-## Transportation
-{final_state.get('logistics_plan', '')}
-"""
-            
-            st.download_button(
-                label="📥 Download Complete Plan (Markdown)",
-                data=full_report,
-                file_name=f"{destination.replace(' ', '_')}_travel_plan.md",
-                mime="text/markdown"
+        
+        # Metrics
+        st.header("📊 Trip Summary")
+        
+        col1, col2, col3, col4, col5 = st.columns(5)
+        
+        with col1:
+            st.markdown(f"""
+            <div class="metric-card">
+                <h3>💰 Estimated Cost</h3>
+                <h2>${final_state.get('total_cost_estimate', 0):,.2f}</h2>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col2:
+            elapsed = final_state['workflow_end_time'] - final_state['workflow_start_time']
+            st.markdown(f"""
+            <div class="metric-card">
+                <h3>⏱️ Processing Time</h3>
+                <h2>{elapsed:.1f}s</h2>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col3:
+            saved = parallel_time_saved(final_state)
+            st.markdown(f"""
+            <div class="metric-card">
+                <h3>⚡ Parallel Saving</h3>
+                <h2>{saved:.1f}s</h2>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col4:
+            st.markdown(f"""
+            <div class="metric-card">
+                <h3>🔄 Revisions</h3>
+                <h2>{final_state.get('revision_count', 0)}</h2>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col5:
+            if first_content_time is not None:
+                ttfc = f"{first_content_time - final_state['workflow_start_time']:.1f}s"
+            else:
+                ttfc = "n/a"
+            st.markdown(f"""
+            <div class="metric-card">
+                <h3>🚀 First Content</h3>
+                <h2>{ttfc}</h2>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        reused = final_state.get('reused_nodes') or {}
+        if reused:
+            st.info(
+                f"♻️ Reused {len(reused)} unchanged section(s): {', '.join(sorted(reused))} "
+                f"(saved ~{sum(reused.values()):.1f}s)"
             )
-            
-        except Exception as e:
-            st.error(f"❌ Error during planning: {str(e)}")
-            st.exception(e)
+        
+        if use_cache:
+            with st.expander("💾 Response Cache Stats"):
+                for agent_name, counters in sorted(get_default_cache().stats.items()):
+                    st.text(f"{agent_name}: {counters['hits']} hits / {counters['misses']} misses")
+        
+        grounding_stats = final_state.get('grounding_stats') or {}
+        if grounding_stats:
+            with st.expander("🔎 Grounding Stats"):
+                total = grounding_stats.get("_total", {}).get("fetch_time", 0.0)
+                st.text(f"Concurrent fetch stage: {total:.2f}s")
+                for node_name in ["research", "weather", "hotel"]:
+                    node_stats = grounding_stats.get(node_name)
+                    if node_stats:
+                        st.text(f"{node_name.title()}: fetched in {node_stats['fetch_time']:.2f}s, "
+                                f"+{node_stats['prompt_tokens_added']} prompt tokens")
+        
+        render_performance_dashboard(final_state)
+        
+        # Itinerary
+        st.header("📋 Your Detailed Itinerary")
+        with st.expander("View Full Itinerary", expanded=True):
+            st.markdown(final_state.get('final_itinerary', 'No itinerary generated'))
+        
+        # Weather
+        st.header("🌤️ Weather Forecast & Packing")
+        with st.expander("View Weather Analysis"):
+            st.markdown(final_state.get('weather_analysis', 'No weather data'))
+        
+        # Hotels
+        st.header("🏨 Accommodation Recommendations")
+        with st.expander("View Hotel Options"):
+            st.markdown(final_state.get('hotel_recommendations', 'No hotels found'))
+        
+        # Activities
+        st.header("🎫 Activity Bookings")
+        with st.expander("View Booking Links"):
+            st.markdown(final_state.get('activity_bookings', 'No activities found'))
+        
+        # Budget
+        st.header("💵 Budget Breakdown")
+        with st.expander("View Detailed Budget"):
+            st.markdown(final_state.get('budget_estimate', 'No budget calculated'))
+        
+        # Logistics
+        st.header("🚗 Transportation & Logistics")
+        with st.expander("View Logistics Plan"):
+            st.markdown(final_state.get('logistics_plan', 'No logistics plan'))
+        
+        # Download option
+        st.header("💾 Export Your Plan")
+        
+        # Reports are rendered only when a button is clicked, not on every rerun
+        export_labels = {"md": "📥 Markdown", "html": "🌐 HTML", "pdf": "📄 PDF", "ics": "📅 Calendar (ICS)"}
+        for column, (fmt, label) in zip(st.columns(len(export_labels)), export_labels.items()):
+            with column:
+                st.download_button(
+                    label=label,
+                    data=lambda fmt=fmt: b"".join(export_chunks(final_state, fmt)),
+                    file_name=file_name(final_state, fmt),
+                    mime=FORMATS[fmt][1],
+                    key=f"export_{fmt}"
+                )
+        
+    except Exception as e:
+        st.session_state.pop("plan_job", None)
+        st.query_params.pop("plan_job", None)
+        st.session_state["failed_run"] = {
+            "thread_id": config["configurable"]["thread_id"],
+            "options": workflow_options,
+            "destination": workflow.get_state(config).values.get("destination", flight.metadata["destination"]),
+            "error": str(e)
+        }
+        # The resume button may already be on the page (a resume that failed again),
+        # so rerun and let the failed_run block above render the error and the button
+        st.rerun()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,226 @@
+"""
+Trip Schemas
+Structured outputs for the budget, hotel and logistics agents.
+
+The agents are asked for JSON matching these models; the parsed data is
+stored in the workflow state as plain dicts (``model_dump()``), rendered to
+Markdown for people and summarized into single lines for the planner prompt.
+"""
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, Field, ValidationError
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.I)
+
+
+class DayCost(BaseModel):
+    day: int = Field(ge=1)
+    total: float = Field(ge=0)
+    notes: str = ""
+
+
+class BudgetBreakdown(BaseModel):
+    currency: str = "USD"
+    total: float = Field(ge=0, description="Whole trip, all travelers")
+    per_person: float = Field(ge=0)
+    per_day: List[DayCost] = Field(default_factory=list)
+    categories: Dict[str, float] = Field(
+        default_factory=dict, description="e.g. accommodation, food, transport, activities, other"
+    )
+    tips: List[str] = Field(default_factory=list)
+
+
+class HotelOption(BaseModel):
+    name: str
+    area: str = ""
+    price_per_night: Optional[float] = Field(default=None, ge=0)
+    rating: Optional[float] = Field(default=None, ge=0, le=5)
+    available: bool = True
+    booking_url: str = ""
+    highlights: str = ""
+
+
+class HotelShortlist(BaseModel):
+    options: List[HotelOption] = Field(default_factory=list)
+    notes: str = ""
+
+
+class TransitPass(BaseModel):
+    name: str
+    price: Optional[float] = Field(default=None, ge=0)
+    notes: str = ""
+
+
+class TransportLeg(BaseModel):
+    from_place: str
+    to_place: str
+    mode: str
+    duration_minutes: Optional[int] = Field(default=None, ge=0)
+    cost: Optional[float] = Field(default=None, ge=0)
+    notes: str = ""
+
+
+class LogisticsPlan(BaseModel):
+    overview: str = ""
+    passes: List[TransitPass] = Field(default_factory=list)
+    legs: List[TransportLeg] = Field(default_factory=list)
+    tips: List[str] = Field(default_factory=list)
+
+
+def _strip_titles(schema):
+    if isinstance(schema, dict):
+        return {key: _strip_titles(value) for key, value in schema.items() if key != "title"}
+    if isinstance(schema, list):
+        return [_strip_titles(value) for value in schema]
+    return schema
+
+
+def schema_instructions(model: Type[BaseModel]) -> str:
+    """System-prompt suffix asking for a bare JSON object of ``model``."""
+    schema = json.dumps(_strip_titles(model.model_json_schema()), separators=(",", ":"))
+    return ("Respond with only a JSON object (no Markdown, no commentary) "
+            f"matching this JSON Schema: {schema}")
+
+
+def parse_structured(model: Type[BaseModel], text: str) -> Tuple[Optional[BaseModel], Optional[str]]:
+    """Return ``(instance, None)``, or ``(None, error)`` when ``text`` does not validate."""
+    cleaned = _FENCE.sub("", text or "")
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start < 0 or end < start:
+        return None, "no JSON object found"
+    try:
+        return model.model_validate_json(cleaned[start:end + 1]), None
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(p) for p in err['loc']) or 'root'}: {err['msg']}" for err in e.errors()[:5]
+        )
+
+
+def repair_prompt(error: str) -> str:
+    return (f"That reply was not valid JSON for the required schema ({error}). "
+            "Reply again with only the corrected JSON object.")
+
+
+def _money(amount: Optional[float], currency: str = "USD") -> str:
+    if amount is None:
+        return "n/a"
+    symbol = "$" if currency.upper() == "USD" else f"{currency} "
+    return f"{symbol}{amount:,.0f}"
+
+
+# =============================================================================
+# BUDGET
+# =============================================================================
+
+def render_budget(budget: BudgetBreakdown) -> str:
+    money = lambda amount: _money(amount, budget.currency)
+    lines = [f"**Total:** {money(budget.total)} ({money(budget.per_person)} per person)", ""]
+    if budget.categories:
+        lines += ["| Category | Cost |", "|---|---|"]
+        lines += [f"| {name.title()} | {money(cost)} |" for name, cost in budget.categories.items()]
+        lines.append("")
+    if budget.per_day:
+        lines.append("**Daily budget**")
+        lines += [f"- Day {day.day}: {money(day.total)}" + (f" — {day.notes}" if day.notes else "")
+                  for day in budget.per_day]
+        lines.append("")
+    if budget.tips:
+        lines.append("**Money-saving tips**")
+        lines += [f"- {tip}" for tip in budget.tips]
+    return "\n".join(lines).strip()
+
+
+def summarize_budget(budget: BudgetBreakdown) -> str:
+    money = lambda amount: _money(amount, budget.currency)
+    parts = [f"Total {money(budget.total)}, {money(budget.per_person)}/person"]
+    if budget.categories:
+        parts.append("by category: " + ", ".join(f"{k} {money(v)}" for k, v in budget.categories.items()))
+    if budget.per_day:
+        parts.append("per day: " + ", ".join(f"D{d.day} {money(d.total)}" for d in budget.per_day))
+    return "; ".join(parts)
+
+
+# =============================================================================
+# HOTELS
+# =============================================================================
+
+def hotels_unavailable(hotels: HotelShortlist) -> bool:
+    """True when no option can actually be booked."""
+    return not any(option.available for option in hotels.options)
+
+
+def render_hotels(hotels: HotelShortlist) -> str:
+    lines = []
+    for option in hotels.options:
+        details = [option.area] if option.area else []
+        if option.price_per_night is not None:
+            details.append(f"{_money(option.price_per_night)}/night")
+        if option.rating is not None:
+            details.append(f"★{option.rating:g}")
+        if not option.available:
+            details.append("unavailable")
+        name = f"[{option.name}]({option.booking_url})" if option.booking_url else option.name
+        lines.append(f"- **{name}**" + (f" ({', '.join(details)})" if details else ""))
+        if option.highlights:
+            lines.append(f"  {option.highlights}")
+    if hotels.notes:
+        lines += ["", hotels.notes]
+    return "\n".join(lines).strip()
+
+
+def summarize_hotels(hotels: HotelShortlist) -> str:
+    parts = []
+    for option in hotels.options:
+        if not option.available:
+            continue
+        details = [option.area] if option.area else []
+        if option.price_per_night is not None:
+            details.append(f"{_money(option.price_per_night)}/night")
+        parts.append(option.name + (f" ({', '.join(details)})" if details else ""))
+    return "; ".join(parts)
+
+
+# =============================================================================
+# LOGISTICS
+# =============================================================================
+
+def render_logistics(plan: LogisticsPlan) -> str:
+    lines = [plan.overview, ""] if plan.overview else []
+    if plan.passes:
+        lines.append("**Transit passes**")
+        lines += [f"- {p.name}" + (f" ({_money(p.price)})" if p.price is not None else "")
+                  + (f" — {p.notes}" if p.notes else "") for p in plan.passes]
+        lines.append("")
+    if plan.legs:
+        lines.append("**Getting around**")
+        for leg in plan.legs:
+            details = [leg.mode]
+            if leg.duration_minutes is not None:
+                details.append(f"{leg.duration_minutes} min")
+            if leg.cost is not None:
+                details.append(_money(leg.cost))
+            lines.append(f"- {leg.from_place} → {leg.to_place}: {', '.join(details)}"
+                         + (f" — {leg.notes}" if leg.notes else ""))
+        lines.append("")
+    if plan.tips:
+        lines.append("**Tips**")
+        lines += [f"- {tip}" for tip in plan.tips]
+    return "\n".join(lines).strip()
+
+
+def summarize_logistics(plan: LogisticsPlan) -> str:
+    parts = []
+    if plan.passes:
+        parts.append("passes: " + ", ".join(
+            p.name + (f" {_money(p.price)}" if p.price is not None else "") for p in plan.passes))
+    if plan.legs:
+        parts.append("legs: " + ", ".join(
+            f"{leg.from_place}→{leg.to_place} {leg.mode}"
+            + (f" {leg.duration_minutes}min" if leg.duration_minutes is not None else "")
+            for leg in plan.legs))
+    if plan.tips:
+        parts.append("tips: " + " / ".join(plan.tips[:3]))
+    return "; ".join(parts) or plan.overview
@@ -0,0 +1,233 @@
+"""
+Weather Client
+Open-Meteo geocoding and forecast lookups with caching and request coalescing.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GEOCODE_URL = "https://geocoding-api.open-meteo.com/v1/search"
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+
+# City coordinates practically never change; forecasts are refreshed a few times a day
+GEOCODE_TTL = 30 * 24 * 3600
+FORECAST_TTL = 3 * 3600
+
+WEATHER_CODES = {
+    0: "Clear sky", 1: "Mainly clear", 2: "Partly cloudy", 3: "Overcast",
+    45: "Foggy", 61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain",
+    71: "Slight snow", 95: "Thunderstorm"
+}
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe dict with per-entry expiry and oldest-first eviction."""
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: Dict[Any, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.time():
+                del self._data[key]
+                return _MISSING
+            return entry[1]
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.max_entries:
+                oldest = min(self._data, key=lambda k: self._data[k][0])
+                del self._data[oldest]
+            self._data[key] = (time.time() + (self.ttl if ttl is None else ttl), value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, Dict[str, Any]] = {}
+
+    def do(self, key: Any, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return ``(result, shared)``; ``shared`` is True for callers that waited on another."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self._calls[key] = call
+
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"], True
+
+        try:
+            call["result"] = fn()
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["event"].set()
+        return call["result"], False
+
+
+class WeatherClient:
+    """Cached Open-Meteo client sharing one pooled HTTP session.
+
+    Base URLs default to ``OPEN_METEO_GEOCODE_URL`` / ``OPEN_METEO_FORECAST_URL``
+    when set, so the client can be pointed at a local stub server.
+    """
+
+    def __init__(self, geocode_url: Optional[str] = None, forecast_url: Optional[str] = None,
+                 session: Optional[requests.Session] = None, timeout: float = 10,
+                 geocode_ttl: float = GEOCODE_TTL, forecast_ttl: float = FORECAST_TTL):
+        self.geocode_url = geocode_url or os.environ.get("OPEN_METEO_GEOCODE_URL", GEOCODE_URL)
+        self.forecast_url = forecast_url or os.environ.get("OPEN_METEO_FORECAST_URL", FORECAST_URL)
+        self.timeout = timeout
+        self.session = session or self._build_session()
+        self.geocode_cache = TTLCache(geocode_ttl, max_entries=10000)
+        self.forecast_cache = TTLCache(forecast_ttl, max_entries=2000)
+        self._flight = SingleFlight()
+        self._stats_lock = threading.Lock()
+        self.stats = {"cache_hits": 0, "upstream_calls": 0, "coalesced": 0}
+
+    @staticmethod
+    def _build_session() -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _cached(self, cache: TTLCache, key: Any, fetch: Callable[[], Any]) -> Any:
+        value = cache.get(key)
+        if value is not _MISSING:
+            self._count("cache_hits")
+            return value
+
+        def load():
+            # Re-check: the previous leader may have filled the cache meanwhile
+            value = cache.get(key)
+            if value is not _MISSING:
+                return value
+            self._count("upstream_calls")
+            value = fetch()
+            cache.set(key, value)
+            return value
+
+        value, shared = self._flight.do((id(cache), key), load)
+        if shared:
+            self._count("coalesced")
+        return value
+
+    def _get_json(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def geocode(self, destination: str) -> Optional[Dict[str, Any]]:
+        """Resolve a place name to its first Open-Meteo match, or None."""
+        key = " ".join(destination.split()).casefold()
+
+        def fetch():
+            results = self._get_json(self.geocode_url, {"name": destination, "count": 1}).get("results")
+            return results[0] if results else None
+
+        return self._cached(self.geocode_cache, key, fetch)
+
+    def daily_forecast(self, lat: float, lon: float, start_date: str, end_date: str) -> Dict[str, Any]:
+        """Raw ``daily`` block of the forecast for a date range."""
+        key = (round(lat, 2), round(lon, 2), start_date, end_date)
+
+        def fetch():
+            params = {
+                "latitude": lat,
+                "longitude": lon,
+                "daily": "temperature_2m_max,temperature_2m_min,weathercode,precipitation_probability_max",
+                "timezone": "auto",
+                "start_date": start_date,
+                "end_date": end_date
+            }
+            return self._get_json(self.forecast_url, params).get("daily", {})
+
+        return self._cached(self.forecast_cache, key, fetch)
+
+    def get_forecast(self, destination: str, start_date: str, num_days: int = 7) -> Dict[str, Any]:
+        """Formatted forecast in the shape returned by ``get_weather_forecast``."""
+        try:
+            location = self.geocode(destination)
+            if not location:
+                return {"error": f"Location not found: {destination}"}
+
+            lat, lon = location["latitude"], location["longitude"]
+            start = datetime.strptime(start_date, '%Y-%m-%d')
+            end = (start + timedelta(days=num_days - 1)).strftime('%Y-%m-%d')
+            daily = self.daily_forecast(lat, lon, start.strftime('%Y-%m-%d'), end)
+
+            forecast = []
+            for i in range(len(daily.get("time", []))):
+                forecast.append({
+                    "date": daily["time"][i],
+                    "temp_max_c": daily["temperature_2m_max"][i],
+                    "temp_min_c": daily["temperature_2m_min"][i],
+                    "conditions": WEATHER_CODES.get(daily["weathercode"][i], "Unknown"),
+                    "precipitation_prob": daily["precipitation_probability_max"][i]
+                })
+
+            return {
+                "location": f"{location.get('name')} ({lat:.2f}°, {lon:.2f}°)",
+                "forecast": forecast,
+                "num_days": len(forecast)
+            }
+        except Exception as e:
+            return {"error": str(e)}
+
+
+_default_client: Optional[WeatherClient] = None
+_default_lock = threading.Lock()
+
+
+def get_weather_client() -> WeatherClient:
+    """Process-wide client so every session shares the caches and connection pool."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = WeatherClient()
+        return _default_client
+
+
+def set_weather_client(client: Optional[WeatherClient]) -> None:
+    """Replace the process-wide client (e.g. with one pointed at a stub backend)."""
+    global _default_client
+    with _default_lock:
+        _default_client = client